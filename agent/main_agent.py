@@ -1,15 +1,23 @@
 from __future__ import annotations
 
 import asyncio
+from contextlib import asynccontextmanager
+import hashlib
+import json
 import logging
 from pathlib import Path
 import shutil
+import signal
 import subprocess
+from time import perf_counter, time
 from typing import Any
 
 from agent.evaluator import EvaluatorAgent
 from agent.mcp_client import MCPClientPool
 from agent.optimizer import OptimizerAgent
+from agent.step_graph import StepNode, run_step_graph
+from agent.task_context import TaskContext
+from agent.worker import TaskWorker
 from config import load_settings
 from skills.copy_generation.server import service as copy_service
 from skills.video_analysis.server import service as analysis_service
@@ -17,7 +25,7 @@ from skills.video_render.server import service as render_service
 from skills.voice_synthesis.server import service as voice_service
 from store.database import Database
 from store.models import Task, TaskStatus
-from store.redis_client import RedisStore
+from store.redis_client import DEFAULT_EVENT_STREAM_MAXLEN, DEFAULT_QUEUE_LANE, RedisStore
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +33,15 @@ logger = logging.getLogger(__name__)
 class MainAgent:
     """主代理类，协调所有技能执行"""
 
+    STEP_ORDER = [
+        "video-analysis",
+        "copy-generation",
+        "voice-synthesis",
+        "video-render",
+        "quality-evaluation",
+        "skill-optimization",
+    ]
+
     def __init__(self) -> None:
         settings = load_settings()
         self.settings = settings
@@ -36,6 +53,9 @@ class MainAgent:
             sse_channel_prefix=app_cfg["sse_channel_prefix"],
             session_ttl=app_cfg["session_ttl_seconds"],
             progress_ttl=app_cfg["progress_ttl_seconds"],
+            queue_lanes=app_cfg.get("queue_lanes"),
+            default_lane=app_cfg.get("default_queue_lane", DEFAULT_QUEUE_LANE),
+            event_stream_maxlen=app_cfg.get("sse_stream_maxlen", DEFAULT_EVENT_STREAM_MAXLEN),
         )
         self.evaluator = EvaluatorAgent()
         self.optimizer = OptimizerAgent()
@@ -43,6 +63,7 @@ class MainAgent:
         self.mcp.register_tool("video-analysis", analysis_service.analyze_video)
         self.mcp.register_tool("copy-generation", copy_service.generate_copy)
         self.mcp.register_tool("voice-synthesis", voice_service.synthesize_voice)
+        self.mcp.register_tool("voice-synthesis:prepare-voice", voice_service.prepare_voice_profile)
         self.mcp.register_tool("video-render", render_service.render_video)
         self.mcp.register_tool("quality-evaluation", self.evaluator.evaluate)
         self.mcp.register_tool("skill-optimization", self.optimizer.optimize)
@@ -57,78 +78,247 @@ class MainAgent:
             "quality-evaluation",
             "skill-optimization",
         ]
+        # 步骤级并发上限跨任务共享：多个任务并行时，CPU 密集的渲染不会同时挤占全部核心
+        worker_cfg = settings.data.get("worker", {})
+        self.stage_limits = {
+            str(step): max(1, int(limit)) for step, limit in (worker_cfg.get("stage_concurrency") or {}).items()
+        }
+        self.stage_semaphores = {step: asyncio.Semaphore(limit) for step, limit in self.stage_limits.items()}
+        self.stage_usage = {step: {"running": 0, "waiting": 0} for step in self.stage_limits}
+        self.task_contexts: dict[str, TaskContext] = {}
 
     async def run_task(self, task_id: str) -> None:
         """运行任务流程"""
-        async with self.db.session() as session:
-            task = await session.get(Task, task_id)
-            if not task:
-                return
-            task.status = TaskStatus.running
+        task = await TaskContext.load(self.db, task_id)
+        if not task:
+            return
+        # 运行期间各步骤共享同一份任务快照，不再各自查询任务行
+        self.task_contexts[task_id] = task
+        try:
+            await self._run_loaded_task(task_id, task)
+        finally:
+            self.task_contexts.pop(task_id, None)
+
+    async def fail_dead_lettered_task(self, task_id: str) -> None:
+        """任务反复导致工作进程崩溃、已移入死信列表：标记失败，可经重试接口重新入队"""
+        task = await TaskContext.load(self.db, task_id)
+        if not task:
+            return
+        error = "worker_crash_limit_exceeded"
+        task.update(status=TaskStatus.failed)
+        task.set_detail("error", error)
+        await task.flush()
+        await self.redis.publish_event(task_id, {"status": "failed", "error": error})
 
+    async def _run_loaded_task(self, task_id: str, task: TaskContext) -> None:
+        task.update(status=TaskStatus.running)
+        await task.flush()
         try:
             await self._heartbeat(task_id)
-            analysis = await self._run_with_checkpoint(task_id, "video-analysis", self._step_video_analysis)
-            copies = await self._run_with_checkpoint(task_id, "copy-generation", self._step_copy_generation, analysis)
-            audios = await self._run_with_checkpoint(task_id, "voice-synthesis", self._step_voice_synthesis, copies)
-            rendered = await self._run_with_checkpoint(task_id, "video-render", self._step_video_render, analysis, copies, audios)
-            diagnosis = await self._run_with_checkpoint(
-                task_id,
-                "quality-evaluation",
-                self._step_quality_evaluation,
-                rendered,
+            results = await run_step_graph(self._build_step_graph(task_id))
+            rendered = results["video-render"]
+
+            task.update(
+                status=TaskStatus.completed,
+                progress=100,
+                output_video_key=rendered["output_video"],
+                checkpoint="done",
             )
-            await self._run_with_checkpoint(task_id, "skill-optimization", self._step_skill_optimization, diagnosis)
-
-            async with self.db.session() as session:
-                task = await session.get(Task, task_id)
-                if task:
-                    task.status = TaskStatus.completed
-                    task.progress = 100
-                    task.output_video_key = rendered["output_video"]
-                    task.checkpoint = "done"
+            await task.flush()
             await self.redis.publish_event(task_id, {"status": "completed", "progress": 100})
         except Exception as exc:
-            async with self.db.session() as session:
-                task = await session.get(Task, task_id)
-                if task:
-                    task.status = TaskStatus.failed
-                    detail = dict(task.detail or {})
-                    detail["error"] = str(exc)
-                    task.detail = detail
+            task.update(status=TaskStatus.failed)
+            task.set_detail("error", str(exc))
+            await task.flush()
             await self.redis.publish_event(task_id, {"status": "failed", "error": str(exc)})
             logger.exception("任务 %s 失败: %s", task_id, exc)
             return
 
-    async def _run_with_checkpoint(self, task_id: str, step_name: str, fn: Any, *args: Any) -> Any:
-        """带检查点的步骤执行"""
-        async with self.db.session() as session:
-            task = await session.get(Task, task_id)
-            if task and task.checkpoint == step_name:
-                return task.detail.get(step_name)
+        # 技能优化不影响交付结果：任务标记完成后再执行，失败只记录
+        try:
+            await self._run_with_checkpoint(
+                task_id,
+                "skill-optimization",
+                self._step_skill_optimization,
+                results["quality-evaluation"],
+                advance_checkpoint=False,
+            )
+        except Exception as exc:
+            logger.warning("任务 %s 的技能优化失败: %s", task_id, exc)
+            await self.redis.publish_event(task_id, {"status": "skill-optimization-failed", "error": str(exc)})
 
-        result = await fn(task_id, *args)
-        await self._save_checkpoint(task_id, step_name, result)
-        await self.redis.publish_event(task_id, {"status": step_name, "progress": self._progress_for(step_name)})
+    def _build_step_graph(self, task_id: str) -> list[StepNode]:
+        """声明流水线步骤及其依赖；依赖满足的步骤并发执行"""
+
+        def _checkpointed(step_name: str, fn: Any, *deps: str, fingerprint_of: Any = None) -> StepNode:
+            async def _run(inputs: dict[str, Any]) -> Any:
+                args = tuple(inputs[dep] for dep in deps)
+                return await self._run_with_checkpoint(
+                    task_id,
+                    step_name,
+                    fn,
+                    *args,
+                    fingerprint_args=fingerprint_of(*args) if fingerprint_of else None,
+                )
+
+            return StepNode(name=step_name, run=_run, deps=deps)
+
+        async def _voice_profile(_inputs: dict[str, Any]) -> dict[str, Any] | None:
+            # 记入步骤账本：重试时复用已准备的音色，避免重新克隆得到新 voice_id 导致语音合成及后续步骤重跑
+            task = await self._task(task_id)
+            fingerprint = _step_fingerprint(task, "voice-profile", ())
+            if task and self._step_completed(task, "voice-profile", fingerprint):
+                return task.detail.get("voice-profile")
+            prepared = await self._prepare_voice_profile(task_id)
+            if prepared is not None:
+                await self._save_checkpoint(
+                    task_id, "voice-profile", prepared, advance_checkpoint=False, fingerprint=fingerprint
+                )
+            return prepared
+
+        return [
+            # 音色克隆只依赖源视频：与视频分析、文案生成并行，移出关键路径
+            StepNode(name="voice-profile", run=_voice_profile),
+            _checkpointed("video-analysis", self._step_video_analysis),
+            _checkpointed("copy-generation", self._step_copy_generation, "video-analysis"),
+            _checkpointed(
+                "voice-synthesis",
+                self._step_voice_synthesis,
+                "copy-generation",
+                "voice-profile",
+                # 音色预准备每次重跑都会返回新的耗时，只按音色本身判断输入是否变化
+                fingerprint_of=lambda copies, voice: (copies, _voice_identity(voice)),
+            ),
+            _checkpointed(
+                "video-render",
+                self._step_video_render,
+                "video-analysis",
+                "copy-generation",
+                "voice-synthesis",
+            ),
+            _checkpointed("quality-evaluation", self._step_quality_evaluation, "video-render"),
+        ]
+
+    async def _run_with_checkpoint(
+        self,
+        task_id: str,
+        step_name: str,
+        fn: Any,
+        *args: Any,
+        advance_checkpoint: bool = True,
+        fingerprint_args: Any = None,
+    ) -> Any:
+        """带检查点的步骤执行：步骤账本中已完成且输入指纹未变的步骤直接复用结果"""
+        task = await self._task(task_id)
+        fingerprint = _step_fingerprint(task, step_name, args if fingerprint_args is None else fingerprint_args)
+        if task and self._step_completed(task, step_name, fingerprint):
+            await self.redis.publish_event(
+                task_id,
+                {"status": step_name, "progress": self._progress_for(step_name), "skipped": True},
+            )
+            return task.detail.get(step_name)
+
+        queued = perf_counter()
+        async with self._stage_slot(step_name):
+            started = perf_counter()
+            result = await fn(task_id, *args)
+        elapsed_ms = int((perf_counter() - started) * 1000)
+        stage_wait_ms = int((started - queued) * 1000)
+        await self._save_checkpoint(
+            task_id,
+            step_name,
+            result,
+            elapsed_ms=elapsed_ms,
+            advance_checkpoint=advance_checkpoint,
+            fingerprint=fingerprint,
+        )
+        await self.redis.publish_event(
+            task_id,
+            {
+                "status": step_name,
+                "progress": self._progress_for(step_name),
+                "elapsed_ms": elapsed_ms,
+                "stage_wait_ms": stage_wait_ms,
+            },
+        )
         return result
 
-    async def _save_checkpoint(self, task_id: str, step_name: str, result: Any) -> None:
-        """保存检查点"""
-        async with self.db.session() as session:
-            task = await session.get(Task, task_id)
-            if not task:
-                return
-            detail = dict(task.detail or {})
-            detail[step_name] = result
-            task.detail = detail
-            task.checkpoint = step_name
-            task.progress = self._progress_for(step_name)
+    def _step_completed(self, task: TaskContext, step_name: str, fingerprint: str) -> bool:
+        """判断步骤是否已完成且输入未变"""
+        detail = task.detail if isinstance(task.detail, dict) else {}
+        if step_name not in detail:
+            return False
+        ledger = detail.get("step_ledger")
+        if isinstance(ledger, dict):
+            entry = ledger.get(step_name)
+            return isinstance(entry, dict) and entry.get("fingerprint") == fingerprint
+        # 兼容账本之前的任务：checkpoint 记录最后完成的步骤，其前序步骤均已完成
+        ordered = self.STEP_ORDER
+        if task.checkpoint not in ordered or step_name not in ordered:
+            return False
+        return ordered.index(step_name) <= ordered.index(task.checkpoint)
+
+    @asynccontextmanager
+    async def _stage_slot(self, step_name: str):
+        """占用步骤并发槽位；未配置上限的步骤直接执行"""
+        semaphore = self.stage_semaphores.get(step_name)
+        if semaphore is None:
+            yield
+            return
+        usage = self.stage_usage[step_name]
+        usage["waiting"] += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            usage["waiting"] -= 1
+        usage["running"] += 1
+        try:
+            yield
+        finally:
+            usage["running"] -= 1
+            semaphore.release()
+
+    def stage_metrics(self) -> dict[str, Any]:
+        """各步骤并发槽位的占用与排队情况"""
+        return {step: {"limit": limit, **self.stage_usage[step]} for step, limit in self.stage_limits.items()}
+
+    async def _save_checkpoint(
+        self,
+        task_id: str,
+        step_name: str,
+        result: Any,
+        elapsed_ms: int | None = None,
+        advance_checkpoint: bool = True,
+        fingerprint: str | None = None,
+    ) -> None:
+        """保存检查点、步骤账本及耗时；advance_checkpoint 为 False 时只记录结果（任务完成后的步骤）
+
+        只提交本步骤改动的 detail 键；并发完成的步骤会合并为一次写入。
+        """
+        task = await self._task(task_id)
+        if not task:
+            return
+        task.set_detail(step_name, result)
+        if elapsed_ms is not None:
+            task.set_detail("step_timings", {**(task.detail.get("step_timings") or {}), step_name: elapsed_ms})
+        if fingerprint is not None:
+            entry = {"fingerprint": fingerprint, "completed_at": int(time())}
+            task.set_detail("step_ledger", {**(task.detail.get("step_ledger") or {}), step_name: entry})
+        if advance_checkpoint:
+            task.update(checkpoint=step_name, progress=self._progress_for(step_name))
+        await task.flush()
+
+    async def _task(self, task_id: str) -> TaskContext | None:
+        """获取任务快照：运行中的任务复用内存中的上下文，否则从数据库加载一次"""
+        task = self.task_contexts.get(task_id)
+        if task is not None:
+            return task
+        return await TaskContext.load(self.db, task_id)
 
     def _progress_for(self, step_name: str) -> int:
         """计算步骤进度"""
-        ordered = ["video-analysis", "copy-generation", "voice-synthesis", "video-render", "quality-evaluation", "skill-optimization"]
-        idx = ordered.index(step_name) + 1
-        return int(idx / len(ordered) * 100)
+        idx = self.STEP_ORDER.index(step_name) + 1
+        return int(idx / len(self.STEP_ORDER) * 100)
 
     def _task_video_keys(self, task: Task) -> list[str]:
         """获取任务的视频键列表"""
@@ -142,61 +332,97 @@ class MainAgent:
 
     async def _step_video_analysis(self, task_id: str) -> dict[str, Any]:
         """视频分析步骤"""
-        async with self.db.session() as session:
-            task = await session.get(Task, task_id)
-            if not task:
-                raise RuntimeError("task_not_found")
+        task = await self._task(task_id)
+        if not task:
+            raise RuntimeError("task_not_found")
 
-            async def _progress_callback(payload: dict[str, Any]) -> None:
-                event = {"status": "video-analysis-progress", **payload}
-                await self.redis.publish_event(task_id, event)
-                await self.redis.set_progress(task_id, event)
+        async def _progress_callback(payload: dict[str, Any]) -> None:
+            event = {"status": "video-analysis-progress", **payload}
+            await self.redis.publish_event(task_id, event)
+            await self.redis.set_progress(task_id, event)
 
-            return await self.mcp.call_tool(
-                "video-analysis",
-                task_id=task_id,
-                video_object_keys=self._task_video_keys(task),
-                progress_callback=_progress_callback,
-            )
+        return await self.mcp.call_tool(
+            "video-analysis",
+            task_id=task_id,
+            video_object_keys=self._task_video_keys(task),
+            progress_callback=_progress_callback,
+        )
 
     async def _step_copy_generation(self, task_id: str, analysis: dict[str, Any]) -> dict[str, Any]:
         """文案生成步骤"""
-        async with self.db.session() as session:
-            task = await session.get(Task, task_id)
-            if not task:
-                raise RuntimeError("task_not_found")
-            return await self.mcp.call_tool(
-                "copy-generation", product_description=task.product_description, scenes=analysis["scenes"]
-            )
+        task = await self._task(task_id)
+        if not task:
+            raise RuntimeError("task_not_found")
+        return await self.mcp.call_tool(
+            "copy-generation", product_description=task.product_description, scenes=analysis["scenes"]
+        )
 
-    async def _step_voice_synthesis(self, task_id: str, copies: dict[str, Any]) -> dict[str, Any]:
-        """语音合成步骤"""
-        async with self.db.session() as session:
-            task = await session.get(Task, task_id)
+    def _voice_source_keys(self, task: Task) -> list[str]:
+        """获取克隆样本来源视频：优先使用单独上传的人声样本"""
+        voice_sample_keys = []
+        if isinstance(task.detail, dict):
+            voice_sample_keys = task.detail.get("voice_sample_keys") or []
+        return voice_sample_keys or self._task_video_keys(task)
+
+    async def _prepare_voice_profile(self, task_id: str) -> dict[str, Any] | None:
+        """预先准备音色；失败时返回 None，由语音合成步骤按原流程解析"""
+        try:
+            task = await self._task(task_id)
             if not task:
-                raise RuntimeError("task_not_found")
-            voice_sample_keys = []
-            if isinstance(task.detail, dict):
-                voice_sample_keys = task.detail.get("voice_sample_keys") or []
-            source_video_keys = voice_sample_keys or self._task_video_keys(task)
-            audios = await self.mcp.call_tool(
-                "voice-synthesis",
+                return None
+            source_video_keys = self._voice_source_keys(task)
+            prepared = await self.mcp.call_tool(
+                "voice-synthesis:prepare-voice",
                 task_id=task_id,
-                sentences=copies["sentences"],
                 source_video_keys=source_video_keys,
             )
-            if audios.get("error"):
-                reason = str(audios["error"])
-                failed_reasons = audios.get("failed_reasons") or []
-                if failed_reasons:
-                    reason = f"{reason}:{failed_reasons[0]}"
-                raise RuntimeError(f"voice_synthesis_failed:{reason}")
-            audio_segments = audios.get("audio_segments")
-            if not isinstance(audio_segments, list):
-                raise RuntimeError("voice_synthesis_invalid_result")
-            if not any(item.get("status") == "ok" for item in audio_segments):
-                raise RuntimeError("voice_synthesis_failed:no_successful_audio_segments")
-            return audios
+        except Exception as exc:
+            logger.warning("任务 %s 的音色预准备失败，语音合成时重新解析: %s", task_id, exc)
+            return None
+        await self.redis.publish_event(
+            task_id,
+            {
+                "status": "voice-profile-ready",
+                "voice_profile_source": prepared.get("voice_profile_source"),
+                "voice_profile_fallback": bool(prepared.get("voice_profile_fallback")),
+                "elapsed_ms": prepared.get("elapsed_ms"),
+            },
+        )
+        return prepared
+
+    async def _step_voice_synthesis(
+        self,
+        task_id: str,
+        copies: dict[str, Any],
+        prepared_voice: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        """语音合成步骤"""
+        task = await self._task(task_id)
+        if not task:
+            raise RuntimeError("task_not_found")
+        source_video_keys = self._voice_source_keys(task)
+        tool_kwargs: dict[str, Any] = {}
+        if prepared_voice is not None:
+            tool_kwargs["prepared_voice"] = prepared_voice
+        audios = await self.mcp.call_tool(
+            "voice-synthesis",
+            task_id=task_id,
+            sentences=copies["sentences"],
+            source_video_keys=source_video_keys,
+            **tool_kwargs,
+        )
+        if audios.get("error"):
+            reason = str(audios["error"])
+            failed_reasons = audios.get("failed_reasons") or []
+            if failed_reasons:
+                reason = f"{reason}:{failed_reasons[0]}"
+            raise RuntimeError(f"voice_synthesis_failed:{reason}")
+        audio_segments = audios.get("audio_segments")
+        if not isinstance(audio_segments, list):
+            raise RuntimeError("voice_synthesis_invalid_result")
+        if not any(item.get("status") == "ok" for item in audio_segments):
+            raise RuntimeError("voice_synthesis_failed:no_successful_audio_segments")
+        return audios
 
     async def _step_video_render(
         self,
@@ -206,31 +432,30 @@ class MainAgent:
         audios: dict[str, Any],
     ) -> dict[str, Any]:
         """视频渲染步骤"""
-        async with self.db.session() as session:
-            task = await session.get(Task, task_id)
-            if not task:
-                raise RuntimeError("task_not_found")
-            audio_segments = audios.get("audio_segments")
-            if not isinstance(audio_segments, list):
-                raise RuntimeError("voice_synthesis_invalid_result")
-            source_video_keys = self._task_video_keys(task)
-            rendered = await self.mcp.call_tool(
-                "video-render",
-                task_id=task_id,
-                source_video_key=source_video_keys[0],
-                source_video_keys=source_video_keys,
-                scenes=analysis["scenes"],
-                sentences=copies["sentences"],
-                audio_segments=audio_segments,
-                voice_profile_fallback=bool(audios.get("voice_profile_fallback")),
-            )
-            if rendered.get("error"):
-                raise RuntimeError(f"video_render_failed:{rendered['error']}")
-            output_video = rendered.get("output_video")
-            timeline_path = rendered.get("timeline_path")
-            if not output_video or not timeline_path:
-                raise RuntimeError("video_render_invalid_result")
-            return rendered
+        task = await self._task(task_id)
+        if not task:
+            raise RuntimeError("task_not_found")
+        audio_segments = audios.get("audio_segments")
+        if not isinstance(audio_segments, list):
+            raise RuntimeError("voice_synthesis_invalid_result")
+        source_video_keys = self._task_video_keys(task)
+        rendered = await self.mcp.call_tool(
+            "video-render",
+            task_id=task_id,
+            source_video_key=source_video_keys[0],
+            source_video_keys=source_video_keys,
+            scenes=analysis["scenes"],
+            sentences=copies["sentences"],
+            audio_segments=audio_segments,
+            voice_profile_fallback=bool(audios.get("voice_profile_fallback")),
+        )
+        if rendered.get("error"):
+            raise RuntimeError(f"video_render_failed:{rendered['error']}")
+        output_video = rendered.get("output_video")
+        timeline_path = rendered.get("timeline_path")
+        if not output_video or not timeline_path:
+            raise RuntimeError("video_render_invalid_result")
+        return rendered
 
     async def _step_quality_evaluation(self, task_id: str, rendered: dict[str, Any]) -> dict[str, Any]:
         """质量评估步骤"""
@@ -254,7 +479,8 @@ class MainAgent:
         for skill in self.skill_names:
             await self.redis.publish_event(task_id, {"status": "heartbeat", "skill": skill, "interval": 30})
 
-        stale = self.mcp.stale_tools(timeout_seconds=30)
+        # 同一技能进程注册的多个工具（如 voice-synthesis:prepare-voice）按技能名去重后再重启
+        stale = list(dict.fromkeys(name.split(":", 1)[0] for name in self.mcp.stale_tools(timeout_seconds=30)))
         for skill in stale:
             if self.supervisor_restart_disabled_reason:
                 await self.redis.publish_event(
@@ -298,16 +524,65 @@ class MainAgent:
         await self.redis.set_progress(task_id, {"heartbeat": "ok"})
 
 
+# 各步骤直接读取的任务原始输入；其余输入经由依赖步骤的结果进入指纹
+STEP_TASK_INPUTS = {
+    "video-analysis": ("input_video_keys",),
+    "copy-generation": ("product_description",),
+    "voice-profile": ("input_video_keys", "voice_sample_keys"),
+    "voice-synthesis": ("input_video_keys", "voice_sample_keys"),
+    "video-render": ("input_video_keys",),
+}
+
+
+def _step_fingerprint(task: TaskContext | None, step_name: str, args: Any) -> str:
+    """步骤输入指纹：依赖步骤的结果加上该步骤用到的任务原始输入"""
+    task_inputs: dict[str, Any] = {}
+    if task is not None:
+        detail = task.detail if isinstance(task.detail, dict) else {}
+        available = {
+            "product_description": task.product_description,
+            "input_video_keys": detail.get("input_video_keys") or [task.input_video_key],
+            "voice_sample_keys": detail.get("voice_sample_keys") or [],
+        }
+        task_inputs = {key: available[key] for key in STEP_TASK_INPUTS.get(step_name, ())}
+    raw = json.dumps({"task": task_inputs, "args": args}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _voice_identity(prepared_voice: dict[str, Any] | None) -> dict[str, Any] | None:
+    if prepared_voice is None:
+        return None
+    return {
+        "voice_profile": prepared_voice.get("voice_profile"),
+        "voice_profile_fallback": bool(prepared_voice.get("voice_profile_fallback")),
+    }
+
+
 agent = MainAgent()
 
 
 async def run_forever() -> None:
-    while True:
-        task_id = await agent.redis.redis.lpop(agent.redis.queue_key())
-        if not task_id:
-            await asyncio.sleep(1)
-            continue
-        await agent.run_task(task_id)
+    worker_cfg = agent.settings.data.get("worker", {})
+    worker = TaskWorker(
+        agent.redis,
+        agent.run_task,
+        max_in_flight=int(worker_cfg.get("max_in_flight_tasks", 2)),
+        dequeue_block_seconds=float(worker_cfg.get("dequeue_block_seconds", 5.0)),
+        visibility_timeout_seconds=int(worker_cfg.get("visibility_timeout_seconds", 120)),
+        reap_interval_seconds=float(worker_cfg.get("reap_interval_seconds", 30)),
+        drain_timeout_seconds=float(worker_cfg.get("drain_timeout_seconds", 600)),
+        metrics_interval_seconds=float(worker_cfg.get("metrics_interval_seconds", 10)),
+        stage_metrics=agent.stage_metrics,
+        max_task_crashes=int(worker_cfg.get("max_task_crashes", 3)),
+        on_dead_letter=agent.fail_dead_lettered_task,
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, worker.request_stop)
+        except (NotImplementedError, RuntimeError):  # pragma: no cover - 非 Unix 平台
+            pass
+    await worker.run()
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+StepRunner = Callable[[dict[str, Any]], Awaitable[Any]]  # 入参为依赖步骤的结果
+
+
+@dataclass(frozen=True)
+class StepNode:
+    """流水线中的一个步骤节点"""
+
+    name: str
+    run: StepRunner
+    deps: tuple[str, ...] = field(default_factory=tuple)
+
+
+def validate_step_graph(nodes: list[StepNode]) -> list[str]:
+    """校验依赖并返回一个拓扑序；存在未知依赖或环时抛出 ValueError"""
+    by_name = {node.name: node for node in nodes}
+    if len(by_name) != len(nodes):
+        raise ValueError("step_graph_duplicate_node")
+    for node in nodes:
+        for dep in node.deps:
+            if dep not in by_name:
+                raise ValueError(f"step_graph_unknown_dependency:{node.name}->{dep}")
+    ordered: list[str] = []
+    remaining = {node.name: set(node.deps) for node in nodes}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"step_graph_cycle:{','.join(sorted(remaining))}")
+        for name in ready:
+            ordered.append(name)
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return ordered
+
+
+async def run_step_graph(nodes: list[StepNode]) -> dict[str, Any]:
+    """按依赖关系并发执行步骤：依赖全部完成即启动；任一步骤失败时取消其余步骤并抛出该异常"""
+    validate_step_graph(nodes)
+    results: dict[str, Any] = {}
+    pending = {node.name: node for node in nodes}
+    running: dict[asyncio.Task[Any], str] = {}
+    try:
+        while pending or running:
+            for name, node in list(pending.items()):
+                if all(dep in results for dep in node.deps):
+                    inputs = {dep: results[dep] for dep in node.deps}
+                    running[asyncio.create_task(node.run(inputs))] = name
+                    del pending[name]
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            errors: list[BaseException] = []
+            for finished in done:
+                name = running.pop(finished)
+                error = finished.exception()
+                if error is not None:
+                    errors.append(error)
+                else:
+                    results[name] = finished.result()
+            if errors:
+                raise errors[0]
+    finally:
+        for unfinished in running:
+            unfinished.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+    return results
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from store.database import Database
+from store.models import Task
+
+TASK_FIELDS = (
+    "id",
+    "status",
+    "progress",
+    "retry_count",
+    "input_video_key",
+    "product_description",
+    "output_video_key",
+    "checkpoint",
+)
+
+
+class TaskContext:
+    """任务运行期的内存快照：一次加载，步骤间共享；写入只提交变化的列和 detail 键"""
+
+    def __init__(self, db: Database, fields: dict[str, Any], detail: dict[str, Any]) -> None:
+        self.db = db
+        self._fields = fields
+        self.detail = detail
+        self._dirty_fields: dict[str, Any] = {}
+        self._dirty_detail: dict[str, Any] = {}
+        self._flush_lock = asyncio.Lock()
+
+    @classmethod
+    async def load(cls, db: Database, task_id: str) -> TaskContext | None:
+        async with db.session() as session:
+            task = await session.get(Task, task_id)
+            if not task:
+                return None
+            fields = {name: getattr(task, name, None) for name in TASK_FIELDS}
+            detail = dict(task.detail) if isinstance(task.detail, dict) else {}
+        return cls(db, fields, detail)
+
+    def __getattr__(self, name: str) -> Any:
+        # 与 Task 行保持相同的属性访问方式，步骤代码无需区分
+        fields = self.__dict__.get("_fields", {})
+        if name in fields:
+            return fields[name]
+        raise AttributeError(name)
+
+    def update(self, **values: Any) -> None:
+        """修改任务列，等待下次 flush 提交"""
+        for name, value in values.items():
+            if name not in TASK_FIELDS or name == "id":
+                raise ValueError(f"task_context_unknown_field:{name}")
+            self._fields[name] = value
+            self._dirty_fields[name] = value
+
+    def set_detail(self, key: str, value: Any) -> None:
+        """修改 detail 的一个顶层键，等待下次 flush 提交"""
+        self.detail[key] = value
+        self._dirty_detail[key] = value
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._dirty_fields or self._dirty_detail)
+
+    async def flush(self) -> None:
+        """提交累积的修改；并发调用时后到者的修改会并入同一次写入，已无修改则直接返回"""
+        async with self._flush_lock:
+            if not self.dirty:
+                return
+            values, detail_patch = self._dirty_fields, self._dirty_detail
+            self._dirty_fields, self._dirty_detail = {}, {}
+            try:
+                await self.db.patch_task(self.id, values, detail_patch)
+            except BaseException:
+                # 写入失败时保留修改，下次 flush 重试；期间的新修改优先
+                self._dirty_fields = {**values, **self._dirty_fields}
+                self._dirty_detail = {**detail_patch, **self._dirty_detail}
+                raise
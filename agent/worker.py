@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import threading
+import uuid
+from collections.abc import Awaitable, Callable
+from time import perf_counter
+from typing import Any
+
+from store.redis_client import DequeuedTask, RedisStore, RequeueResult
+
+logger = logging.getLogger(__name__)
+
+TaskRunner = Callable[[str], Awaitable[None]]
+
+
+class TaskWorker:
+    """任务工作池：同时运行至多 max_in_flight 个任务；停止后不再取新任务，等待在途任务排空
+
+    取任务采用可靠队列：任务被原子移入本进程的处理中列表，完成后确认移除；
+    进程租约由独立线程定期续期（不受事件循环阻塞影响），崩溃后租约过期，其未完成任务由其他进程放回队首。
+    同一任务导致进程崩溃达到 max_task_crashes 次后不再放回，移入死信列表并交给 on_dead_letter 标记失败。
+    """
+
+    def __init__(
+        self,
+        redis: RedisStore,
+        run_task: TaskRunner,
+        max_in_flight: int = 2,
+        dequeue_block_seconds: float = 5.0,
+        visibility_timeout_seconds: int = 120,
+        reap_interval_seconds: float = 30.0,
+        drain_timeout_seconds: float = 600.0,
+        metrics_interval_seconds: float = 10.0,
+        stage_metrics: Callable[[], dict[str, Any]] | None = None,
+        worker_id: str | None = None,
+        max_task_crashes: int = 3,
+        on_dead_letter: TaskRunner | None = None,
+    ) -> None:
+        self.redis = redis
+        self.run_task = run_task
+        self.max_in_flight = max(1, max_in_flight)
+        self.dequeue_block_seconds = max(0.01, dequeue_block_seconds)
+        self.visibility_timeout_seconds = max(1, visibility_timeout_seconds)
+        self.reap_interval_seconds = max(0.01, reap_interval_seconds)
+        self.drain_timeout_seconds = max(0.0, drain_timeout_seconds)
+        self.metrics_interval_seconds = max(0.0, metrics_interval_seconds)
+        self.stage_metrics = stage_metrics
+        self.max_task_crashes = max(0, max_task_crashes)
+        self.on_dead_letter = on_dead_letter
+        # 容器中主机名与 pid 重启后往往不变，附加随机后缀，避免新进程沿用旧进程的处理中列表与租约
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.stats = {"started": 0, "finished": 0, "requeued": 0, "recovered": 0, "dead_lettered": 0}
+        self.lane_stats: dict[str, dict[str, int]] = {}
+        self._in_flight: dict[asyncio.Task[None], str] = {}
+        self._stopping = asyncio.Event()
+        self._lease_stop = threading.Event()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def request_stop(self) -> None:
+        """收到 SIGTERM/SIGINT 时调用：停止取任务，进入排空阶段"""
+        if not self._stopping.is_set():
+            logger.info("工作进程 %s 开始排空，在途任务 %s 个", self.worker_id, self.in_flight)
+        self._stopping.set()
+
+    async def run(self) -> None:
+        """主循环：有空闲槽位时阻塞取任务；停止后排空在途任务，未完成的放回队列"""
+        await self._recover_own_processing()
+        await self.redis.renew_worker_lease(self.worker_id, self.visibility_timeout_seconds)
+        lease_thread = self._start_lease_thread()
+        stop_waiter = asyncio.create_task(self._stopping.wait())
+        background = [asyncio.create_task(self._reap_orphans_forever())]
+        if self.metrics_interval_seconds:
+            background.append(asyncio.create_task(self._report_metrics_forever()))
+        try:
+            while not self._stopping.is_set():
+                if self.in_flight >= self.max_in_flight:
+                    await asyncio.wait({*self._in_flight, stop_waiter}, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                # 不取消阻塞中的读取：停止信号最多延迟一个阻塞周期生效，避免任务在移动途中丢失
+                try:
+                    dequeued = await self.redis.dequeue_task(self.worker_id, self.dequeue_block_seconds)
+                except Exception as exc:
+                    logger.warning("从队列取任务失败: %s", exc)
+                    await asyncio.wait({stop_waiter}, timeout=self.dequeue_block_seconds)
+                    continue
+                if dequeued is None or self._stopping.is_set():
+                    continue
+                self._record_queue_wait(dequeued)
+                self._start(dequeued.task_id)
+            await self._drain()
+        finally:
+            stop_waiter.cancel()
+            for task in background:
+                task.cancel()
+            # 主循环被意外取消时，在途任务同样取消，随处理中列表放回队列
+            unfinished = list(self._in_flight)
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                await asyncio.gather(*unfinished, return_exceptions=True)
+            self._lease_stop.set()
+            await asyncio.to_thread(lease_thread.join, self.visibility_timeout_seconds)
+            await self._release()
+            await self._report_metrics()
+
+    async def _recover_own_processing(self) -> None:
+        """启动时的队列恢复：续期租约前先放回同名旧进程遗留的任务（续期后回收扫描会跳过本进程），
+        并把升级前旧版单队列中的任务迁入默认通道"""
+        try:
+            recovered = await self.redis.recover_worker(self.worker_id, self.max_task_crashes)
+        except Exception as exc:
+            logger.warning("回收工作进程 %s 遗留任务失败: %s", self.worker_id, exc)
+            return
+        if recovered.requeued:
+            self.stats["recovered"] += len(recovered.requeued)
+            logger.warning("回收同名旧进程遗留的任务: %s", ", ".join(recovered.requeued))
+        await self._dead_letter(recovered)
+        try:
+            migrated = await self.redis.migrate_legacy_queue()
+        except Exception as exc:
+            logger.warning("迁移旧版队列失败: %s", exc)
+            return
+        if migrated:
+            logger.warning("已将旧版队列中的任务迁入默认通道: %s", ", ".join(migrated))
+
+    def _record_queue_wait(self, dequeued: DequeuedTask) -> None:
+        """按通道累计排队耗时，用于评估各优先级的 SLA"""
+        stats = self.lane_stats.setdefault(dequeued.lane, {"dispatched": 0, "total_wait_ms": 0, "max_wait_ms": 0})
+        stats["dispatched"] += 1
+        wait_ms = dequeued.queue_wait_ms or 0
+        stats["total_wait_ms"] += wait_ms
+        stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_ms)
+        logger.info(
+            "取出任务 %s（通道 %s，租户 %s），排队 %sms",
+            dequeued.task_id,
+            dequeued.lane,
+            dequeued.tenant,
+            dequeued.queue_wait_ms,
+        )
+
+    def _start(self, task_id: str) -> None:
+        task = asyncio.create_task(self._run_one(task_id))
+        self._in_flight[task] = task_id
+        task.add_done_callback(self._in_flight.pop)
+        self.stats["started"] += 1
+
+    async def _run_one(self, task_id: str) -> None:
+        started = perf_counter()
+        try:
+            await self.run_task(task_id)
+        except asyncio.CancelledError:
+            # 被取消的任务不确认，退出时随处理中列表放回队列
+            raise
+        except Exception:
+            # run_task 自身会记录失败；这里兜底防止单个任务拖垮工作池
+            logger.exception("任务 %s 在工作池中异常退出", task_id)
+        finally:
+            self.stats["finished"] += 1
+            logger.info("任务 %s 结束，耗时 %.1fs", task_id, perf_counter() - started)
+        try:
+            await self.redis.ack_task(self.worker_id, task_id)
+        except Exception as exc:
+            # 确认失败时任务留在处理中列表，进程退出或失联后会被再次执行（步骤有检查点）
+            logger.warning("确认任务 %s 失败: %s", task_id, exc)
+
+    async def _drain(self) -> None:
+        """等待在途任务完成；超时后取消，由下一个工作进程从检查点继续"""
+        if not self._in_flight:
+            return
+        _, pending = await asyncio.wait(set(self._in_flight), timeout=self.drain_timeout_seconds or None)
+        if not pending:
+            return
+        task_ids = [self._in_flight[task] for task in pending]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        logger.warning("排空超时，取消任务: %s", ", ".join(task_ids))
+
+    async def _release(self) -> None:
+        try:
+            requeued = await self.redis.release_worker(self.worker_id)
+        except Exception as exc:
+            # 放回失败时租约会自然过期，由其他进程回收
+            logger.warning("释放工作进程 %s 失败: %s", self.worker_id, exc)
+            return
+        self.stats["requeued"] += len(requeued)
+        if requeued:
+            logger.warning("已将未完成任务放回队列: %s", ", ".join(requeued))
+
+    def _start_lease_thread(self) -> threading.Thread:
+        self._lease_stop.clear()
+        thread = threading.Thread(
+            target=self._renew_lease_forever, name=f"lease-{self.worker_id}", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def _renew_lease_forever(self) -> None:
+        """在独立线程中续期租约：渲染等步骤即使卡住事件循环，也不会让仍在运行的任务被其他进程回收"""
+        while not self._lease_stop.wait(self.visibility_timeout_seconds / 3):
+            try:
+                self.redis.renew_worker_lease_blocking(self.worker_id, self.visibility_timeout_seconds)
+            except Exception as exc:
+                logger.warning("续期工作进程租约失败: %s", exc)
+
+    async def _reap_orphans_forever(self) -> None:
+        """定期回收租约过期进程遗留的任务"""
+        while True:
+            try:
+                recovered = await self.redis.requeue_orphaned_tasks(self.max_task_crashes)
+                if recovered.requeued:
+                    self.stats["recovered"] += len(recovered.requeued)
+                    logger.warning("回收失联工作进程的任务: %s", ", ".join(recovered.requeued))
+                await self._dead_letter(recovered)
+            except Exception as exc:
+                logger.warning("回收失联工作进程的任务失败: %s", exc)
+            await asyncio.sleep(self.reap_interval_seconds)
+
+    async def _dead_letter(self, recovered: RequeueResult) -> None:
+        """处理移入死信列表的任务：记录并交给 on_dead_letter 标记失败；标记失败时任务仍留在死信列表中"""
+        if not recovered.dead_lettered:
+            return
+        self.stats["dead_lettered"] += len(recovered.dead_lettered)
+        logger.error(
+            "任务崩溃次数达到上限 %s，移入死信列表: %s", self.max_task_crashes, ", ".join(recovered.dead_lettered)
+        )
+        if self.on_dead_letter is None:
+            return
+        for task_id in recovered.dead_lettered:
+            try:
+                await self.on_dead_letter(task_id)
+            except Exception as exc:
+                logger.warning("标记死信任务 %s 失败: %s", task_id, exc)
+
+    def metrics(self) -> dict[str, Any]:
+        payload: dict[str, Any] = {
+            "worker_id": self.worker_id,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "in_flight_task_ids": sorted(self._in_flight.values()),
+            "draining": self._stopping.is_set(),
+            **self.stats,
+        }
+        payload["lanes"] = {
+            lane: {
+                "dispatched": stats["dispatched"],
+                "avg_wait_ms": stats["total_wait_ms"] // max(1, stats["dispatched"]),
+                "max_wait_ms": stats["max_wait_ms"],
+            }
+            for lane, stats in self.lane_stats.items()
+        }
+        if self.stage_metrics is not None:
+            payload["stages"] = self.stage_metrics()
+        return payload
+
+    async def _report_metrics(self) -> None:
+        """记录队列深度与工作池状态；Redis 不可用时只记日志"""
+        payload = self.metrics()
+        try:
+            lane_depths = await self.redis.lane_depths()
+            payload["queue_depth"] = sum(lane_depths.values())
+            for lane, depth in lane_depths.items():
+                payload["lanes"].setdefault(lane, {})["depth"] = depth
+            await self.redis.set_worker_metrics(self.worker_id, payload)
+        except Exception as exc:
+            logger.warning("上报工作进程指标失败: %s", exc)
+            return
+        logger.info(
+            "队列深度 %s，在途任务 %s/%s",
+            payload["queue_depth"],
+            payload["in_flight"],
+            payload["max_in_flight"],
+        )
+
+    async def _report_metrics_forever(self) -> None:
+        while True:
+            await self._report_metrics()
+            await asyncio.sleep(self.metrics_interval_seconds)
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+
+from api.event_hub import EventHub
+from config import Settings, load_settings
+from store.database import Database
+from store.minio_client import MinioStore
+from store.redis_client import DEFAULT_EVENT_STREAM_MAXLEN, DEFAULT_QUEUE_LANE, RedisStore
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ApiResources:
+    """进程级共享资源：一份配置、一个数据库连接池、一个 Redis 连接池、一个 MinIO 客户端和一个 SSE 分发中心"""
+
+    settings: Settings
+    db: Database
+    redis: RedisStore
+    minio: MinioStore
+    events: EventHub
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> ApiResources:
+        app_cfg = settings.app
+        minio_cfg = settings.storage["minio"]
+        redis = RedisStore(
+            redis_url=settings.redis["url"],
+            task_prefix=app_cfg["task_queue_prefix"],
+            sse_channel_prefix=app_cfg["sse_channel_prefix"],
+            session_ttl=app_cfg["session_ttl_seconds"],
+            progress_ttl=app_cfg["progress_ttl_seconds"],
+            queue_lanes=app_cfg.get("queue_lanes"),
+            default_lane=app_cfg.get("default_queue_lane", DEFAULT_QUEUE_LANE),
+            event_stream_maxlen=app_cfg.get("sse_stream_maxlen", DEFAULT_EVENT_STREAM_MAXLEN),
+        )
+        return cls(
+            settings=settings,
+            db=Database(settings.postgres["dsn"]),
+            redis=redis,
+            minio=MinioStore(
+                minio_cfg["endpoint"],
+                minio_cfg["access_key"],
+                minio_cfg["secret_key"],
+                minio_cfg.get("secure", False),
+            ),
+            events=EventHub(
+                redis,
+                queue_size=int(app_cfg.get("sse_subscriber_queue_size", 256)),
+                heartbeat_seconds=float(app_cfg.get("sse_heartbeat_seconds", 15)),
+            ),
+        )
+
+    async def aclose(self) -> None:
+        """应用退出时释放连接池"""
+        await self.events.stop()
+        try:
+            await self.redis.redis.aclose()
+        except Exception as exc:
+            logger.warning("关闭 Redis 连接池失败: %s", exc)
+        await self.db.dispose()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """应用生命周期：启动时创建共享资源，退出时释放"""
+    resources = ApiResources.from_settings(load_settings())
+    app.state.resources = resources
+    resources.events.start()
+    try:
+        yield
+    finally:
+        await resources.aclose()
+
+
+def get_resources(request: Request) -> ApiResources:
+    """获取应用级共享资源"""
+    return request.app.state.resources
+
+
+def get_settings(request: Request) -> Settings:
+    """获取应用配置（启动时加载一次）"""
+    return get_resources(request).settings
+
+
+def get_db(request: Request) -> Database:
+    """获取共享的数据库连接"""
+    return get_resources(request).db
+
+
+def get_minio(request: Request) -> MinioStore:
+    """获取共享的 MinIO 存储客户端"""
+    return get_resources(request).minio
+
+
+def get_redis(request: Request) -> RedisStore:
+    """获取共享的 Redis 存储客户端"""
+    return get_resources(request).redis
+
+
+def get_event_hub(request: Request) -> EventHub:
+    """获取进程内共享的 SSE 分发中心"""
+    return get_resources(request).events
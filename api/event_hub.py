@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from collections.abc import AsyncIterator
+
+from store.redis_client import RedisStore, TaskEvent
+
+logger = logging.getLogger(__name__)
+
+EVENT_ID_PATTERN = re.compile(r"^\d+(-\d+)?$")  # Redis Stream 条目 ID
+
+
+class _Subscriber:
+    """单个 SSE 连接的投递队列；队列满或订阅中断时标记 lagged，由连接自行从事件流补齐"""
+
+    def __init__(self, queue_size: int) -> None:
+        self.queue: asyncio.Queue[TaskEvent | None] = asyncio.Queue(maxsize=queue_size)
+        self.lagged = False
+
+    def deliver(self, event: TaskEvent) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.mark_lagged()
+
+    def mark_lagged(self) -> None:
+        self.lagged = True
+        # 放入空信号唤醒等待中的连接；队列已满时连接本来就不会阻塞
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+
+class EventHub:
+    """进程内的 SSE 分发中心：整个进程只持有一个 Redis 模式订阅，按任务把事件推送给各连接
+
+    新连接先从任务事件流重放 Last-Event-ID 之后的事件，再接收实时推送；
+    投递按事件 ID 去重，重放与实时推送之间不会丢失或重复事件。
+    """
+
+    def __init__(
+        self,
+        redis: RedisStore,
+        queue_size: int = 256,
+        heartbeat_seconds: float = 15.0,
+        reconnect_delay_seconds: float = 1.0,
+    ) -> None:
+        self.redis = redis
+        self.queue_size = max(1, queue_size)
+        self.heartbeat_seconds = max(0.01, heartbeat_seconds)
+        self.reconnect_delay_seconds = max(0.01, reconnect_delay_seconds)
+        self._subscribers: dict[str, set[_Subscriber]] = {}
+        self._reader: asyncio.Task[None] | None = None
+        self._subscribed = asyncio.Event()
+
+    @property
+    def connections(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def start(self) -> None:
+        """启动共享订阅（幂等）；Redis 暂不可用时在后台重试，不阻塞应用启动"""
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read_forever())
+
+    async def stop(self) -> None:
+        if self._reader is None:
+            return
+        self._reader.cancel()
+        await asyncio.gather(self._reader, return_exceptions=True)
+        self._reader = None
+
+    async def events(self, task_id: str, last_event_id: str | None = None) -> AsyncIterator[TaskEvent | None]:
+        """订阅任务事件：先重放 last_event_id 之后保留的事件（未提供时重放全部），再推送实时事件；
+        空闲超过心跳间隔时产出 None，由调用方发送保活注释"""
+        self.start()
+        subscriber = _Subscriber(self.queue_size)
+        # 先登记并等共享订阅就绪，再重放：重放期间到达的实时事件留在队列里，按 ID 跳过已重放的部分
+        self._subscribers.setdefault(task_id, set()).add(subscriber)
+        cursor = last_event_id if last_event_id and EVENT_ID_PATTERN.match(last_event_id) else "0"
+        try:
+            await self._subscribed.wait()
+            async for event in self._replay(task_id, cursor):
+                cursor = event.id
+                yield event
+            while True:
+                if subscriber.lagged:
+                    subscriber.lagged = False
+                    _drain(subscriber.queue)
+                    async for event in self._replay(task_id, cursor):
+                        cursor = event.id
+                        yield event
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event is None or not _is_after(event.id, cursor):
+                    continue
+                cursor = event.id
+                yield event
+        finally:
+            subscribers = self._subscribers.get(task_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[task_id]
+
+    async def _replay(self, task_id: str, after: str) -> AsyncIterator[TaskEvent]:
+        while True:
+            batch = await self.redis.read_events(task_id, after=after, count=self.queue_size)
+            for event in batch:
+                yield event
+            if len(batch) < self.queue_size:
+                return
+            after = batch[-1].id
+
+    async def _read_forever(self) -> None:
+        """共享订阅主循环：阻塞等待推送；连接中断后重连，并让所有连接从事件流补齐中断期间的事件"""
+        prefix = f"{self.redis.sse_channel_prefix}:"
+        while True:
+            pubsub = self.redis.redis.pubsub()
+            try:
+                await pubsub.psubscribe(self.redis.sse_channel_pattern())
+                self._subscribed.set()
+                # 重连前可能丢失了推送，统一触发补齐
+                for subscribers in self._subscribers.values():
+                    for subscriber in subscribers:
+                        subscriber.mark_lagged()
+                async for message in pubsub.listen():
+                    if message.get("type") != "pmessage":
+                        continue
+                    task_id = str(message["channel"]).removeprefix(prefix)
+                    event_id, _, data = str(message["data"]).partition(" ")
+                    for subscriber in list(self._subscribers.get(task_id, ())):
+                        subscriber.deliver(TaskEvent(id=event_id, data=data))
+            except Exception as exc:
+                logger.warning("SSE 共享订阅中断，%.1fs 后重连: %s", self.reconnect_delay_seconds, exc)
+            finally:
+                self._subscribed.clear()
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(self.reconnect_delay_seconds)
+
+
+def _is_after(event_id: str, cursor: str) -> bool:
+    return _event_id_key(event_id) > _event_id_key(cursor)
+
+
+def _event_id_key(event_id: str) -> tuple[int, int]:
+    ms, _, seq = event_id.partition("-")
+    try:
+        return int(ms), int(seq or 0)
+    except ValueError:
+        return 0, 0
+
+
+def _drain(queue: asyncio.Queue) -> None:
+    while not queue.empty():
+        queue.get_nowait()
@@ -6,11 +6,12 @@ from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
+from api.dependencies import lifespan
 from api.routes.events import router as events_router
 from api.routes.tasks import router as tasks_router
 from store.database import DatabaseUnavailableError
 
-app = FastAPI(title="EvoClip API", version="0.1.0")  # 创建 FastAPI 应用实例
+app = FastAPI(title="EvoClip API", version="0.1.0", lifespan=lifespan)  # 创建 FastAPI 应用实例
 app.include_router(tasks_router)
 app.include_router(events_router)
 
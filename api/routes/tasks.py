@@ -1,47 +1,32 @@
 from __future__ import annotations
 
+import asyncio
+import re
 import uuid
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
 from pathlib import Path
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
-from fastapi.responses import StreamingResponse
-
-from api.schemas.task import TaskCreateResponse, TaskReadResponse
-from config import load_settings
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, Response, UploadFile
+from fastapi.responses import RedirectResponse, StreamingResponse
+
+from api.dependencies import get_db, get_minio, get_redis, get_settings
+from api.schemas.task import (
+    PresignedUpload,
+    TaskCreateResponse,
+    TaskReadResponse,
+    UploadCreateRequest,
+    UploadCreateResponse,
+    UploadFinalizeRequest,
+)
 from store.database import Database
-from store.minio_client import MinioStore
+from store.minio_client import MinioStore, UploadTooLargeError, iter_object_chunks
 from store.models import Task, TaskStatus
-from store.redis_client import RedisStore
+from store.redis_client import DEFAULT_QUEUE_LANE, DEFAULT_QUEUE_LANES, DEFAULT_TENANT, RedisStore
 
 router = APIRouter(prefix="/tasks", tags=["tasks"])  # 任务路由
 
-
-def get_settings():
-    """获取应用配置"""
-    return load_settings()
-
-
-def get_db(settings=Depends(get_settings)) -> Database:
-    """获取数据库连接"""
-    return Database(settings.postgres["dsn"])
-
-
-def get_minio(settings=Depends(get_settings)) -> MinioStore:
-    """获取 MinIO 存储客户端"""
-    cfg = settings.storage["minio"]
-    return MinioStore(cfg["endpoint"], cfg["access_key"], cfg["secret_key"], cfg.get("secure", False))
-
-
-def get_redis(settings=Depends(get_settings)) -> RedisStore:
-    """获取 Redis 存储客户端"""
-    app_cfg = settings.app
-    return RedisStore(
-        redis_url=settings.redis["url"],
-        task_prefix=app_cfg["task_queue_prefix"],
-        sse_channel_prefix=app_cfg["sse_channel_prefix"],
-        session_ttl=app_cfg["session_ttl_seconds"],
-        progress_ttl=app_cfg["progress_ttl_seconds"],
-    )
+TENANT_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")  # 租户名会拼入 Redis 键
 
 
 @router.post("", response_model=TaskCreateResponse)
@@ -50,6 +35,8 @@ async def create_task(
     videos: list[UploadFile] | None = File(None),
     voice_samples: list[UploadFile] | None = File(None),
     product_description: str = Form(...),
+    priority: str | None = Form(None),
+    tenant: str | None = Form(None),
     db: Database = Depends(get_db),
     minio: MinioStore = Depends(get_minio),
     redis: RedisStore = Depends(get_redis),
@@ -58,6 +45,7 @@ async def create_task(
     """创建新任务"""
     if not product_description.strip():
         raise HTTPException(status_code=400, detail="empty_product_description")
+    queue = _resolve_queue(settings, priority, tenant)
 
     uploaded_videos = [item for item in (videos or []) if item is not None]
     if not uploaded_videos and video is not None:
@@ -66,32 +54,143 @@ async def create_task(
         raise HTTPException(status_code=400, detail="empty_video_files")
 
     task_id = uuid.uuid4().hex
-    buckets = settings.storage["minio"]["buckets"]
-    minio.ensure_bucket(buckets["videos"])
+    uploads: list[tuple[str, UploadFile]] = []
     input_video_keys: list[str] = []
     for idx, uploaded in enumerate(uploaded_videos):
         suffix = Path(uploaded.filename or f"input_{idx}.mp4").suffix or ".mp4"
         object_key = f"{task_id}/source_{idx}{suffix}"
-        data = uploaded.file.read()
-        minio.upload_bytes(buckets["videos"], object_key, data, content_type=uploaded.content_type or "video/mp4")
+        uploads.append((object_key, uploaded))
         input_video_keys.append(object_key)
 
     voice_sample_keys: list[str] = []
-    if voice_samples:
-        for idx, sample in enumerate(voice_samples):
-            suffix = Path(sample.filename or f"voice_sample_{idx}.mp4").suffix or ".mp4"
-            sample_key = f"{task_id}/voice_sample_{idx}{suffix}"
-            payload = sample.file.read()
-            minio.upload_bytes(
-                buckets["videos"],
-                sample_key,
-                payload,
-                content_type=sample.content_type or "video/mp4",
+    for idx, sample in enumerate(voice_samples or []):
+        suffix = Path(sample.filename or f"voice_sample_{idx}.mp4").suffix or ".mp4"
+        sample_key = f"{task_id}/voice_sample_{idx}{suffix}"
+        uploads.append((sample_key, sample))
+        voice_sample_keys.append(sample_key)
+
+    await _upload_task_files(minio, settings, uploads)
+
+    await _create_queued_task(
+        db, redis, task_id, input_video_keys, voice_sample_keys, product_description.strip(), queue
+    )
+    return TaskCreateResponse(task_id=task_id)
+
+
+@router.post("/uploads", response_model=UploadCreateResponse)
+async def create_upload(
+    request: UploadCreateRequest,
+    minio: MinioStore = Depends(get_minio),
+    redis: RedisStore = Depends(get_redis),
+    settings=Depends(get_settings),
+) -> UploadCreateResponse:
+    """直传第一步：为每个文件签发预签名 PUT URL，文件字节不经过 API 进程"""
+    minio_cfg = settings.storage["minio"]
+    bucket = minio_cfg["buckets"]["videos"]
+    max_bytes = _max_upload_bytes(settings)
+    specs = [("video", "source", request.videos), ("voice_sample", "voice_sample", request.voice_samples)]
+    if any(spec.size > max_bytes for _kind, _stem, items in specs for spec in items):
+        raise HTTPException(status_code=413, detail="upload_too_large")
+
+    upload_id = uuid.uuid4().hex
+    expires_in = int(minio_cfg.get("presigned_upload_expires_seconds", 3600))
+    public_base_url = str(minio_cfg.get("public_base_url") or "").strip() or None
+    await asyncio.to_thread(minio.ensure_bucket, bucket)
+    files: list[PresignedUpload] = []
+    session_files: list[dict[str, object]] = []
+    for kind, stem, items in specs:
+        for idx, spec in enumerate(items):
+            suffix = Path(spec.filename).suffix or ".mp4"
+            object_key = f"{upload_id}/{stem}_{idx}{suffix}"
+            url = await asyncio.to_thread(
+                minio.presigned_put_object,
+                bucket,
+                object_key,
+                expires=timedelta(seconds=expires_in),
+                public_base_url=public_base_url,
+            )
+            files.append(
+                PresignedUpload(
+                    kind=kind,
+                    index=idx,
+                    object_key=object_key,
+                    url=url,
+                    headers={"Content-Type": spec.content_type},
+                )
             )
-            voice_sample_keys.append(sample_key)
+            session_files.append({"kind": kind, "object_key": object_key, "size": spec.size})
 
+    await redis.set_upload_session(upload_id, {"files": session_files}, expires_in)
+    return UploadCreateResponse(upload_id=upload_id, expires_in=expires_in, files=files)
+
+
+@router.post("/uploads/{upload_id}/finalize", response_model=TaskCreateResponse)
+async def finalize_upload(
+    upload_id: str,
+    request: UploadFinalizeRequest,
+    db: Database = Depends(get_db),
+    minio: MinioStore = Depends(get_minio),
+    redis: RedisStore = Depends(get_redis),
+    settings=Depends(get_settings),
+) -> TaskCreateResponse:
+    """直传第二步：用 stat_object 校验对象均已上传且大小一致，然后创建任务并入队"""
+    product_description = request.product_description.strip()
+    if not product_description:
+        raise HTTPException(status_code=400, detail="empty_product_description")
+    queue = _resolve_queue(settings, request.priority, request.tenant)
+    upload = await redis.get_upload_session(upload_id)
+    if not upload:
+        raise HTTPException(status_code=404, detail="upload_not_found")
+
+    bucket = settings.storage["minio"]["buckets"]["videos"]
+    files = upload["files"]
+    stats = await asyncio.gather(
+        *(asyncio.to_thread(minio.stat_object, bucket, item["object_key"]) for item in files),
+        return_exceptions=True,
+    )
+    max_bytes = _max_upload_bytes(settings)
+    for item, stat in zip(files, stats):
+        if isinstance(stat, FileNotFoundError):
+            # 会话保留，客户端补传后可再次调用
+            raise HTTPException(status_code=400, detail=f"upload_incomplete:{item['object_key']}")
+        if isinstance(stat, BaseException):
+            raise stat
+        if stat.size > max_bytes:
+            await redis.claim_upload_session(upload_id)
+            await asyncio.gather(
+                *(asyncio.to_thread(minio.remove_object, bucket, entry["object_key"]) for entry in files),
+                return_exceptions=True,
+            )
+            raise HTTPException(status_code=413, detail="upload_too_large")
+        if stat.size != item["size"]:
+            raise HTTPException(status_code=400, detail=f"upload_size_mismatch:{item['object_key']}")
+
+    if not await redis.claim_upload_session(upload_id):
+        raise HTTPException(status_code=409, detail="upload_already_finalized")
+    await _create_queued_task(
+        db,
+        redis,
+        upload_id,
+        [item["object_key"] for item in files if item["kind"] == "video"],
+        [item["object_key"] for item in files if item["kind"] == "voice_sample"],
+        product_description,
+        queue,
+    )
+    return TaskCreateResponse(task_id=upload_id)
+
+
+async def _create_queued_task(
+    db: Database,
+    redis: RedisStore,
+    task_id: str,
+    input_video_keys: list[str],
+    voice_sample_keys: list[str],
+    product_description: str,
+    queue: dict[str, str],
+) -> None:
+    """写入任务记录并加入队列"""
     async with db.session() as session:
-        detail = {"input_video_keys": input_video_keys}
+        detail = {"input_video_keys": input_video_keys, "queue": queue}
         if voice_sample_keys:
             detail["voice_sample_keys"] = voice_sample_keys
         task = Task(
@@ -99,14 +198,87 @@ async def create_task(
             status=TaskStatus.queued,
             progress=0,
             input_video_key=input_video_keys[0],
-            product_description=product_description.strip(),
+            product_description=product_description,
             detail=detail,
         )
         session.add(task)
 
-    await redis.enqueue_task(task_id)
-    await redis.publish_event(task_id, {"status": "queued", "progress": 0})
-    return TaskCreateResponse(task_id=task_id)
+    await redis.enqueue_task(task_id, priority=queue["priority"], tenant=queue["tenant"])
+    await redis.publish_event(task_id, {"status": "queued", "progress": 0, **queue})
+
+
+def _max_upload_bytes(settings) -> int:
+    return int(settings.app.get("max_upload_mb", 500)) * 1024 * 1024
+
+
+async def _upload_task_files(minio: MinioStore, settings, uploads: list[tuple[str, UploadFile]]) -> None:
+    """在线程池中并行分片上传，边读边校验大小并计算内容摘要；任一文件失败时清理本次已上传的对象
+
+    大小校验只约束写入对象存储的内容：Starlette 在进入路由前已把整个 multipart 请求体落盘，
+    请求体本身的上限需在反向代理或 ASGI 层限制。
+    """
+    minio_cfg = settings.storage["minio"]
+    bucket = minio_cfg["buckets"]["videos"]
+    max_bytes = _max_upload_bytes(settings)
+    part_size = int(minio_cfg.get("upload_part_size_mb", 10)) * 1024 * 1024
+    semaphore = asyncio.Semaphore(max(1, int(minio_cfg.get("upload_concurrency", 4))))
+    for _object_key, upload in uploads:
+        if upload.size is not None and upload.size > max_bytes:
+            raise HTTPException(status_code=413, detail="upload_too_large")
+
+    async def _upload(object_key: str, upload: UploadFile) -> None:
+        async with semaphore:
+            # 内容摘要在上传时顺带计算并写入对象元数据，供分析结果缓存按内容复用
+            await asyncio.to_thread(
+                minio.upload_stream,
+                bucket,
+                object_key,
+                upload.file,
+                content_type=upload.content_type or "video/mp4",
+                part_size=part_size,
+                max_bytes=max_bytes,
+                record_sha256=True,
+            )
+
+    await asyncio.to_thread(minio.ensure_bucket, bucket)
+    results = await asyncio.gather(*(_upload(key, upload) for key, upload in uploads), return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if not errors:
+        return
+    await asyncio.gather(
+        *(asyncio.to_thread(minio.remove_object, bucket, key) for key, _upload_file in uploads),
+        return_exceptions=True,
+    )
+    if any(isinstance(error, UploadTooLargeError) for error in errors):
+        raise HTTPException(status_code=413, detail="upload_too_large")
+    raise errors[0]
+
+
+def _resolve_queue(settings, priority: str | None, tenant: str | None) -> dict[str, str]:
+    """校验优先级通道与租户，缺省时使用默认通道和默认租户"""
+    app_cfg = settings.app
+    lanes = [str(lane) for lane in (app_cfg.get("queue_lanes") or DEFAULT_QUEUE_LANES)]
+    lane = (priority or "").strip() or app_cfg.get("default_queue_lane", DEFAULT_QUEUE_LANE)
+    if lane not in lanes:
+        raise HTTPException(status_code=400, detail="invalid_priority")
+    tenant_name = (tenant or "").strip() or DEFAULT_TENANT
+    if not TENANT_PATTERN.match(tenant_name):
+        raise HTTPException(status_code=400, detail="invalid_tenant")
+    return {"priority": lane, "tenant": tenant_name}
+
+
+def _retry_queue(settings, queue: object) -> dict[str, str]:
+    """重试沿用原通道与租户；旧任务没有记录或通道已不在配置中时使用默认值"""
+    queue = queue if isinstance(queue, dict) else {}
+    app_cfg = settings.app
+    lanes = [str(lane) for lane in (app_cfg.get("queue_lanes") or DEFAULT_QUEUE_LANES)]
+    lane = queue.get("priority")
+    if lane not in lanes:
+        lane = app_cfg.get("default_queue_lane", DEFAULT_QUEUE_LANE)
+    tenant = queue.get("tenant")
+    if not isinstance(tenant, str) or not TENANT_PATTERN.match(tenant):
+        tenant = DEFAULT_TENANT
+    return {"priority": lane, "tenant": tenant}
 
 
 @router.get("/{task_id}", response_model=TaskReadResponse)
@@ -121,17 +293,141 @@ async def get_task(task_id: str, db: Database = Depends(get_db)) -> TaskReadResp
 @router.get("/{task_id}/download")
 async def download_task_video(
     task_id: str,
+    request: Request,
+    redirect: bool | None = None,
     db: Database = Depends(get_db),
     minio: MinioStore = Depends(get_minio),
-):
+    settings=Depends(get_settings),
+) -> Response:
+    """下载成品视频：支持 Range 断点续传与条件请求；可选 302 跳转到预签名 URL 由 MinIO 直接传输"""
     async with db.session() as session:
         task = await session.get(Task, task_id)
         if not task or not task.output_video_key:
             raise HTTPException(status_code=404, detail="video_not_ready")
 
     bucket, object_key = task.output_video_key.split("/", 1)
-    payload = minio.download_bytes(bucket, object_key)
-    return StreamingResponse(iter([payload]), media_type="video/mp4")
+    minio_cfg = settings.storage["minio"]
+    if redirect is None:
+        redirect = bool(minio_cfg.get("download_redirect", False))
+    if redirect:
+        url = await asyncio.to_thread(
+            minio.presigned_get_object,
+            bucket,
+            object_key,
+            expires=timedelta(seconds=int(minio_cfg.get("download_url_expires_seconds", 3600))),
+            public_base_url=str(minio_cfg.get("public_base_url") or "").strip() or None,
+        )
+        return RedirectResponse(url, status_code=302)
+
+    try:
+        stat = await asyncio.to_thread(minio.stat_object, bucket, object_key)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="video_not_found")
+    size = int(stat.size)
+    etag = f'"{stat.etag.strip(chr(34))}"' if getattr(stat, "etag", None) else None
+    last_modified = getattr(stat, "last_modified", None)
+    headers = {"Accept-Ranges": "bytes"}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+
+    if _not_modified(request.headers, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if range_header and _if_range_matches(request.headers.get("if-range"), etag, last_modified):
+        try:
+            byte_range = _parse_byte_range(range_header, size)
+        except ValueError:
+            raise HTTPException(
+                status_code=416,
+                detail="range_not_satisfiable",
+                headers={"Content-Range": f"bytes */{size}"},
+            )
+
+    status_code = 200
+    offset, length = 0, size
+    if byte_range is not None:
+        start, end = byte_range
+        offset, length = start, end - start + 1
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(length)
+    if length == 0:
+        return Response(status_code=status_code, headers=headers, media_type="video/mp4")
+
+    try:
+        response = await asyncio.to_thread(minio.open_object, bucket, object_key, offset, length)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="video_not_found")
+    chunk_size = max(64, int(minio_cfg.get("download_chunk_kb", 1024))) * 1024
+    return StreamingResponse(
+        iter_object_chunks(response, chunk_size),
+        status_code=status_code,
+        headers=headers,
+        media_type="video/mp4",
+    )
+
+
+def _parse_byte_range(header: str, size: int) -> tuple[int, int] | None:
+    """解析单段 Range 头，返回闭区间 (start, end)；格式无法识别或多段时返回 None（按整文件响应），无法满足时抛出 ValueError"""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = (part.strip() for part in spec.strip().partition("-"))
+    if not sep or not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if not first:
+        # 后缀区间：bytes=-N 表示最后 N 个字节
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise ValueError("range_not_satisfiable")
+        return max(0, size - suffix), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("range_not_satisfiable")
+    end = int(last) if last else size - 1
+    return start, min(end, size - 1)
+
+
+def _not_modified(headers, etag: str | None, last_modified: datetime | None) -> bool:
+    """If-None-Match 优先；未提供时才比较 If-Modified-Since（HTTP 日期精确到秒）"""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag is not None and _etag_matches(if_none_match, etag)
+    if_modified_since = headers.get("if-modified-since")
+    if not if_modified_since or last_modified is None:
+        return False
+    since = _parse_http_date(if_modified_since)
+    return since is not None and last_modified.replace(microsecond=0) <= since
+
+
+def _if_range_matches(if_range: str | None, etag: str | None, last_modified: datetime | None) -> bool:
+    """If-Range 与当前版本一致时才按区间响应，否则返回完整文件，避免拼接出不同版本的内容"""
+    if not if_range:
+        return True
+    if if_range.strip().startswith(('"', "W/")):
+        return etag is not None and if_range.strip() == etag
+    since = _parse_http_date(if_range)
+    return since is not None and last_modified is not None and last_modified.replace(microsecond=0) == since
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match 使用弱比较
+    candidates = [item.strip().removeprefix("W/") for item in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _parse_http_date(value: str) -> datetime | None:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
 
 
 @router.post("/{task_id}/retry", response_model=TaskCreateResponse)
@@ -139,6 +435,7 @@ async def retry_task(
     task_id: str,
     db: Database = Depends(get_db),
     redis: RedisStore = Depends(get_redis),
+    settings=Depends(get_settings),
 ) -> TaskCreateResponse:
     async with db.session() as session:
         task = await session.get(Task, task_id)
@@ -148,20 +445,40 @@ async def retry_task(
         if task.status != TaskStatus.failed:
             raise HTTPException(status_code=400, detail="task_not_failed")
 
-        if not task.checkpoint:
+        # 步骤账本记录了各步骤的完成情况，重试时由 Agent 从第一个未完成或输入已变化的步骤继续
+        completed_steps = list((task.detail or {}).get("step_ledger") or {})
+        if not task.checkpoint and not completed_steps:
             raise HTTPException(status_code=400, detail="no_checkpoint_available")
 
         # 重置任务状态为排队中
         task.status = TaskStatus.queued
         task.retry_count = (task.retry_count or 0) + 1
 
-        # 清除错误信息，保留其他 detail 数据
+        # 清除错误信息，保留其他 detail 数据；原通道已从配置中移除时改入默认通道
         detail = dict(task.detail or {})
         detail.pop("error", None)
+        detail["queue"] = _retry_queue(settings, detail.get("queue"))
         task.detail = detail
 
-    # 重新将任务加入队列
-    await redis.enqueue_task(task_id)
-    await redis.publish_event(task_id, {"status": "queued", "progress": task.progress, "retry_count": task.retry_count})
+    # 重新将任务加入原优先级通道与租户队列；入队失败时恢复为失败状态，避免任务停留在排队中却不在任何队列里
+    queue = detail["queue"]
+    try:
+        await redis.enqueue_task(task_id, priority=queue["priority"], tenant=queue["tenant"])
+    except Exception as exc:
+        async with db.session() as session:
+            task = await session.get(Task, task_id)
+            if task:
+                task.status = TaskStatus.failed
+                task.detail = {**(task.detail or {}), "error": f"retry_enqueue_failed:{exc}"}
+        raise HTTPException(status_code=503, detail="task_enqueue_failed") from exc
+    await redis.publish_event(
+        task_id,
+        {
+            "status": "queued",
+            "progress": task.progress,
+            "retry_count": task.retry_count,
+            "completed_steps": completed_steps,
+        },
+    )
 
     return TaskCreateResponse(task_id=task_id)
@@ -20,3 +20,35 @@ class TaskReadResponse(BaseModel):
     detail: dict[str, Any] = Field(default_factory=dict)
     created_at: datetime | None = None
     updated_at: datetime | None = None
+
+
+class UploadFileSpec(BaseModel):
+    filename: str
+    content_type: str = "video/mp4"
+    size: int = Field(gt=0)
+
+
+class UploadCreateRequest(BaseModel):
+    videos: list[UploadFileSpec] = Field(min_length=1)
+    voice_samples: list[UploadFileSpec] = Field(default_factory=list)
+
+
+class PresignedUpload(BaseModel):
+    kind: str
+    index: int
+    object_key: str
+    url: str
+    method: str = "PUT"
+    headers: dict[str, str] = Field(default_factory=dict)
+
+
+class UploadCreateResponse(BaseModel):
+    upload_id: str
+    expires_in: int
+    files: list[PresignedUpload]
+
+
+class UploadFinalizeRequest(BaseModel):
+    product_description: str
+    priority: str | None = None
+    tenant: str | None = None
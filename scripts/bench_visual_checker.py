@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import argparse
+from time import perf_counter
+
+import numpy as np
+
+from skills.quality_evaluation.visual_checker import brightness_batch, laplacian_variance_batch
+
+
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="对比逐像素与向量化拉普拉斯模糊检测的得分与耗时")
+    parser.add_argument("--frames", type=int, default=4, help="参与对比的帧数")
+    parser.add_argument("--height", type=int, default=270, help="帧高度（逐像素实现很慢，默认使用 1080p 的 1/4）")
+    parser.add_argument("--width", type=int, default=480, help="帧宽度")
+    parser.add_argument("--seed", type=int, default=7, help="随机种子")
+    return parser.parse_args()
+
+
+def reference_laplacian_variance(gray: np.ndarray) -> float:
+    """原始逐像素实现，作为得分基准"""
+    kernel = np.array([[0, 1, 0], [1, -4, 1], [0, 1, 0]], dtype=np.float32)
+    padded = np.pad(gray, ((1, 1), (1, 1)), mode="edge")
+    conv = np.zeros_like(gray, dtype=np.float32)
+    for i in range(gray.shape[0]):
+        for j in range(gray.shape[1]):
+            conv[i, j] = np.sum(padded[i : i + 3, j : j + 3] * kernel)
+    return float(np.var(conv))
+
+
+def build_frames(count: int, height: int, width: int, seed: int) -> np.ndarray:
+    """生成混合噪声、平滑渐变与黑屏的测试帧"""
+    rng = np.random.default_rng(seed)
+    frames = rng.integers(0, 256, size=(count, height, width)).astype(np.float32)
+    if count > 1:
+        frames[1] = np.linspace(0, 255, width, dtype=np.float32)[np.newaxis, :].repeat(height, axis=0)
+    if count > 2:
+        frames[2] = 0
+    return frames
+
+
+def main() -> None:
+    """主函数"""
+    args = parse_args()
+    frames = build_frames(max(1, args.frames), args.height, args.width, args.seed)
+
+    started = perf_counter()
+    reference = np.array([reference_laplacian_variance(frame) for frame in frames], dtype=np.float64)
+    reference_ms = (perf_counter() - started) * 1000
+
+    started = perf_counter()
+    vectorized = laplacian_variance_batch(frames).astype(np.float64)
+    brightness = brightness_batch(frames)
+    vectorized_ms = (perf_counter() - started) * 1000
+
+    max_rel_error = float(np.max(np.abs(vectorized - reference) / np.maximum(np.abs(reference), 1.0)))
+    print(f"frames={len(frames)} size={args.width}x{args.height}")
+    print(f"reference_ms={reference_ms:.1f} vectorized_ms={vectorized_ms:.1f} speedup={reference_ms / max(vectorized_ms, 1e-6):.0f}x")
+    for index, (ref, vec, bright) in enumerate(zip(reference, vectorized, brightness)):
+        print(f"frame={index} reference={ref:.4f} vectorized={vec:.4f} brightness={bright:.2f}")
+    print(f"max_rel_error={max_rel_error:.2e}")
+    if max_rel_error > 1e-4:
+        raise SystemExit("vectorized scores diverge from reference implementation")
+
+
+if __name__ == "__main__":
+    main()
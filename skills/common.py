@@ -2,9 +2,12 @@ from __future__ import annotations
 
 import asyncio
 import json
+import time
+from collections import deque
 from collections.abc import Awaitable, Callable
+from contextlib import AbstractAsyncContextManager, nullcontext
 from dataclasses import dataclass
-from typing import TypeVar
+from typing import Any, TypeVar
 
 from config import Settings, load_settings
 
@@ -33,6 +36,167 @@ async def retry_async(fn: Callable[[], Awaitable[T]], policy: RetryPolicy) -> T:
     raise last_exc
 
 
+OVERLOAD_MARKERS = ("429", "throttl", "rate limit", "ratelimit", "too many requests", "quota")
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    """判断异常是否为服务端过载信号（429/限流/超时），用于自适应并发收缩"""
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)):
+        return True
+    status_code = getattr(exc, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(exc, "response", None), "status_code", None)
+    if status_code == 429:
+        return True
+    text = f"{type(exc).__name__}:{exc}".lower()
+    return any(marker in text for marker in OVERLOAD_MARKERS)
+
+
+class AdaptiveLimiter:
+    """AIMD 自适应并发限制器：每完成一个窗口（当前上限个）成功调用上限 +1，遇到过载信号上限按比例收缩"""
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        decrease_factor: float = 0.5,
+        cooldown_seconds: float = 1.0,
+    ) -> None:
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.decrease_factor = min(max(decrease_factor, 0.1), 0.95)
+        self.cooldown_seconds = max(0.0, cooldown_seconds)
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self._successes = 0
+        self._last_decrease = float("-inf")
+        self.stats = {
+            "successes": 0,
+            "overloads": 0,
+            "failures": 0,
+            "increases": 0,
+            "decreases": 0,
+            "max_queue_depth": 0,
+        }
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    async def acquire(self) -> None:
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            return
+        waiter: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue_depth)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 已分配到名额但调用方被取消：归还名额
+                self._in_flight -= 1
+                self._wake_waiters()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self, exc: BaseException | None = None) -> None:
+        """归还名额并根据调用结果调整上限；exc 为 None 表示成功"""
+        self._in_flight = max(0, self._in_flight - 1)
+        if exc is None:
+            self.stats["successes"] += 1
+            self._successes += 1
+            if self._successes >= self.limit and self._limit < self.max_limit:
+                self._limit = min(float(self.max_limit), self._limit + 1)
+                self._successes = 0
+                self.stats["increases"] += 1
+        elif is_overload_error(exc):
+            self.stats["overloads"] += 1
+            now = time.monotonic()
+            # 同一波突发中的多个失败只收缩一次，避免上限被瞬间压到最低
+            if now - self._last_decrease >= self.cooldown_seconds:
+                self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+                self._last_decrease = now
+                self._successes = 0
+                self.stats["decreases"] += 1
+        elif not isinstance(exc, asyncio.CancelledError):
+            self.stats["failures"] += 1
+        self._wake_waiters()
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            **self.stats,
+        }
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self._in_flight += 1
+            waiter.set_result(None)
+
+    async def __aenter__(self) -> AdaptiveLimiter:
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, _exc_type: Any, exc: BaseException | None, _tb: Any) -> None:
+        self.release(exc)
+
+
+_LIMITERS: dict[str, AdaptiveLimiter] = {}
+
+
+def get_limiter(name: str) -> AdaptiveLimiter:
+    """获取进程内共享的外部调用限制器（vision/asr/tts/llm/embedding），参数取自 concurrency 配置"""
+    limiter = _LIMITERS.get(name)
+    if limiter is None:
+        concurrency_cfg = get_settings().data.get("concurrency", {})
+        cfg = concurrency_cfg.get(name, {}) if isinstance(concurrency_cfg, dict) else {}
+        limiter = AdaptiveLimiter(
+            name=name,
+            initial_limit=int(cfg.get("initial", 4)),
+            min_limit=int(cfg.get("min", 1)),
+            max_limit=int(cfg.get("max", 16)),
+            decrease_factor=float(concurrency_cfg.get("decrease_factor", 0.5)),
+            cooldown_seconds=float(concurrency_cfg.get("cooldown_seconds", 1.0)),
+        )
+        _LIMITERS[name] = limiter
+    return limiter
+
+
+def limiter_metrics(names: list[str] | None = None) -> dict[str, dict[str, Any]]:
+    """导出限制器当前上限、并发数与排队深度"""
+    selected = names if names is not None else sorted(_LIMITERS)
+    return {name: _LIMITERS[name].snapshot() for name in selected if name in _LIMITERS}
+
+
+def limited(limiter: AdaptiveLimiter | None) -> AbstractAsyncContextManager[Any]:
+    """未配置限制器时退化为空上下文，便于适配器单独使用"""
+    return limiter if limiter is not None else nullcontext()
+
+
 def get_settings() -> Settings:
     return load_settings()
 
@@ -8,7 +8,9 @@ from openai import AsyncOpenAI
 from skills.common import (
     RetryPolicy,
     get_credential,
+    get_limiter,
     get_settings,
+    limited,
     parse_json_payload,
     retry_async,
 )
@@ -33,6 +35,7 @@ class CopyGenerationService:
         if llm_base_url:
             client_kwargs["base_url"] = llm_base_url
         self.client = AsyncOpenAI(**client_kwargs)
+        self.limiter = get_limiter("llm")
         self.model = llm_cfg["model"]
         self.timeout_seconds = int(llm_cfg.get("timeout_seconds", 30))
         self.speech_rate_chars_per_second = float(copy_cfg.get("speech_rate_chars_per_second", 3.8))
@@ -82,11 +85,12 @@ class CopyGenerationService:
         )
 
         async def _call_llm() -> list[dict[str, Any]]:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                timeout=self.timeout_seconds,
-            )
+            async with limited(self.limiter):
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    timeout=self.timeout_seconds,
+                )
             text = response.choices[0].message.content or "[]"
             payload = parse_json_payload(text)
             if not isinstance(payload, list):
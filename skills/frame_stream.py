@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import queue
+import re
+import subprocess
+import threading
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Literal
+
+import ffmpeg
+import numpy as np
+
+PixelFormat = Literal["gray", "rgb24"]
+
+_CHANNELS: dict[str, int] = {"gray": 1, "rgb24": 3}
+_PTS_TIME_RE = re.compile(r"\bn:\s*(\d+)\b.*?\bpts_time:\s*(-?[\d.]+)")
+_TIMESTAMP_WAIT_SECONDS = 5.0  # 等待 showinfo 时间戳的最长时间，超时回退到 index / fps
+
+
+@dataclass(frozen=True)
+class VideoStreamInfo:
+    width: int
+    height: int
+    duration_ms: int
+
+
+@dataclass
+class RawFrame:
+    index: int
+    timestamp_ms: int
+    data: np.ndarray  # 指向可复用缓冲区的视图；需要保留时请 copy()
+
+
+@dataclass
+class FrameBatch:
+    start_index: int
+    timestamps_ms: list[int]
+    data: np.ndarray  # 形状 (N, H, W[, C])，同样指向可复用缓冲区
+
+
+def probe_video_stream(video_path: str | Path) -> VideoStreamInfo:
+    """探测视频宽高（已考虑旋转元数据）与时长"""
+    probe = ffmpeg.probe(str(video_path))
+    stream = next((item for item in probe.get("streams", []) if item.get("codec_type") == "video"), None)
+    if stream is None:
+        raise ValueError("video_stream_not_found")
+    width = int(stream["width"])
+    height = int(stream["height"])
+    if _stream_rotation(stream) in {90, 270}:
+        # ffmpeg 默认自动旋转，输出帧的宽高与编码尺寸互换
+        width, height = height, width
+    duration = float(probe.get("format", {}).get("duration") or stream.get("duration") or 0)
+    return VideoStreamInfo(width=width, height=height, duration_ms=int(duration * 1000))
+
+
+def _stream_rotation(stream: dict) -> int:
+    rotate = (stream.get("tags") or {}).get("rotate")
+    for side_data in stream.get("side_data_list") or []:
+        if "rotation" in side_data:
+            rotate = side_data["rotation"]
+    try:
+        return int(float(rotate)) % 360 if rotate is not None else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+class FrameStream:
+    """通过 ffmpeg stdout 管道按固定帧率读取原始帧，避免 JPEG 落盘与重复解码"""
+
+    def __init__(
+        self,
+        video_path: str | Path,
+        fps: float = 1,
+        pix_fmt: PixelFormat = "gray",
+        info: VideoStreamInfo | None = None,
+    ) -> None:
+        if pix_fmt not in _CHANNELS:
+            raise ValueError(f"unsupported_pix_fmt:{pix_fmt}")
+        self.video_path = str(video_path)
+        self.fps = fps
+        self.pix_fmt = pix_fmt
+        self.info = info or probe_video_stream(self.video_path)
+        self.channels = _CHANNELS[pix_fmt]
+
+    @property
+    def frame_shape(self) -> tuple[int, ...]:
+        if self.channels == 1:
+            return (self.info.height, self.info.width)
+        return (self.info.height, self.info.width, self.channels)
+
+    def command(self) -> list[str]:
+        return [
+            "ffmpeg",
+            "-hide_banner",
+            "-nostats",
+            "-loglevel",
+            "info",
+            "-i",
+            self.video_path,
+            "-vf",
+            f"fps={self.fps},showinfo",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            self.pix_fmt,
+            "pipe:1",
+        ]
+
+    def __iter__(self) -> Iterator[RawFrame]:
+        buffer = np.empty(self.frame_shape, dtype=np.uint8)
+        for index, timestamp_ms in self._read_into(lambda _index: buffer):
+            yield RawFrame(index=index, timestamp_ms=timestamp_ms, data=buffer)
+
+    def iter_batches(self, batch_size: int) -> Iterator[FrameBatch]:
+        """按批读取帧到同一个预分配的 (N, H, W[, C]) 缓冲区"""
+        size = max(1, int(batch_size))
+        buffer = np.empty((size, *self.frame_shape), dtype=np.uint8)
+        start_index = 0
+        timestamps: list[int] = []
+        for index, timestamp_ms in self._read_into(lambda index: buffer[index % size]):
+            timestamps.append(timestamp_ms)
+            if len(timestamps) == size:
+                yield FrameBatch(start_index=start_index, timestamps_ms=timestamps, data=buffer)
+                start_index = index + 1
+                timestamps = []
+        if timestamps:
+            yield FrameBatch(start_index=start_index, timestamps_ms=timestamps, data=buffer[: len(timestamps)])
+
+    def _read_into(self, target_for: Callable[[int], np.ndarray]) -> Iterator[tuple[int, int]]:
+        frame_bytes = int(np.prod(self.frame_shape))
+        process = subprocess.Popen(
+            self.command(),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        timestamps: queue.Queue[int | None] = queue.Queue()
+        reader = threading.Thread(target=_collect_timestamps, args=(process.stderr, timestamps), daemon=True)
+        reader.start()
+        stderr_done = False
+        exhausted = False
+        index = 0
+        try:
+            while True:
+                target = target_for(index)
+                if not _read_exact(process.stdout, memoryview(target).cast("B"), frame_bytes):
+                    exhausted = True
+                    break
+                timestamp_ms: int | None = None
+                if not stderr_done:
+                    try:
+                        timestamp_ms = timestamps.get(timeout=_TIMESTAMP_WAIT_SECONDS)
+                    except queue.Empty:
+                        timestamp_ms = None
+                    if timestamp_ms is None:
+                        stderr_done = True
+                if timestamp_ms is None:
+                    timestamp_ms = int(index / self.fps * 1000)
+                yield index, timestamp_ms
+                index += 1
+        finally:
+            if not exhausted and process.poll() is None:
+                # 调用方提前结束迭代，不再需要剩余帧
+                process.kill()
+            process.wait()
+            reader.join(timeout=1)
+        # 只有读到流结束才会执行到这里：调用方提前关闭时 GeneratorExit 已在 finally 后抛出。
+        # 中途解码失败同样报错，避免分析与质检在截断的视频上静默继续
+        if process.returncode != 0:
+            raise RuntimeError(f"ffmpeg_frame_stream_failed:{process.returncode}")
+
+
+def _read_exact(stream: IO[bytes], view: memoryview, size: int) -> bool:
+    """读满一帧到缓冲区；流结束时返回 False"""
+    filled = 0
+    while filled < size:
+        count = stream.readinto(view[filled:size])
+        if not count:
+            return False
+        filled += count
+    return True
+
+
+def _collect_timestamps(stderr: IO[bytes], output: queue.Queue[int | None]) -> None:
+    """从 showinfo 日志中解析每帧的 pts_time"""
+    try:
+        for raw_line in iter(stderr.readline, b""):
+            match = _PTS_TIME_RE.search(raw_line.decode("utf-8", errors="replace"))
+            if match:
+                output.put(int(round(float(match.group(2)) * 1000)))
+    finally:
+        output.put(None)
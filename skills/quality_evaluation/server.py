@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import tempfile
 from datetime import datetime, timezone
@@ -40,6 +41,10 @@ class QualityEvaluationService:
         )
 
     async def evaluate_quality(self, task_id: str, timeline_path: str, video_path: str) -> dict[str, Any]:
+        # 下载、ffprobe 与逐帧画面检测都是阻塞调用，放到线程中执行
+        return await asyncio.to_thread(self._evaluate_quality_sync, task_id, timeline_path, video_path)
+
+    def _evaluate_quality_sync(self, task_id: str, timeline_path: str, video_path: str) -> dict[str, Any]:
         try:
             timeline_bucket, timeline_object = split_bucket_object(timeline_path)
             video_bucket, video_object = split_bucket_object(video_path)
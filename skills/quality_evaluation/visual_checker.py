@@ -1,47 +1,66 @@
 from __future__ import annotations
 
-import subprocess
-import tempfile
+from collections.abc import Sequence
 from pathlib import Path
 
 import numpy as np
-from PIL import Image
+
+from skills.frame_stream import FrameStream
+
+BLACK_SCREEN_BRIGHTNESS = 10  # 平均亮度低于该值视为黑屏
+BLUR_VARIANCE_THRESHOLD = 100  # 拉普拉斯方差低于该值视为模糊
+FRAME_BATCH_SIZE = 16  # 单批处理的帧数，限制 1080p 长视频的内存占用
+
+
+def laplacian_variance_batch(frames: np.ndarray) -> np.ndarray:
+    """批量计算拉普拉斯方差，frames 形状为 (N, H, W)"""
+    gray = np.asarray(frames, dtype=np.float32)
+    if gray.ndim != 3:
+        raise ValueError("frames_must_be_3d")
+    # 与逐像素卷积一致：边缘复制填充后用切片实现 3x3 拉普拉斯核
+    padded = np.pad(gray, ((0, 0), (1, 1), (1, 1)), mode="edge")
+    center = padded[:, 1:-1, 1:-1]
+    conv = padded[:, :-2, 1:-1] + padded[:, 2:, 1:-1] + padded[:, 1:-1, :-2] + padded[:, 1:-1, 2:] - 4 * center
+    return np.var(conv, axis=(1, 2))
+
+
+def brightness_batch(frames: np.ndarray) -> np.ndarray:
+    """批量计算平均亮度，frames 形状为 (N, H, W)"""
+    return np.mean(np.asarray(frames, dtype=np.float32), axis=(1, 2))
 
 
 def _laplacian_variance(gray: np.ndarray) -> float:
     """计算拉普拉斯方差（用于检测模糊）"""
-    kernel = np.array([[0, 1, 0], [1, -4, 1], [0, 1, 0]], dtype=np.float32)
-    padded = np.pad(gray, ((1, 1), (1, 1)), mode="edge")
-    conv = np.zeros_like(gray, dtype=np.float32)
-    for i in range(gray.shape[0]):
-        for j in range(gray.shape[1]):
-            conv[i, j] = np.sum(padded[i : i + 3, j : j + 3] * kernel)
-    return float(np.var(conv))
+    return float(laplacian_variance_batch(gray[np.newaxis, ...])[0])
+
 
+def scan_frame_scores(
+    brightness: np.ndarray,
+    blur: np.ndarray,
+    timestamps_ms: Sequence[int],
+    interval_ms: int = 1000,
+) -> list[dict]:
+    """根据亮度与模糊得分生成视觉问题列表"""
+    issues: list[dict] = []
+    for start_ms, frame_brightness, blur_var in zip(timestamps_ms, brightness.tolist(), blur.tolist()):
+        end_ms = start_ms + interval_ms
+        if frame_brightness < BLACK_SCREEN_BRIGHTNESS:
+            issues.append({"type": "black_screen", "start_ms": start_ms, "end_ms": end_ms})
+        if blur_var < BLUR_VARIANCE_THRESHOLD:
+            issues.append({"type": "blur", "start_ms": start_ms, "end_ms": end_ms})
+    return issues
 
-def detect_visual_issues(video_path: Path) -> list[dict]:
+
+def detect_visual_issues(video_path: Path, batch_size: int = FRAME_BATCH_SIZE) -> list[dict]:
     """检测视频的视觉问题（黑屏、模糊等）"""
-    with tempfile.TemporaryDirectory(prefix="evoclip-visual-") as tmp:
-        pattern = Path(tmp) / "frame_%06d.jpg"
-        subprocess.check_call(
-            ["ffmpeg", "-y", "-i", str(video_path), "-vf", "fps=1", str(pattern)],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
+    stream = FrameStream(video_path, fps=1, pix_fmt="gray")
+    issues: list[dict] = []
+    for batch in stream.iter_batches(batch_size):
+        issues.extend(
+            scan_frame_scores(
+                brightness_batch(batch.data),
+                laplacian_variance_batch(batch.data),
+                batch.timestamps_ms,
+            )
         )
-
-        frame_files = sorted(Path(tmp).glob("frame_*.jpg"))
-        issues: list[dict] = []
-        for index, frame in enumerate(frame_files):
-            image = Image.open(frame).convert("L")
-            gray = np.array(image, dtype=np.float32)
-            brightness = float(np.mean(gray))
-            blur_var = _laplacian_variance(gray)
-            start_ms = index * 1000
-            end_ms = start_ms + 1000
-
-            if brightness < 10:
-                issues.append({"type": "black_screen", "start_ms": start_ms, "end_ms": end_ms})
-            if blur_var < 100:
-                issues.append({"type": "blur", "start_ms": start_ms, "end_ms": end_ms})
-
-        return issues
+    return issues
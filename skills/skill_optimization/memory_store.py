@@ -8,6 +8,8 @@ from typing import Any
 import chromadb
 from openai import AsyncOpenAI
 
+from skills.common import AdaptiveLimiter, limited
+
 try:
     import dashscope
 except Exception:  # pragma: no cover
@@ -23,7 +25,9 @@ class MemoryStore:
         openai_base_url: str | None = None,
         dashscope_api_key: str | None = None,
         dashscope_base_url: str | None = None,
+        limiter: AdaptiveLimiter | None = None,
     ) -> None:
+        self.limiter = limiter
         self.client = chromadb.PersistentClient(path=path)
         self.collection = self.client.get_or_create_collection(collection_name)
         client_kwargs: dict[str, str] = {}
@@ -42,9 +46,10 @@ class MemoryStore:
 
     async def embed(self, text: str, model: str) -> list[float]:
         """生成文本嵌入向量"""
-        if self._is_multimodal_model(model):
-            return await self._embed_dashscope_multimodal(text, model)
-        result = await self.embed_client.embeddings.create(model=model, input=text)
+        async with limited(self.limiter):
+            if self._is_multimodal_model(model):
+                return await self._embed_dashscope_multimodal(text, model)
+            result = await self.embed_client.embeddings.create(model=model, input=text)
         return list(result.data[0].embedding)
 
     def count(self) -> int:
@@ -8,7 +8,7 @@ import yaml
 from openai import AsyncOpenAI
 from sqlalchemy import select
 
-from skills.common import get_credential, get_settings, parse_json_payload
+from skills.common import get_credential, get_limiter, get_settings, limited, parse_json_payload
 from skills.skill_optimization.memory_store import MemoryStore
 from store.database import Database
 from store.models import SkillVersion
@@ -43,6 +43,7 @@ class SkillOptimizationService:
         if llm_base_url:
             llm_client_kwargs["base_url"] = llm_base_url
         self.client = AsyncOpenAI(**llm_client_kwargs)
+        self.limiter = get_limiter("llm")
         self.model = settings.data["llm"]["model"]
         self.embedding_model = settings.data["embedding"]["model"]
         embedding_api_key = get_credential(settings, "embedding_api_key", fallback_name="dashscope_api_key")
@@ -58,6 +59,7 @@ class SkillOptimizationService:
             openai_base_url=embedding_base_url,
             dashscope_api_key=dashscope_api_key,
             dashscope_base_url=dashscope_base_url,
+            limiter=get_limiter("embedding"),
         )
         self.db = Database(settings.postgres["dsn"])
 
@@ -105,10 +107,11 @@ class SkillOptimizationService:
 
     async def _request_suggestions(self, prompt: str) -> list[dict[str, Any]]:
         """请求优化建议"""
-        response = await self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-        )
+        async with limited(self.limiter):
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+            )
         text = response.choices[0].message.content or "[]"
         payload = parse_json_payload(text)
         if isinstance(payload, list):
@@ -4,17 +4,22 @@ import subprocess
 from dataclasses import dataclass
 from pathlib import Path
 
-import ffmpeg
+from PIL import Image
+
+from skills.frame_stream import FrameStream
+from skills.video_analysis.shot_detector import Shot, ShotDetector
 
 SUPPORTED_EXTENSIONS = {".mp4", ".mov"}  # 支持的视频格式
 MAX_VIDEO_SIZE_MB = 500  # 最大视频大小（MB）
 MAX_VIDEO_SIZE_BYTES = MAX_VIDEO_SIZE_MB * 1024 * 1024  # 最大视频大小（字节）
+JPEG_QUALITY = 92  # 送入视觉接口的关键帧质量，约等于 ffmpeg qscale=2
 
 
 @dataclass
 class FrameInfo:
     path: Path
     timestamp_ms: int
+    shot_end_ms: int | None = None  # 镜头采样时为镜头结束时间，timestamp_ms 为镜头起点
 
 
 class VideoValidationError(ValueError):
@@ -30,26 +35,46 @@ def validate_video_file(file_name: str, file_size: int) -> None:
         raise VideoValidationError("video_too_large")
 
 
-def extract_frames(video_path: str, output_dir: str, fps: int = 1) -> list[FrameInfo]:
-    """从视频中提取帧"""
+def extract_frames(
+    video_path: str,
+    output_dir: str,
+    fps: int = 1,
+    shot_detector: ShotDetector | None = None,
+) -> list[FrameInfo]:
+    """从视频中提取帧：从 ffmpeg 管道读取原始 RGB 帧，仅由 PIL 编码一次 JPEG 供视觉接口使用
+
+    传入 shot_detector 时按镜头切分，每个镜头只落盘一张关键帧，时间戳为镜头起点。
+    """
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
-    frame_pattern = str(output_path / "frame_%06d.jpg")
-
-    (
-        ffmpeg.input(video_path)
-        .output(frame_pattern, vf=f"fps={fps}", qscale=2)
-        .overwrite_output()
-        .run(quiet=True)
-    )
-
-    probe = ffmpeg.probe(video_path)
-    duration = float(probe["format"]["duration"])
-    frame_files = sorted(output_path.glob("frame_*.jpg"))
+
+    stream = FrameStream(video_path, fps=fps, pix_fmt="rgb24")
     result: list[FrameInfo] = []
-    for index, frame_file in enumerate(frame_files):
-        timestamp_ms = int(min(index / fps, duration) * 1000)
-        result.append(FrameInfo(path=frame_file, timestamp_ms=timestamp_ms))
+    if shot_detector is None:
+        for frame in stream:
+            frame_file = output_path / f"frame_{frame.index + 1:06d}.jpg"
+            Image.fromarray(frame.data).save(frame_file, format="JPEG", quality=JPEG_QUALITY)
+            result.append(FrameInfo(path=frame_file, timestamp_ms=frame.timestamp_ms))
+        return result
+
+    def _write_shot(shot: Shot) -> None:
+        frame_file = output_path / f"shot_{len(result) + 1:06d}.jpg"
+        Image.fromarray(shot.keyframe).save(frame_file, format="JPEG", quality=JPEG_QUALITY)
+        result.append(
+            FrameInfo(
+                path=frame_file,
+                timestamp_ms=shot.start_ms,
+                shot_end_ms=shot.end_ms,
+            )
+        )
+
+    for frame in stream:
+        closed = shot_detector.push(frame)
+        if closed is not None:
+            _write_shot(closed)
+    last = shot_detector.finish(stream.info.duration_ms or None)
+    if last is not None:
+        _write_shot(last)
     return result
 
 
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import json
 import logging
 import tempfile
@@ -10,7 +11,7 @@ from pathlib import Path
 from time import perf_counter
 from typing import Any
 
-from skills.common import RetryPolicy, get_settings, retry_async
+from skills.common import RetryPolicy, get_limiter, get_settings, limiter_metrics, retry_async
 from skills.video_analysis.frame_extractor import (
     FrameInfo,
     MAX_VIDEO_SIZE_BYTES,
@@ -19,9 +20,11 @@ from skills.video_analysis.frame_extractor import (
     get_video_duration_ms,
     validate_video_file,
 )
+from skills.video_analysis.shot_detector import ShotDetector
 from skills.video_analysis.speech_recognizer import SpeechRecognizer
 from skills.video_analysis.vision_adapter import VisionAdapter
-from store.minio_client import MinioStore
+from skills.video_analysis.vision_cache import VisionCache
+from store.minio_client import MinioStore, stored_content_sha256
 
 try:
     from mcp.server.fastmcp import FastMCP
@@ -30,6 +33,7 @@ except Exception:  # pragma: no cover
 
 ProgressCallback = Callable[[dict[str, Any]], Awaitable[None]]
 logger = logging.getLogger(__name__)
+RESULT_CACHE_VERSION = 4  # 分析逻辑或缓存键变化导致旧结果失效时递增
 
 
 @dataclass
@@ -45,6 +49,21 @@ class Scene:
     source_end_ms: int | None = None
 
 
+@dataclass
+class _Transcription:
+    segments: list[dict[str, Any]] | None
+    elapsed_ms: int
+
+
+@dataclass
+class _PreparedVideo:
+    video_path: Path
+    frames: list[FrameInfo]
+    source_duration_ms: int
+    prepare_elapsed_ms: int
+    transcription_task: asyncio.Task[_Transcription]
+
+
 class VideoAnalysisService:
     def __init__(self) -> None:
         settings = get_settings()
@@ -59,23 +78,45 @@ class VideoAnalysisService:
         self.frame_sample_fps = max(1, int(analysis_cfg.get("frame_sample_fps", 1)))
         self.max_frames = max(1, int(analysis_cfg.get("max_frames", 12)))
         self.frame_analysis_concurrency = max(1, int(analysis_cfg.get("frame_analysis_concurrency", 3)))
+        self.prefetch_videos = max(0, int(analysis_cfg.get("prefetch_videos", 1)))
+        self.frame_sampling = str(analysis_cfg.get("frame_sampling", "scene")).strip().lower() or "scene"
+        self.shot_sample_fps = max(1, int(analysis_cfg.get("shot_sample_fps", 2)))
+        self.shot_threshold = float(analysis_cfg.get("shot_threshold", 0.35))
+        self.min_shot_ms = int(analysis_cfg.get("min_shot_ms", 1000))
+        self.result_cache_enabled = bool(analysis_cfg.get("result_cache_enabled", True))
+        self.result_cache_prefix = str(analysis_cfg.get("result_cache_prefix", "analysis-cache")).strip("/") or "analysis-cache"
         self.minio = MinioStore(
             endpoint=minio_cfg["endpoint"],
             access_key=minio_cfg["access_key"],
             secret_key=minio_cfg["secret_key"],
             secure=minio_cfg.get("secure", False),
         )
+        self.vision_batch_size = max(1, int(settings.data["vision"].get("batch_size", 1)))
         self.vision = VisionAdapter(
             model=settings.data["vision"]["model"],
             timeout_seconds=int(settings.data["vision"]["timeout_seconds"]),
             api_key=dashscope_api_key,
             base_url=dashscope_base_url,
+            limiter=get_limiter("vision"),
         )
+        self.vision_cache: VisionCache | None = None
+        cache_cfg = settings.data.get("vision_cache", {})
+        if bool(cache_cfg.get("enabled", True)):
+            self.vision_cache = VisionCache(
+                model=settings.data["vision"]["model"],
+                key_mode=str(cache_cfg.get("key_mode", "phash")),
+                local_max_entries=int(cache_cfg.get("local_max_entries", 2048)),
+                local_ttl_seconds=int(cache_cfg.get("local_ttl_seconds", 3600)),
+                redis_url=settings.redis["url"] if bool(cache_cfg.get("redis_enabled", True)) else None,
+                redis_prefix=str(cache_cfg.get("redis_prefix", "evoclip:vision")),
+                redis_ttl_seconds=int(cache_cfg.get("redis_ttl_seconds", 7 * 24 * 3600)),
+            )
         self.speech = SpeechRecognizer(
             model=settings.data["speech_recognition"]["model"],
             timeout_seconds=int(settings.data["speech_recognition"]["timeout_seconds"]),
             api_key=dashscope_api_key,
             base_url=dashscope_base_url,
+            limiter=get_limiter("asr"),
         )
 
     async def analyze_video(
@@ -89,120 +130,188 @@ class VideoAnalysisService:
         if not normalized_video_keys:
             return {"error": "empty_video_keys"}
 
+        lookup_started = perf_counter()
+        video_stats = await asyncio.gather(
+            *(
+                asyncio.to_thread(self.minio.client.stat_object, self.buckets["videos"], key)
+                for key in normalized_video_keys
+            )
+        )
+        # 摘要优先取上传时写入的元数据，无需读取对象；缺失时（直传对象）在下载后对本地文件计算
+        digests = [stored_content_sha256(stat) for stat in video_stats]
+        result_cache_key: str | None = None
+        if self.result_cache_enabled and all(digests):
+            result_cache_key = self._result_cache_key(digests)
+            cached = await self._load_cached_result(
+                task_id, result_cache_key, normalized_video_keys, lookup_started, progress_callback
+            )
+            if cached is not None:
+                return cached
+
         all_scenes: list[Scene] = []
+        scene_video_indexes: list[int] = []
         per_video_metrics: list[dict[str, Any]] = []
         total_extracted_frames = 0
         total_analyzed_frames = 0
+        total_vision_cache_hits = 0
         offset_ms = 0
         with tempfile.TemporaryDirectory(prefix="evoclip-video-") as tmp:
             tmp_dir = Path(tmp)
-            for video_idx, input_video_key in enumerate(normalized_video_keys):
-                file_name = Path(input_video_key).name
-                await self._emit_progress(
-                    progress_callback,
-                    {
-                        "stage": "video_started",
-                        "video_index": video_idx,
-                        "total_videos": len(normalized_video_keys),
-                        "video_object_key": input_video_key,
-                    },
-                )
-                stat = self.minio.client.stat_object(self.buckets["videos"], input_video_key)
-                try:
-                    validate_video_file(file_name, stat.size)
-                except VideoValidationError as exc:
-                    return {"error": str(exc), "max_size_bytes": MAX_VIDEO_SIZE_BYTES, "file_size_bytes": stat.size}
-
-                video_path = tmp_dir / f"{video_idx}_{file_name}"
-                frame_dir = tmp_dir / f"frames_{video_idx}"
-                self.minio.download_file(self.buckets["videos"], input_video_key, str(video_path))
-
-                frames = extract_frames(str(video_path), str(frame_dir), fps=self.frame_sample_fps)
-                if not frames:
-                    return {"error": "empty_video", "video_object_key": input_video_key}
-                frames_for_analysis, frame_limited = self._limit_frames(frames)
-                skipped_frames = max(0, len(frames) - len(frames_for_analysis))
-                total_extracted_frames += len(frames)
-                total_analyzed_frames += len(frames_for_analysis)
-                await self._emit_progress(
-                    progress_callback,
-                    {
-                        "stage": "frames_selected",
-                        "video_index": video_idx,
-                        "video_object_key": input_video_key,
-                        "extracted_frames": len(frames),
-                        "selected_frames": len(frames_for_analysis),
-                        "skipped_frames": skipped_frames,
-                        "frame_limit_applied": frame_limited,
-                    },
-                )
+            downloaded: dict[int, Path] = {}
+            if self.result_cache_enabled and result_cache_key is None:
+                # 分析本来就要下载全部源视频：提前下载并对本地文件计算摘要，避免为缓存键额外读取一遍对象
+                local_videos = await self._download_videos(tmp_dir, normalized_video_keys, video_stats)
+                if isinstance(local_videos, dict):
+                    return local_videos
+                downloaded = dict(enumerate(local_videos))
+                result_cache_key = await self._digest_local_videos(normalized_video_keys, video_stats, digests, local_videos)
+                if result_cache_key:
+                    cached = await self._load_cached_result(
+                        task_id, result_cache_key, normalized_video_keys, lookup_started, progress_callback
+                    )
+                    if cached is not None:
+                        return cached
+            pipeline_started = perf_counter()
+            # 预取流水线：视频 N 做视觉/ASR 时，后续视频在线程中完成下载、抽帧与时长探测
+            pending: dict[int, asyncio.Task[_PreparedVideo | dict[str, Any]]] = {}
+            transcription_tasks: list[asyncio.Task[_Transcription]] = []
+
+            def _schedule(video_idx: int) -> None:
+                if video_idx < len(normalized_video_keys) and video_idx not in pending:
+                    pending[video_idx] = asyncio.create_task(
+                        self._prepare_video(
+                            tmp_dir,
+                            video_idx,
+                            normalized_video_keys[video_idx],
+                            stat=video_stats[video_idx],
+                            video_path=downloaded.get(video_idx),
+                        )
+                    )
 
-                frame_analysis_started = perf_counter()
-                analyzed = await self._analyze_frames(
-                    frames_for_analysis,
-                    source_video_key=input_video_key,
-                    progress_callback=progress_callback,
-                )
-                frame_analysis_elapsed_ms = int((perf_counter() - frame_analysis_started) * 1000)
-                source_duration_ms = get_video_duration_ms(str(video_path))
-                source_scenes = self._merge_frames_into_scenes(analyzed, source_duration_ms)
+            try:
+                for video_idx, input_video_key in enumerate(normalized_video_keys):
+                    for ahead in range(self.prefetch_videos + 1):
+                        _schedule(video_idx + ahead)
+                    await self._emit_progress(
+                        progress_callback,
+                        {
+                            "stage": "video_started",
+                            "video_index": video_idx,
+                            "total_videos": len(normalized_video_keys),
+                            "video_object_key": input_video_key,
+                        },
+                    )
+                    prepared = await pending.pop(video_idx)
+                    if isinstance(prepared, dict):
+                        return prepared
+                    transcription_tasks.append(prepared.transcription_task)
+
+                    frames = prepared.frames
+                    frames_for_analysis, frame_limited = self._limit_frames(frames)
+                    skipped_frames = max(0, len(frames) - len(frames_for_analysis))
+                    total_extracted_frames += len(frames)
+                    total_analyzed_frames += len(frames_for_analysis)
+                    await self._emit_progress(
+                        progress_callback,
+                        {
+                            "stage": "frames_selected",
+                            "video_index": video_idx,
+                            "video_object_key": input_video_key,
+                            "extracted_frames": len(frames),
+                            "selected_frames": len(frames_for_analysis),
+                            "skipped_frames": skipped_frames,
+                            "frame_limit_applied": frame_limited,
+                        },
+                    )
 
-                transcription_fallback = False
-                try:
-                    transcription_segments = await retry_async(
-                        lambda: self.speech.transcribe(str(video_path)),
-                        RetryPolicy(retries=2, delays=(1.0, 2.0)),
+                    frame_analysis_started = perf_counter()
+                    analyzed = await self._analyze_frames(
+                        frames_for_analysis,
+                        source_video_key=input_video_key,
+                        progress_callback=progress_callback,
                     )
-                    self._align_transcription(source_scenes, transcription_segments)
-                except Exception:
-                    transcription_fallback = True
-                    for scene in source_scenes:
-                        scene.transcription = None
-
-                for source_scene in source_scenes:
-                    all_scenes.append(
-                        Scene(
-                            scene_id=f"s_{len(all_scenes)}",
-                            start_ms=source_scene.start_ms + offset_ms,
-                            end_ms=source_scene.end_ms + offset_ms,
-                            description=source_scene.description,
-                            objects=list(source_scene.objects),
-                            transcription=source_scene.transcription,
-                            source_video_key=input_video_key,
-                            source_start_ms=source_scene.start_ms,
-                            source_end_ms=source_scene.end_ms,
+                    frame_analysis_elapsed_ms = int((perf_counter() - frame_analysis_started) * 1000)
+                    vision_cache_hits = sum(1 for item in analyzed if item.get("vision_cache"))
+                    vision_batched_frames = sum(1 for item in analyzed if item.get("vision_batched"))
+                    total_vision_cache_hits += vision_cache_hits
+                    source_duration_ms = prepared.source_duration_ms
+                    source_scenes = self._merge_frames_into_scenes(analyzed, source_duration_ms)
+
+                    # ASR 在下载完成后即已独立启动，这里只等待其结果
+                    asr_wait_started = perf_counter()
+                    transcription = await prepared.transcription_task
+                    asr_wait_ms = int((perf_counter() - asr_wait_started) * 1000)
+                    transcription_segments = transcription.segments
+                    transcription_fallback = transcription_segments is None
+                    if transcription_segments is None:
+                        for scene in source_scenes:
+                            scene.transcription = None
+                    else:
+                        self._align_transcription(source_scenes, transcription_segments)
+
+                    for source_scene in source_scenes:
+                        scene_video_indexes.append(video_idx)
+                        all_scenes.append(
+                            Scene(
+                                scene_id=f"s_{len(all_scenes)}",
+                                start_ms=source_scene.start_ms + offset_ms,
+                                end_ms=source_scene.end_ms + offset_ms,
+                                description=source_scene.description,
+                                objects=list(source_scene.objects),
+                                transcription=source_scene.transcription,
+                                source_video_key=input_video_key,
+                                source_start_ms=source_scene.start_ms,
+                                source_end_ms=source_scene.end_ms,
+                            )
                         )
+                    per_video_metrics.append(
+                        {
+                            "video_index": video_idx,
+                            "video_object_key": input_video_key,
+                            "source_duration_ms": source_duration_ms,
+                            "extracted_frames": len(frames),
+                            "analyzed_frames": len(frames_for_analysis),
+                            "skipped_frames": skipped_frames,
+                            "frame_limit_applied": frame_limited,
+                            "prepare_elapsed_ms": prepared.prepare_elapsed_ms,
+                            "frame_analysis_elapsed_ms": frame_analysis_elapsed_ms,
+                            "vision_cache_hits": vision_cache_hits,
+                            "vision_cache_misses": len(analyzed) - vision_cache_hits,
+                            "vision_batched_frames": vision_batched_frames,
+                            "asr_elapsed_ms": transcription.elapsed_ms,
+                            "asr_wait_ms": asr_wait_ms,
+                            "scene_count": len(source_scenes),
+                            "transcription_fallback": transcription_fallback,
+                        }
                     )
-                per_video_metrics.append(
-                    {
-                        "video_index": video_idx,
-                        "video_object_key": input_video_key,
-                        "source_duration_ms": source_duration_ms,
-                        "extracted_frames": len(frames),
-                        "analyzed_frames": len(frames_for_analysis),
-                        "skipped_frames": skipped_frames,
-                        "frame_limit_applied": frame_limited,
-                        "frame_analysis_elapsed_ms": frame_analysis_elapsed_ms,
-                        "scene_count": len(source_scenes),
-                        "transcription_fallback": transcription_fallback,
-                    }
-                )
-                await self._emit_progress(
-                    progress_callback,
-                    {
-                        "stage": "video_completed",
-                        "video_index": video_idx,
-                        "video_object_key": input_video_key,
-                        "scene_count": len(source_scenes),
-                        "analyzed_frames": len(frames_for_analysis),
-                        "frame_analysis_elapsed_ms": frame_analysis_elapsed_ms,
-                    },
-                )
-                offset_ms += source_duration_ms
+                    await self._emit_progress(
+                        progress_callback,
+                        {
+                            "stage": "video_completed",
+                            "video_index": video_idx,
+                            "video_object_key": input_video_key,
+                            "scene_count": len(source_scenes),
+                            "analyzed_frames": len(frames_for_analysis),
+                            "frame_analysis_elapsed_ms": frame_analysis_elapsed_ms,
+                            "asr_elapsed_ms": transcription.elapsed_ms,
+                        },
+                    )
+                    offset_ms += source_duration_ms
+            finally:
+                # 预取线程无法被取消，等待其结束后再清理临时目录
+                if pending:
+                    prefetched = await asyncio.gather(*pending.values(), return_exceptions=True)
+                    transcription_tasks.extend(item.transcription_task for item in prefetched if isinstance(item, _PreparedVideo))
+                unfinished = [task for task in transcription_tasks if not task.done()]
+                for task in unfinished:
+                    task.cancel()
+                if unfinished:
+                    await asyncio.gather(*unfinished, return_exceptions=True)
 
             scene_dicts = [scene.__dict__ for scene in all_scenes]
             object_key = f"{task_id}/scene_analysis.json"
-            self.minio.upload_bytes(
+            await asyncio.to_thread(
+                self.minio.upload_bytes,
                 self.buckets["intermediate"],
                 object_key,
                 json.dumps(scene_dicts, ensure_ascii=False).encode("utf-8"),
@@ -216,10 +325,22 @@ class VideoAnalysisService:
                 "total_analyzed_frames": total_analyzed_frames,
                 "frame_limit_applied_videos": frame_limit_applied_videos,
                 "frame_sample_fps": self.frame_sample_fps,
+                "frame_sampling": self.frame_sampling,
                 "max_frames_per_video": self.max_frames,
                 "frame_analysis_concurrency": self.frame_analysis_concurrency,
+                "vision_batch_size": self.vision_batch_size,
+                "prefetch_videos": self.prefetch_videos,
+                "vision_cache": {
+                    "enabled": self.vision_cache is not None,
+                    "hits": total_vision_cache_hits,
+                    "misses": total_analyzed_frames - total_vision_cache_hits,
+                },
+                "pipeline_elapsed_ms": int((perf_counter() - pipeline_started) * 1000),
+                "concurrency_limits": limiter_metrics(["vision", "asr"]),
                 "videos": per_video_metrics,
             }
+            if result_cache_key:
+                await self._store_cached_result(task_id, result_cache_key, scene_dicts, scene_video_indexes, metrics)
             await self._emit_progress(
                 progress_callback,
                 {
@@ -233,8 +354,262 @@ class VideoAnalysisService:
                 "scenes": scene_dicts,
                 "result_path": f"{self.buckets['intermediate']}/{object_key}",
                 "analysis_metrics": metrics,
+                "analysis_cache": {
+                    "enabled": self.result_cache_enabled,
+                    "hit": False,
+                    "key": result_cache_key,
+                    "lookup_elapsed_ms": int((pipeline_started - lookup_started) * 1000),
+                },
             }
 
+    async def _download_videos(
+        self,
+        tmp_dir: Path,
+        video_keys: list[str],
+        video_stats: list[Any],
+    ) -> list[Path] | dict[str, Any]:
+        """校验并下载全部源视频，并发数与预取深度一致；任一视频校验失败时返回错误"""
+        semaphore = asyncio.Semaphore(self.prefetch_videos + 1)
+
+        async def _download(video_idx: int) -> Path | dict[str, Any]:
+            async with semaphore:
+                return await self._download_video(tmp_dir, video_idx, video_keys[video_idx], video_stats[video_idx])
+
+        results = await asyncio.gather(*(_download(idx) for idx in range(len(video_keys))))
+        for result in results:
+            if isinstance(result, dict):
+                return result
+        return list(results)
+
+    async def _digest_local_videos(
+        self,
+        video_keys: list[str],
+        video_stats: list[Any],
+        digests: list[str | None],
+        local_videos: list[Path],
+    ) -> str | None:
+        """对缺少摘要元数据的视频按本地文件计算 SHA-256，并回写对象元数据供后续任务直接使用；失败时不使用结果缓存"""
+        resolved = list(digests)
+        try:
+            for idx, digest in enumerate(digests):
+                if digest is None:
+                    resolved[idx] = await asyncio.to_thread(_file_sha256, local_videos[idx])
+        except Exception:
+            logger.warning("video_analysis_source_digest_failed", exc_info=True)
+            return None
+        for idx, digest in enumerate(digests):
+            if digest is not None:
+                continue
+            try:
+                await asyncio.to_thread(
+                    self.minio.set_content_sha256,
+                    self.buckets["videos"],
+                    video_keys[idx],
+                    resolved[idx],
+                    getattr(video_stats[idx], "content_type", None),
+                )
+            except Exception:
+                logger.debug("video_analysis_source_digest_writeback_failed", exc_info=True)
+        return self._result_cache_key([str(digest) for digest in resolved])
+
+    def _result_cache_key(self, digests: list[str]) -> str:
+        """由源视频内容摘要（SHA-256，与上传方式无关）与影响分析结果的配置计算结果缓存键"""
+        payload = {
+            "videos": digests,
+            "frame_sample_fps": self.frame_sample_fps,
+            "max_frames": self.max_frames,
+            "frame_sampling": self.frame_sampling,
+            "shot_sample_fps": self.shot_sample_fps,
+            "shot_threshold": self.shot_threshold,
+            "min_shot_ms": self.min_shot_ms,
+            "min_scene_duration_ms": self.min_scene_duration_ms,
+            "scene_split_min_duration_ms": self.scene_split_min_duration_ms,
+            "vision_model": self.vision.model,
+            "speech_model": self.speech.model,
+            "version": RESULT_CACHE_VERSION,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _result_cache_object(self, cache_key: str) -> str:
+        return f"{self.result_cache_prefix}/{cache_key}.json"
+
+    async def _load_cached_result(
+        self,
+        task_id: str,
+        cache_key: str,
+        video_keys: list[str],
+        lookup_started: float,
+        progress_callback: ProgressCallback | None,
+    ) -> dict[str, Any] | None:
+        """命中结果缓存时直接写出本任务的 scene_analysis.json 并返回
+
+        缓存中的 source_video_key 指向首次分析任务的对象，按视频序号重新映射到本任务的源视频，
+        避免渲染依赖其他任务的对象（可能已被清理）。
+        """
+        try:
+            raw = await asyncio.to_thread(
+                self.minio.download_bytes,
+                self.buckets["intermediate"],
+                self._result_cache_object(cache_key),
+            )
+            cached = json.loads(raw.decode("utf-8"))
+            video_indexes = [int(idx) for idx in cached["video_indexes"]]
+            if len(video_indexes) != len(cached["scenes"]) or any(not 0 <= idx < len(video_keys) for idx in video_indexes):
+                raise ValueError("result_cache_video_index_mismatch")
+            scene_dicts = [
+                {**scene, "source_video_key": video_keys[idx]} for scene, idx in zip(cached["scenes"], video_indexes)
+            ]
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.warning("video_analysis_result_cache_unreadable: %s", cache_key, exc_info=True)
+            return None
+
+        object_key = f"{task_id}/scene_analysis.json"
+        await asyncio.to_thread(
+            self.minio.upload_bytes,
+            self.buckets["intermediate"],
+            object_key,
+            json.dumps(scene_dicts, ensure_ascii=False).encode("utf-8"),
+            content_type="application/json",
+        )
+        lookup_elapsed_ms = int((perf_counter() - lookup_started) * 1000)
+        analysis_cache = {
+            "enabled": True,
+            "hit": True,
+            "key": cache_key,
+            "source_task_id": cached.get("source_task_id"),
+            "lookup_elapsed_ms": lookup_elapsed_ms,
+        }
+        await self._emit_progress(progress_callback, {"stage": "analysis_cache_hit", **analysis_cache})
+        await self._emit_progress(
+            progress_callback,
+            {
+                "stage": "analysis_completed",
+                "total_scenes": len(scene_dicts),
+                "total_analyzed_frames": 0,
+                "total_extracted_frames": 0,
+            },
+        )
+        return {
+            "scenes": scene_dicts,
+            "result_path": f"{self.buckets['intermediate']}/{object_key}",
+            # 本任务只做了缓存查询；首次分析的指标单独标注，避免被当作本次耗时统计
+            "analysis_metrics": {
+                "total_videos": len(video_keys),
+                "total_scenes": len(scene_dicts),
+                "total_extracted_frames": 0,
+                "total_analyzed_frames": 0,
+                "pipeline_elapsed_ms": lookup_elapsed_ms,
+                "source_task_id": cached.get("source_task_id"),
+                "source_analysis_metrics": cached.get("analysis_metrics", {}),
+            },
+            "analysis_cache": analysis_cache,
+        }
+
+    async def _store_cached_result(
+        self,
+        task_id: str,
+        cache_key: str,
+        scene_dicts: list[dict[str, Any]],
+        video_indexes: list[int],
+        metrics: dict[str, Any],
+    ) -> None:
+        payload = {
+            "source_task_id": task_id,
+            "scenes": scene_dicts,
+            "video_indexes": video_indexes,
+            "analysis_metrics": metrics,
+        }
+        try:
+            await asyncio.to_thread(
+                self.minio.upload_bytes,
+                self.buckets["intermediate"],
+                self._result_cache_object(cache_key),
+                json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+                content_type="application/json",
+            )
+        except Exception:
+            logger.warning("video_analysis_result_cache_store_failed: %s", cache_key, exc_info=True)
+
+    async def _prepare_video(
+        self,
+        tmp_dir: Path,
+        video_idx: int,
+        input_video_key: str,
+        stat: Any | None = None,
+        video_path: Path | None = None,
+    ) -> _PreparedVideo | dict[str, Any]:
+        """下载并预处理单个视频（校验、抽帧、时长探测），已下载时直接使用 video_path；阻塞操作均在线程中执行"""
+        prepare_started = perf_counter()
+        if video_path is None:
+            downloaded = await self._download_video(tmp_dir, video_idx, input_video_key, stat)
+            if isinstance(downloaded, dict):
+                return downloaded
+            video_path = downloaded
+        frame_dir = tmp_dir / f"frames_{video_idx}"
+        transcription_task = asyncio.create_task(self._transcribe(video_path))
+        try:
+            shot_detector = self._new_shot_detector()
+            frames = await asyncio.to_thread(
+                extract_frames,
+                str(video_path),
+                str(frame_dir),
+                fps=self.shot_sample_fps if shot_detector else self.frame_sample_fps,
+                shot_detector=shot_detector,
+            )
+            if not frames:
+                transcription_task.cancel()
+                return {"error": "empty_video", "video_object_key": input_video_key}
+            source_duration_ms = await asyncio.to_thread(get_video_duration_ms, str(video_path))
+        except BaseException:
+            transcription_task.cancel()
+            raise
+        return _PreparedVideo(
+            video_path=video_path,
+            frames=frames,
+            source_duration_ms=source_duration_ms,
+            prepare_elapsed_ms=int((perf_counter() - prepare_started) * 1000),
+            transcription_task=transcription_task,
+        )
+
+    async def _download_video(
+        self,
+        tmp_dir: Path,
+        video_idx: int,
+        input_video_key: str,
+        stat: Any | None = None,
+    ) -> Path | dict[str, Any]:
+        """校验格式与大小后下载到临时目录，校验失败时返回错误"""
+        file_name = Path(input_video_key).name
+        if stat is None:
+            stat = await asyncio.to_thread(self.minio.client.stat_object, self.buckets["videos"], input_video_key)
+        try:
+            validate_video_file(file_name, stat.size)
+        except VideoValidationError as exc:
+            return {"error": str(exc), "max_size_bytes": MAX_VIDEO_SIZE_BYTES, "file_size_bytes": stat.size}
+        video_path = tmp_dir / f"{video_idx}_{file_name}"
+        await asyncio.to_thread(self.minio.download_file, self.buckets["videos"], input_video_key, str(video_path))
+        return video_path
+
+    def _new_shot_detector(self) -> ShotDetector | None:
+        """镜头采样模式下为每个视频创建独立的切分器（预取线程之间不共享状态）"""
+        if self.frame_sampling != "scene":
+            return None
+        return ShotDetector(threshold=self.shot_threshold, min_shot_ms=self.min_shot_ms)
+
+    async def _transcribe(self, video_path: Path) -> _Transcription:
+        """语音识别；失败时 segments 为 None 以便场景回退为无转写"""
+        started = perf_counter()
+        try:
+            segments = await retry_async(
+                lambda: self.speech.transcribe(str(video_path)),
+                RetryPolicy(retries=2, delays=(1.0, 2.0)),
+            )
+        except Exception:
+            segments = None
+        return _Transcription(segments=segments, elapsed_ms=int((perf_counter() - started) * 1000))
+
     def _normalize_video_keys(
         self,
         video_object_key: str | None,
@@ -259,7 +634,43 @@ class VideoAnalysisService:
         lock = asyncio.Lock()
         semaphore = asyncio.Semaphore(self.frame_analysis_concurrency)
 
-        async def _analyze_single(index: int, frame: FrameInfo) -> None:
+        async def _record(
+            index: int,
+            frame: FrameInfo,
+            result: dict[str, Any],
+            frame_started: float,
+            *,
+            cache_tier: str | None = None,
+            batched: bool = False,
+        ) -> None:
+            nonlocal processed
+            frame_elapsed_ms = int((perf_counter() - frame_started) * 1000)
+            analyzed[index] = {
+                "timestamp_ms": frame.timestamp_ms,
+                "shot_end_ms": frame.shot_end_ms,
+                "description": str(result.get("description", "")).strip() or "unknown scene",
+                "objects": result.get("objects", []),
+                "vision_cache": cache_tier,
+                "vision_batched": batched,
+            }
+            async with lock:
+                processed += 1
+                processed_now = processed
+            await self._emit_progress(
+                progress_callback,
+                {
+                    "stage": "frame_processed",
+                    "video_object_key": source_video_key,
+                    "frame_index": index,
+                    "timestamp_ms": frame.timestamp_ms,
+                    "processed_frames": processed_now,
+                    "total_frames": total,
+                    "frame_elapsed_ms": frame_elapsed_ms,
+                    "cache_hit": cache_tier is not None,
+                },
+            )
+
+        async def _analyze_single(index: int, frame: FrameInfo, cache_key: str | None) -> None:
             nonlocal processed
             async with semaphore:
                 frame_started = perf_counter()
@@ -287,30 +698,40 @@ class VideoAnalysisService:
                         },
                     )
                     raise RuntimeError("vision_api_unavailable") from exc
+                await self._store_vision_cache(cache_key, result)
+                await _record(index, frame, result, frame_started)
 
-                frame_elapsed_ms = int((perf_counter() - frame_started) * 1000)
-                analyzed[index] = {
-                    "timestamp_ms": frame.timestamp_ms,
-                    "description": str(result.get("description", "")).strip() or "unknown scene",
-                    "objects": result.get("objects", []),
-                }
-                async with lock:
-                    processed += 1
-                    processed_now = processed
-                await self._emit_progress(
-                    progress_callback,
-                    {
-                        "stage": "frame_processed",
-                        "video_object_key": source_video_key,
-                        "frame_index": index,
-                        "timestamp_ms": frame.timestamp_ms,
-                        "processed_frames": processed_now,
-                        "total_frames": total,
-                        "frame_elapsed_ms": frame_elapsed_ms,
-                    },
-                )
-
-        tasks = [asyncio.create_task(_analyze_single(index, frame)) for index, frame in enumerate(frames)]
+        async def _analyze_batch(chunk: list[tuple[int, FrameInfo, str | None]]) -> None:
+            results: list[dict[str, Any]] | None = None
+            async with semaphore:
+                batch_started = perf_counter()
+                try:
+                    # 批量请求不单独重试：逐帧回退路径自带重试
+                    results = await self.vision.analyze_frames_batch([frame.path for _, frame, _ in chunk])
+                except Exception as exc:
+                    # 批量请求失败或返回无法解析时，逐帧回退，保证结果完整
+                    logger.warning("vision_batch_failed, fallback to per-frame calls: %s", exc)
+            if results is None:
+                await asyncio.gather(*(_analyze_single(index, frame, cache_key) for index, frame, cache_key in chunk))
+                return
+            for (index, frame, cache_key), result in zip(chunk, results):
+                await self._store_vision_cache(cache_key, result)
+                await _record(index, frame, result, batch_started, batched=True)
+
+        lookups = await asyncio.gather(*(self._lookup_vision_cache(frame.path) for frame in frames))
+        misses: list[tuple[int, FrameInfo, str | None]] = []
+        for index, (frame, (cache_key, cached, cache_tier)) in enumerate(zip(frames, lookups)):
+            if cached is not None:
+                await _record(index, frame, cached, perf_counter(), cache_tier=cache_tier)
+            else:
+                misses.append((index, frame, cache_key))
+
+        batch_size = self.vision_batch_size
+        chunks = [misses[start : start + batch_size] for start in range(0, len(misses), batch_size)]
+        tasks = [
+            asyncio.create_task(_analyze_batch(chunk) if len(chunk) > 1 else _analyze_single(*chunk[0]))
+            for chunk in chunks
+        ]
         await asyncio.gather(*tasks)
 
         ordered: list[dict[str, Any]] = []
@@ -320,15 +741,57 @@ class VideoAnalysisService:
             ordered.append(item)
         return ordered
 
+    async def _store_vision_cache(self, cache_key: str | None, result: dict[str, Any]) -> None:
+        if cache_key is not None and self.vision_cache is not None:
+            await self.vision_cache.put(cache_key, result)
+
+    async def _lookup_vision_cache(self, frame_path: Path) -> tuple[str | None, dict[str, Any] | None, str | None]:
+        """查询帧分析缓存，返回 (缓存键, 结果, 命中层级)；缓存不可用或帧不参与缓存（近纯色帧）时均为 None"""
+        if self.vision_cache is None:
+            return None, None, None
+        try:
+            cache_key = await self.vision_cache.key_for(frame_path)
+        except Exception:
+            logger.debug("vision_cache_fingerprint_failed", exc_info=True)
+            return None, None, None
+        if cache_key is None:
+            return None, None, None
+        result, tier = await self.vision_cache.get(cache_key)
+        return cache_key, result, tier
+
     def _limit_frames(self, frames: list[FrameInfo]) -> tuple[list[FrameInfo], bool]:
         if len(frames) <= self.max_frames:
             return list(frames), False
+        if all(frame.shot_end_ms is not None for frame in frames):
+            return self._merge_short_shots(frames), True
         if self.max_frames == 1:
             return [frames[len(frames) // 2]], True
         last_index = len(frames) - 1
         selected = [frames[(index * last_index) // (self.max_frames - 1)] for index in range(self.max_frames)]
         return selected, True
 
+    def _merge_short_shots(self, shots: list[FrameInfo]) -> list[FrameInfo]:
+        """镜头数超出预算时，反复把最短的镜头并入相邻较短的镜头，保留较长一方的关键帧；
+        合并后的镜头仍覆盖整个视频，不会整段丢弃"""
+        merged = list(shots)
+        while len(merged) > self.max_frames:
+            index = min(range(len(merged)), key=lambda idx: _shot_duration_ms(merged[idx]))
+            if index == 0:
+                neighbour = 1
+            elif index == len(merged) - 1:
+                neighbour = index - 1
+            elif _shot_duration_ms(merged[index - 1]) <= _shot_duration_ms(merged[index + 1]):
+                neighbour = index - 1
+            else:
+                neighbour = index + 1
+            left, right = sorted((index, neighbour))
+            first, second = merged[left], merged[right]
+            keyframe = first if _shot_duration_ms(first) >= _shot_duration_ms(second) else second
+            merged[left : right + 1] = [
+                FrameInfo(path=keyframe.path, timestamp_ms=first.timestamp_ms, shot_end_ms=second.shot_end_ms)
+            ]
+        return merged
+
     async def _emit_progress(
         self,
         callback: ProgressCallback | None,
@@ -344,6 +807,8 @@ class VideoAnalysisService:
     def _merge_frames_into_scenes(self, frames: list[dict[str, Any]], duration_ms: int) -> list[Scene]:
         if duration_ms <= self.scene_split_min_duration_ms:
             return [self._build_single_scene(frames=frames, duration_ms=duration_ms)]
+        if frames and all(frame.get("shot_end_ms") is not None for frame in frames):
+            return self._merge_short_adjacent_scenes(self._scenes_from_shots(frames, duration_ms))
 
         scenes: list[Scene] = []
         for frame in frames:
@@ -384,6 +849,22 @@ class VideoAnalysisService:
                 scene.end_ms = duration_ms
         return self._merge_short_adjacent_scenes(scenes)
 
+    def _scenes_from_shots(self, frames: list[dict[str, Any]], duration_ms: int) -> list[Scene]:
+        """镜头采样模式：场景起止直接取检测到的镜头边界，每个镜头一个场景"""
+        scenes = [
+            Scene(
+                scene_id=f"s_{index}",
+                start_ms=int(frame["timestamp_ms"]),
+                end_ms=min(int(frame["shot_end_ms"]), duration_ms),
+                description=frame["description"],
+                objects=list(frame["objects"]),
+                transcription=None,
+            )
+            for index, frame in enumerate(frames)
+        ]
+        scenes[-1].end_ms = duration_ms
+        return scenes
+
     def _merge_short_adjacent_scenes(self, scenes: list[Scene]) -> list[Scene]:
         if len(scenes) <= 1:
             return scenes
@@ -454,6 +935,18 @@ class VideoAnalysisService:
             scene.transcription = joined if joined else None
 
 
+def _shot_duration_ms(frame: FrameInfo) -> int:
+    return int(frame.shot_end_ms or frame.timestamp_ms) - frame.timestamp_ms
+
+
+def _file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as stream:
+        while chunk := stream.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 service = VideoAnalysisService()
 mcp = FastMCP("video-analysis") if FastMCP else None
 
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from skills.frame_stream import RawFrame
+
+_LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+@dataclass
+class Shot:
+    start_ms: int
+    end_ms: int
+    keyframe_ms: int
+    keyframe: np.ndarray  # 镜头内最清晰的一帧（独立副本）
+
+
+class ShotDetector:
+    """基于灰度直方图差异的本地镜头切分器，逐帧消费解码流，每个镜头只保留一张关键帧"""
+
+    def __init__(
+        self,
+        threshold: float = 0.35,
+        min_shot_ms: int = 1000,
+        histogram_bins: int = 32,
+        analysis_stride: int = 4,
+    ) -> None:
+        self.threshold = threshold
+        self.min_shot_ms = max(0, min_shot_ms)
+        self.histogram_bins = max(2, histogram_bins)
+        self.analysis_stride = max(1, analysis_stride)
+        self._previous_hist: np.ndarray | None = None
+        self._shot_start_ms: int | None = None
+        self._last_ms = 0
+        self._frame_interval_ms = 0
+        self._best_sharpness = -1.0
+        self._best_ms = 0
+        self._best_frame: np.ndarray | None = None
+
+    def push(self, frame: RawFrame) -> Shot | None:
+        """输入一帧；若该帧开启了新镜头，返回刚结束的上一个镜头"""
+        gray = self._to_gray(frame.data)
+        hist = np.histogram(gray, bins=self.histogram_bins, range=(0, 256))[0].astype(np.float32)
+        hist /= max(float(hist.sum()), 1.0)
+        if self._shot_start_ms is not None:
+            self._frame_interval_ms = max(self._frame_interval_ms, frame.timestamp_ms - self._last_ms)
+
+        closed: Shot | None = None
+        if self._shot_start_ms is None:
+            self._start_shot(frame.timestamp_ms)
+        elif self._previous_hist is not None:
+            distance = 0.5 * float(np.abs(hist - self._previous_hist).sum())
+            # 距上一切点过近的突变（闪光、转场）并入当前镜头
+            if distance > self.threshold and frame.timestamp_ms - self._shot_start_ms >= self.min_shot_ms:
+                closed = self._close_shot(frame.timestamp_ms)
+                self._start_shot(frame.timestamp_ms)
+
+        sharpness = self._sharpness(gray)
+        if sharpness > self._best_sharpness:
+            self._best_sharpness = sharpness
+            self._best_ms = frame.timestamp_ms
+            self._best_frame = frame.data.copy()
+        self._previous_hist = hist
+        self._last_ms = frame.timestamp_ms
+        return closed
+
+    def finish(self, end_ms: int | None = None) -> Shot | None:
+        """结束输入，返回最后一个镜头"""
+        if self._shot_start_ms is None:
+            return None
+        resolved_end = end_ms if end_ms is not None else self._last_ms + max(self._frame_interval_ms, 1)
+        shot = self._close_shot(max(resolved_end, self._last_ms))
+        self._shot_start_ms = None
+        self._previous_hist = None
+        return shot
+
+    def _start_shot(self, start_ms: int) -> None:
+        self._shot_start_ms = start_ms
+        self._best_sharpness = -1.0
+        self._best_frame = None
+
+    def _close_shot(self, end_ms: int) -> Shot:
+        assert self._shot_start_ms is not None and self._best_frame is not None
+        return Shot(
+            start_ms=self._shot_start_ms,
+            end_ms=end_ms,
+            keyframe_ms=self._best_ms,
+            keyframe=self._best_frame,
+        )
+
+    def _to_gray(self, data: np.ndarray) -> np.ndarray:
+        sampled = data[:: self.analysis_stride, :: self.analysis_stride]
+        if sampled.ndim == 3:
+            return sampled.astype(np.float32) @ _LUMA_WEIGHTS
+        return sampled.astype(np.float32)
+
+    def _sharpness(self, gray: np.ndarray) -> float:
+        if gray.shape[0] < 2 or gray.shape[1] < 2:
+            return 0.0
+        return float(np.var(np.diff(gray, axis=0)) + np.var(np.diff(gray, axis=1)))
@@ -5,6 +5,8 @@ from typing import Any
 
 import dashscope
 
+from skills.common import AdaptiveLimiter, limited
+
 
 class SpeechRecognizer:
     def __init__(
@@ -13,9 +15,11 @@ class SpeechRecognizer:
         timeout_seconds: int = 60,
         api_key: str | None = None,
         base_url: str | None = None,
+        limiter: AdaptiveLimiter | None = None,
     ) -> None:
         self.model = model
         self.timeout_seconds = timeout_seconds
+        self.limiter = limiter
         if api_key:
             dashscope.api_key = api_key
         if base_url:
@@ -32,4 +36,5 @@ class SpeechRecognizer:
                 raise RuntimeError(f"asr_wait_status_{wait_response.status_code}")
             return wait_response.output.get("sentences", [])
 
-        return await asyncio.wait_for(asyncio.to_thread(_call), timeout=self.timeout_seconds)
+        async with limited(self.limiter):
+            return await asyncio.wait_for(asyncio.to_thread(_call), timeout=self.timeout_seconds)
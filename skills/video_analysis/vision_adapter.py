@@ -6,6 +6,54 @@ from typing import Any
 
 import dashscope
 
+from skills.common import AdaptiveLimiter, limited, parse_json_payload
+
+BATCH_PROMPT = (
+    "以上共 {count} 张图片，按编号 0 到 {last} 依次描述每张图片的场景并列出可见对象。"
+    "仅返回 JSON 数组，每个元素包含 index（图片编号）、description 和 objects（字符串数组）键。"
+)
+
+
+def parse_batch_response(text: str, count: int) -> list[dict[str, Any]]:
+    """解析批量视觉结果，按图片编号还原顺序；数量或编号不匹配时抛出 ValueError"""
+    payload = parse_json_payload(text)
+    if isinstance(payload, dict):
+        payload = payload.get("frames") or payload.get("images")
+    if not isinstance(payload, list) or len(payload) != count:
+        raise ValueError("invalid_batch_response")
+    ordered: list[dict[str, Any] | None] = [None] * count
+    for position, item in enumerate(payload):
+        if not isinstance(item, dict):
+            raise ValueError("invalid_batch_response")
+        index = item.get("index", position)
+        if not isinstance(index, int) or not 0 <= index < count or ordered[index] is not None:
+            raise ValueError("invalid_batch_response")
+        ordered[index] = _normalize_frame_item(item)
+    return [item for item in ordered if item is not None]
+
+
+def parse_frame_response(text: str) -> dict[str, Any]:
+    """解析单帧视觉结果，与批量结果使用相同结构；无法解析为 JSON 时才退回原始文本作为描述"""
+    try:
+        payload = parse_json_payload(text)
+        if isinstance(payload, list) and len(payload) == 1:
+            payload = payload[0]
+        if isinstance(payload, dict):
+            return _normalize_frame_item(payload)
+    except ValueError:
+        pass
+    return {"description": text.strip(), "objects": []}
+
+
+def _normalize_frame_item(item: dict[str, Any]) -> dict[str, Any]:
+    objects = item.get("objects") or []
+    if not isinstance(objects, list):
+        raise ValueError("invalid_batch_response")
+    return {
+        "description": str(item.get("description", "")).strip(),
+        "objects": [str(obj).strip() for obj in objects if str(obj).strip()],
+    }
+
 
 class VisionAdapter:
     def __init__(
@@ -14,9 +62,11 @@ class VisionAdapter:
         timeout_seconds: int = 30,
         api_key: str | None = None,
         base_url: str | None = None,
+        limiter: AdaptiveLimiter | None = None,
     ) -> None:
         self.model = model
         self.timeout_seconds = timeout_seconds
+        self.limiter = limiter
         if api_key:
             dashscope.api_key = api_key
         if base_url:
@@ -40,8 +90,33 @@ class VisionAdapter:
             )
             if result.status_code != 200:
                 raise RuntimeError(f"vision_status_{result.status_code}")
-            content = result.output.choices[0]["message"]["content"]
-            text = content[0].get("text") if content else ""
-            return {"description": text or "", "objects": []}
+            message_content = result.output.choices[0]["message"]["content"]
+            text = "".join(str(item.get("text", "")) for item in message_content or [] if isinstance(item, dict))
+            return parse_frame_response(text)
+
+        # 超时在拿到并发名额后才开始计时，排队时间不计入
+        async with limited(self.limiter):
+            return await asyncio.wait_for(asyncio.to_thread(_call), timeout=self.timeout_seconds)
+
+    async def analyze_frames_batch(self, frame_paths: list[Path]) -> list[dict[str, Any]]:
+        """在一次多图请求中分析多帧，返回与 frame_paths 顺序一致的结果"""
+        def _call() -> list[dict[str, Any]]:
+            content: list[dict[str, str]] = []
+            for index, frame_path in enumerate(frame_paths):
+                content.append({"text": f"图片 {index}："})
+                content.append({"image": str(frame_path)})
+            content.append({"text": BATCH_PROMPT.format(count=len(frame_paths), last=len(frame_paths) - 1)})
+            result = dashscope.MultiModalConversation.call(
+                model=self.model,
+                messages=[{"role": "user", "content": content}],
+            )
+            if result.status_code != 200:
+                raise RuntimeError(f"vision_status_{result.status_code}")
+            message_content = result.output.choices[0]["message"]["content"]
+            text = "".join(str(item.get("text", "")) for item in message_content or [] if isinstance(item, dict))
+            return parse_batch_response(text, len(frame_paths))
 
-        return await asyncio.wait_for(asyncio.to_thread(_call), timeout=self.timeout_seconds)
+        # 批量请求的耗时随帧数增长，超时按帧数放宽
+        timeout = self.timeout_seconds * max(1, len(frame_paths))
+        async with limited(self.limiter):
+            return await asyncio.wait_for(asyncio.to_thread(_call), timeout=timeout)
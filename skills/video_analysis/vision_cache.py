@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Literal
+
+import numpy as np
+from PIL import Image
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+CacheTier = Literal["local", "redis"]
+KeyMode = Literal["phash", "sha256"]
+
+
+VISION_CACHE_VERSION = 2  # 缓存键或存储格式变化时递增，使旧条目不再命中
+FLAT_FRAME_MAX_STDDEV = 6.0  # 灰度标准差低于此值视为纯色/近纯色帧，不参与缓存
+
+
+def frame_fingerprint(frame_path: Path, mode: KeyMode = "phash") -> str | None:
+    """计算帧指纹：phash 为帧尺寸 + 64 位差值哈希（对重新编码/轻微压缩不敏感）+ 粗粒度颜色直方图，
+    sha256 为字节哈希；近纯色帧（黑场、白场、纯色字幕卡）的差值哈希全为 0，phash 模式下返回 None 表示不缓存"""
+    if mode == "sha256":
+        return hashlib.sha256(frame_path.read_bytes()).hexdigest()
+    with Image.open(frame_path) as image:
+        width, height = image.size
+        rgb = image.convert("RGB")
+    gray = rgb.convert("L")
+    if float(np.asarray(gray.resize((64, 64), Image.Resampling.BILINEAR), dtype=np.float32).std()) < FLAT_FRAME_MAX_STDDEV:
+        return None
+    small = np.asarray(gray.resize((9, 8), Image.Resampling.LANCZOS), dtype=np.int16)
+    bits = 0
+    for bit in (small[:, :-1] > small[:, 1:]).flatten():
+        bits = (bits << 1) | int(bit)
+    # 每通道 4 级共 64 个颜色桶，统计 16x16 缩略图中各桶占比并量化为 8 级
+    levels = np.asarray(rgb.resize((16, 16), Image.Resampling.BILINEAR), dtype=np.uint8) // 64
+    codes = (levels[..., 0].astype(np.int64) * 16 + levels[..., 1] * 4 + levels[..., 2]).flatten()
+    histogram = np.bincount(codes, minlength=64) // 32
+    return f"{width}x{height}:{bits:016x}:{''.join(f'{int(count):x}' for count in histogram)}"
+
+
+class VisionCache:
+    """按帧内容寻址的视觉分析结果缓存：进程内 LRU + Redis 两级，均带 TTL"""
+
+    def __init__(
+        self,
+        model: str,
+        key_mode: KeyMode = "phash",
+        local_max_entries: int = 2048,
+        local_ttl_seconds: int = 3600,
+        redis_url: str | None = None,
+        redis_prefix: str = "evoclip:vision",
+        redis_ttl_seconds: int = 7 * 24 * 3600,
+        redis_backoff_seconds: int = 30,
+    ) -> None:
+        self.model = model
+        self.key_mode = key_mode
+        self.local_max_entries = max(0, local_max_entries)
+        self.local_ttl_seconds = max(1, local_ttl_seconds)
+        self.redis_prefix = redis_prefix
+        self.redis_ttl_seconds = max(1, redis_ttl_seconds)
+        self.redis_backoff_seconds = max(1, redis_backoff_seconds)
+        self.redis: Redis | None = None
+        if redis_url:
+            self.redis = Redis.from_url(redis_url, decode_responses=True, socket_connect_timeout=1, socket_timeout=1)
+        self._local: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._redis_disabled_until = 0.0
+        self.stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "stores": 0, "redis_errors": 0}
+
+    async def key_for(self, frame_path: Path) -> str | None:
+        """帧的缓存键；帧不适合缓存时返回 None"""
+        fingerprint = await asyncio.to_thread(frame_fingerprint, frame_path, self.key_mode)
+        if fingerprint is None:
+            return None
+        return f"v{VISION_CACHE_VERSION}:{self.model}:{self.key_mode}:{fingerprint}"
+
+    async def get(self, key: str) -> tuple[dict[str, Any] | None, CacheTier | None]:
+        """按 key 查找缓存，返回 (结果, 命中层级)"""
+        cached = self._local_get(key)
+        if cached is not None:
+            self.stats["local_hits"] += 1
+            return cached, "local"
+        if self._redis_available():
+            try:
+                raw = await self.redis.get(self._redis_key(key))
+            except Exception:
+                self._mark_redis_failure()
+                raw = None
+            if raw:
+                try:
+                    payload = json.loads(raw)
+                except ValueError:
+                    payload = None
+                if isinstance(payload, dict):
+                    self._local_put(key, payload)
+                    self.stats["redis_hits"] += 1
+                    return payload, "redis"
+        self.stats["misses"] += 1
+        return None, None
+
+    async def put(self, key: str, result: dict[str, Any]) -> None:
+        payload = {"description": result.get("description", ""), "objects": list(result.get("objects") or [])}
+        self._local_put(key, payload)
+        self.stats["stores"] += 1
+        if not self._redis_available():
+            return
+        try:
+            await self.redis.set(
+                self._redis_key(key),
+                json.dumps(payload, ensure_ascii=False),
+                ex=self.redis_ttl_seconds,
+            )
+        except Exception:
+            self._mark_redis_failure()
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.redis_prefix}:{key}"
+
+    def _redis_available(self) -> bool:
+        return self.redis is not None and time.monotonic() >= self._redis_disabled_until
+
+    def _mark_redis_failure(self) -> None:
+        # Redis 层是尽力而为：失败后在退避窗口内跳过，避免每帧都等待连接超时
+        self.stats["redis_errors"] += 1
+        self._redis_disabled_until = time.monotonic() + self.redis_backoff_seconds
+        logger.debug("vision_cache_redis_unavailable", exc_info=True)
+
+    def _local_get(self, key: str) -> dict[str, Any] | None:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at < time.monotonic():
+            self._local.pop(key, None)
+            return None
+        self._local.move_to_end(key)
+        return payload
+
+    def _local_put(self, key: str, payload: dict[str, Any]) -> None:
+        if self.local_max_entries <= 0:
+            return
+        self._local[key] = (time.monotonic() + self.local_ttl_seconds, payload)
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_max_entries:
+            self._local.popitem(last=False)
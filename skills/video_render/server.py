@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import tempfile
 from pathlib import Path
@@ -58,6 +59,28 @@ class VideoRenderService:
         sentences: list[dict[str, Any]],
         audio_segments: list[dict[str, Any]],
         voice_profile_fallback: bool | None = None,
+    ) -> dict[str, Any]:
+        # 下载、ffmpeg 渲染与上传都是阻塞调用，放到线程中执行，避免卡住同一事件循环上的其他任务
+        return await asyncio.to_thread(
+            self._render_video_sync,
+            task_id,
+            source_video_key,
+            source_video_keys,
+            scenes,
+            sentences,
+            audio_segments,
+            voice_profile_fallback,
+        )
+
+    def _render_video_sync(
+        self,
+        task_id: str,
+        source_video_key: str | None,
+        source_video_keys: list[str] | None,
+        scenes: list[dict[str, Any]],
+        sentences: list[dict[str, Any]],
+        audio_segments: list[dict[str, Any]],
+        voice_profile_fallback: bool | None,
     ) -> dict[str, Any]:
         scene_map = {item["scene_id"]: item for item in scenes}
         audio_map = {item["sentence_id"]: item for item in audio_segments}
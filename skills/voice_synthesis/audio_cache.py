@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import unicodedata
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+from store.minio_client import MinioStore
+
+logger = logging.getLogger(__name__)
+
+AudioCacheTier = Literal["local", "minio"]
+
+
+def normalize_tts_text(text: str) -> str:
+    """归一化待合成文本：全半角统一并折叠空白，避免格式差异导致缓存未命中"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def tts_cache_key(provider: str, model: str, voice: str, text: str) -> str:
+    raw = json.dumps([provider, model, voice, normalize_tts_text(text)], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _partial_path(path: Path) -> Path:
+    # 同一任务中可能有重复句子并发写入同一条目，临时文件名需唯一，最后原子替换
+    return path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+
+
+@dataclass
+class CachedAudio:
+    path: Path
+    duration_ms: int
+    tier: AudioCacheTier
+
+
+class TTSAudioCache:
+    """按内容寻址的合成音频缓存：本地磁盘 + MinIO 两级，条目附带已测得的 duration_ms"""
+
+    def __init__(
+        self,
+        minio: MinioStore | None,
+        bucket: str,
+        prefix: str = "tts-cache",
+        local_dir: str = "data/tts-cache",
+        local_max_files: int = 5000,
+        local_prune_interval_seconds: float = 60.0,
+    ) -> None:
+        self.minio = minio
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") or "tts-cache"
+        self.local_dir = Path(local_dir)
+        self.local_max_files = max(0, local_max_files)
+        self.local_prune_interval_seconds = max(0.0, local_prune_interval_seconds)
+        self._prune_lock = threading.Lock()
+        self._last_prune = float("-inf")
+
+    def get(self, key: str, dest: Path) -> CachedAudio | None:
+        """查找缓存；命中时把音频硬链接（跨设备时复制）到 dest 并返回 dest，
+        调用方只使用自己的副本，不受其他任务淘汰共享缓存文件的影响；MinIO 命中时先回填本地层"""
+        audio_path, meta_path = self._local_paths(key)
+        duration_ms = self._read_duration(meta_path)
+        if duration_ms is not None:
+            try:
+                _link_or_copy(audio_path, dest)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logger.debug("tts_cache_local_get_failed", exc_info=True)
+            else:
+                try:
+                    os.utime(meta_path)
+                except OSError:
+                    pass
+                return CachedAudio(path=dest, duration_ms=duration_ms, tier="local")
+        if self.minio is None:
+            return None
+        try:
+            meta = json.loads(self.minio.download_bytes(self.bucket, f"{self.prefix}/{key}.json"))
+            duration_ms = int(meta["duration_ms"])
+            audio_path.parent.mkdir(parents=True, exist_ok=True)
+            partial = _partial_path(audio_path)
+            self.minio.download_file(self.bucket, f"{self.prefix}/{key}.mp3", str(partial))
+            # 先链接到调用方目录再发布到本地层，发布后即使被并发淘汰也不影响本次使用
+            _link_or_copy(partial, dest)
+            partial.replace(audio_path)
+            self._write_meta(meta_path, duration_ms)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.debug("tts_cache_minio_get_failed", exc_info=True)
+            return None
+        return CachedAudio(path=dest, duration_ms=duration_ms, tier="minio")
+
+    def put(self, key: str, source_path: Path, duration_ms: int) -> None:
+        """写入两级缓存；失败只记日志，不影响合成结果"""
+        audio_path, meta_path = self._local_paths(key)
+        try:
+            audio_path.parent.mkdir(parents=True, exist_ok=True)
+            partial = _partial_path(audio_path)
+            shutil.copyfile(source_path, partial)
+            partial.replace(audio_path)
+            self._write_meta(meta_path, duration_ms)
+            self._prune_local()
+        except OSError:
+            logger.debug("tts_cache_local_put_failed", exc_info=True)
+        if self.minio is None:
+            return
+        try:
+            self.minio.upload_file(self.bucket, f"{self.prefix}/{key}.mp3", str(source_path), content_type="audio/mpeg")
+            # 元数据最后写入：读取方以 json 存在作为条目完整的标志
+            self.minio.upload_bytes(
+                self.bucket,
+                f"{self.prefix}/{key}.json",
+                json.dumps({"duration_ms": duration_ms}).encode("utf-8"),
+                content_type="application/json",
+            )
+        except Exception:
+            logger.debug("tts_cache_minio_put_failed", exc_info=True)
+
+    def _local_paths(self, key: str) -> tuple[Path, Path]:
+        directory = self.local_dir / key[:2]
+        return directory / f"{key}.mp3", directory / f"{key}.json"
+
+    def _read_duration(self, meta_path: Path) -> int | None:
+        try:
+            return int(json.loads(meta_path.read_text(encoding="utf-8"))["duration_ms"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _write_meta(self, meta_path: Path, duration_ms: int) -> None:
+        partial = _partial_path(meta_path)
+        partial.write_text(json.dumps({"duration_ms": duration_ms}), encoding="utf-8")
+        partial.replace(meta_path)
+
+    def _prune_local(self) -> None:
+        """超过上限时按最近使用时间淘汰最旧的本地条目；扫描整个目录代价较高，
+        按 local_prune_interval_seconds 节流，且同一时刻只有一个线程执行"""
+        if self.local_max_files <= 0:
+            return
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            if now - self._last_prune < self.local_prune_interval_seconds:
+                return
+            self._last_prune = now
+            metas = list(self.local_dir.glob("*/*.json"))
+            if len(metas) <= self.local_max_files:
+                return
+            metas.sort(key=_mtime)
+            for meta_path in metas[: len(metas) - self.local_max_files]:
+                meta_path.unlink(missing_ok=True)
+                meta_path.with_suffix(".mp3").unlink(missing_ok=True)
+        finally:
+            self._prune_lock.release()
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        # 扫描后被其他进程淘汰的条目，排在最前，unlink 时忽略
+        return float("-inf")
+
+
+def _link_or_copy(source: Path, dest: Path) -> None:
+    """把缓存音频放到 dest：同一文件系统下硬链接，否则复制；源文件不存在时抛出 FileNotFoundError"""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(source, dest)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(source, dest)
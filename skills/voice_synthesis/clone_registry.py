@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import time
+import wave
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+ENVELOPE_FRAME_MS = 100
+# 相邻帧能量需相差超过该比例才记为 1，避免静音/平稳段的微小噪声翻转位
+ENVELOPE_MARGIN = 0.1
+
+
+def sample_fingerprint(wav_path: Path) -> str:
+    """计算克隆样本的音频指纹：相邻 100ms 能量比较得到的位串（对重新编码不敏感），再取 sha256"""
+    with wave.open(str(wav_path), "rb") as reader:
+        sample_rate = reader.getframerate()
+        channels = reader.getnchannels()
+        width = reader.getsampwidth()
+        raw = reader.readframes(reader.getnframes())
+    if width != 2:
+        return hashlib.sha256(raw).hexdigest()
+    samples = np.frombuffer(raw, dtype="<i2").astype(np.float32)
+    if channels > 1:
+        samples = samples[: samples.size - samples.size % channels].reshape(-1, channels).mean(axis=1)
+    frame_size = max(1, sample_rate * ENVELOPE_FRAME_MS // 1000)
+    usable = samples.size - samples.size % frame_size
+    if usable == 0:
+        return hashlib.sha256(raw).hexdigest()
+    energy = np.sqrt(np.mean(np.square(samples[:usable].reshape(-1, frame_size)), axis=1))
+    bits = np.packbits(energy[:-1] > energy[1:] * (1 + ENVELOPE_MARGIN)).tobytes()
+    return hashlib.sha256(len(energy).to_bytes(4, "big") + bits).hexdigest()
+
+
+class CloneRegistry:
+    """克隆音色登记表：样本指纹 -> voice_id，存于 Redis 并带过期时间，可按指纹失效"""
+
+    def __init__(
+        self,
+        redis_url: str,
+        prefix: str = "evoclip:voice-clone",
+        ttl_seconds: int = 7 * 24 * 3600,
+        redis_backoff_seconds: int = 30,
+    ) -> None:
+        self.redis = Redis.from_url(redis_url, decode_responses=True, socket_connect_timeout=1, socket_timeout=1)
+        self.prefix = prefix
+        self.ttl_seconds = max(1, ttl_seconds)
+        self.redis_backoff_seconds = max(1, redis_backoff_seconds)
+        self._disabled_until = 0.0
+
+    def key_for(self, fingerprint: str, model: str, language_hint: str | None = None) -> str:
+        # voice_id 与目标模型绑定，不同模型/语言提示的克隆结果不可互用
+        return f"{self.prefix}:{model}:{language_hint or '-'}:{fingerprint}"
+
+    async def get(self, key: str) -> str | None:
+        if not self._available():
+            return None
+        try:
+            raw = await self.redis.get(key)
+        except Exception:
+            self._mark_failure()
+            return None
+        if not raw:
+            return None
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            return None
+        voice_id = payload.get("voice_id") if isinstance(payload, dict) else None
+        return str(voice_id) if voice_id else None
+
+    async def put(self, key: str, voice_id: str, source_task_id: str | None = None) -> None:
+        if not self._available():
+            return
+        payload: dict[str, Any] = {"voice_id": voice_id, "source_task_id": source_task_id, "created_at": int(time.time())}
+        try:
+            await self.redis.set(key, json.dumps(payload), ex=self.ttl_seconds)
+        except Exception:
+            self._mark_failure()
+
+    async def invalidate(self, key: str) -> None:
+        """音色失效（被删除或合成全部失败）时移除登记，下次任务重新克隆"""
+        if not self._available():
+            return
+        try:
+            await self.redis.delete(key)
+        except Exception:
+            self._mark_failure()
+
+    def _available(self) -> bool:
+        return time.monotonic() >= self._disabled_until
+
+    def _mark_failure(self) -> None:
+        # 登记表是尽力而为：Redis 不可用时按原流程克隆
+        self._disabled_until = time.monotonic() + self.redis_backoff_seconds
+        logger.debug("clone_registry_redis_unavailable", exc_info=True)
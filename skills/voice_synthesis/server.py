@@ -1,15 +1,19 @@
 from __future__ import annotations
 
+import asyncio
 import ipaddress
 import logging
 import subprocess
 import tempfile
 from datetime import timedelta
 from pathlib import Path
+from time import perf_counter
 from typing import Any
 from urllib.parse import urlparse, urlunparse
 
-from skills.common import RetryPolicy, get_credential, get_settings, retry_async
+from skills.common import RetryPolicy, get_credential, get_limiter, get_settings, limiter_metrics, retry_async
+from skills.voice_synthesis.audio_cache import TTSAudioCache, tts_cache_key
+from skills.voice_synthesis.clone_registry import CloneRegistry, sample_fingerprint
 from skills.voice_synthesis.tts_adapter import TTSAdapter
 from store.minio_client import MinioStore
 
@@ -52,13 +56,15 @@ class VoiceSynthesisService:
         self.clone_prefix = str(tts_cfg.get("clone_prefix", "evoclip")).strip() or "evoclip"
         self.clone_sample_seconds = int(tts_cfg.get("clone_sample_seconds", 15))
         self.clone_sample_max_seconds = int(tts_cfg.get("clone_sample_max_seconds", 60))
-        self.clone_poll_seconds = int(tts_cfg.get("clone_poll_seconds", 2))
+        self.clone_poll_seconds = float(tts_cfg.get("clone_poll_seconds", 2))
+        self.clone_poll_max_seconds = float(tts_cfg.get("clone_poll_max_seconds", 10))
         self.clone_max_wait_seconds = int(tts_cfg.get("clone_max_wait_seconds", 60))
         self.clone_presign_expire_seconds = int(tts_cfg.get("clone_presign_expire_seconds", 3600))
         self.clone_public_base_url = str(tts_cfg.get("clone_public_base_url", "")).strip() or None
         self.clone_audio_url = str(tts_cfg.get("clone_audio_url", "")).strip() or None
         self.clone_fixed_voice_id = str(tts_cfg.get("dashscope_voice_id", "")).strip() or None
         self.clone_language_hint = str(tts_cfg.get("clone_language_hint", "")).strip() or None
+        self.synthesis_concurrency = max(1, int(tts_cfg.get("synthesis_concurrency", 4)))
         self.adapter = TTSAdapter(
             provider=tts_cfg["provider"],
             openai_model=tts_cfg["openai_model"],
@@ -69,6 +75,7 @@ class VoiceSynthesisService:
             dashscope_voice=str(tts_cfg.get("dashscope_voice", "longxiaochun_v2")),
             dashscope_api_key=dashscope_api_key,
             dashscope_base_url=dashscope_base_url,
+            limiter=get_limiter("tts"),
         )
         self.minio = MinioStore(
             endpoint=minio_cfg["endpoint"],
@@ -76,6 +83,24 @@ class VoiceSynthesisService:
             secret_key=minio_cfg["secret_key"],
             secure=minio_cfg.get("secure", False),
         )
+        self.clone_registry: CloneRegistry | None = None
+        if bool(tts_cfg.get("clone_registry_enabled", True)):
+            self.clone_registry = CloneRegistry(
+                redis_url=settings.redis["url"],
+                prefix=str(tts_cfg.get("clone_registry_prefix", "evoclip:voice-clone")),
+                ttl_seconds=int(tts_cfg.get("clone_registry_ttl_seconds", 7 * 24 * 3600)),
+            )
+        self.audio_cache: TTSAudioCache | None = None
+        cache_cfg = settings.data.get("tts_cache", {})
+        if bool(cache_cfg.get("enabled", True)):
+            self.audio_cache = TTSAudioCache(
+                minio=self.minio if bool(cache_cfg.get("minio_enabled", True)) else None,
+                bucket=self.buckets["intermediate"],
+                prefix=str(cache_cfg.get("prefix", "tts-cache")),
+                local_dir=str(cache_cfg.get("local_dir", "data/tts-cache")),
+                local_max_files=int(cache_cfg.get("local_max_files", 5000)),
+                local_prune_interval_seconds=float(cache_cfg.get("local_prune_interval_seconds", 60)),
+            )
 
     async def synthesize_voice(
         self,
@@ -83,67 +108,48 @@ class VoiceSynthesisService:
         sentences: list[dict[str, Any]],
         source_video_key: str | None = None,
         source_video_keys: list[str] | None = None,
+        prepared_voice: dict[str, Any] | None = None,
     ) -> dict[str, Any]:
+        """合成全部句子；prepared_voice 为 prepare_voice_profile 的结果时直接复用，不再重复克隆"""
         if not sentences:
             return {"error": "empty_sentences"}
 
         self.minio.ensure_bucket(self.buckets["audio"])
         self.minio.ensure_bucket(self.buckets["intermediate"])
-        output: list[dict[str, Any]] = []
+        started = perf_counter()
 
         with tempfile.TemporaryDirectory(prefix="evoclip-tts-") as tmp:
             working_dir = Path(tmp)
-            voice_profile, voice_profile_fallback = await self._resolve_voice_profile(
-                task_id=task_id,
-                source_video_keys=self._normalize_video_keys(source_video_key, source_video_keys),
-                working_dir=working_dir,
-            )
-            for sentence in sentences:
-                sentence_id = sentence["sentence_id"]
-                text = str(sentence.get("text", "")).strip()
-                if not text:
-                    output.append(
-                        {
-                            "sentence_id": sentence_id,
-                            "audio_path": None,
-                            "duration_ms": 0,
-                            "status": "failed",
-                        }
-                    )
-                    continue
-
-                local_path = working_dir / f"{sentence_id}.mp3"
-
-                try:
-                    await retry_async(
-                        lambda: self.adapter.synthesize(text=text, output_path=local_path, voice=voice_profile),
-                        RetryPolicy(retries=3, delays=(1.0, 2.0, 4.0)),
-                    )
-                    duration_ms = read_duration_ms(local_path)
-                    object_key = f"{task_id}/{sentence_id}.mp3"
-                    audio_path = self.minio.upload_file(
-                        self.buckets["audio"], object_key, str(local_path), content_type="audio/mpeg"
-                    )
-                    output.append(
-                        {
-                            "sentence_id": sentence_id,
-                            "audio_path": audio_path,
-                            "duration_ms": duration_ms,
-                            "status": "ok",
-                        }
-                    )
-                except Exception as exc:
-                    error_text = str(exc or "tts_failed")
-                    logger.warning("TTS failed for sentence %s: %s", sentence_id, error_text)
-                    output.append(
-                        {
-                            "sentence_id": sentence_id,
-                            "audio_path": None,
-                            "duration_ms": 0,
-                            "status": "failed",
-                            "error": error_text,
-                        }
+            clone_state: dict[str, Any] = {}
+            if prepared_voice is not None and not prepared_voice.get("error"):
+                voice_profile = prepared_voice.get("voice_profile") or None
+                voice_profile_fallback = bool(prepared_voice.get("voice_profile_fallback"))
+                clone_state = {
+                    "source": prepared_voice.get("voice_profile_source"),
+                    "registry_key": prepared_voice.get("registry_key"),
+                }
+            else:
+                voice_profile, voice_profile_fallback = await self._resolve_voice_profile(
+                    task_id=task_id,
+                    source_video_keys=self._normalize_video_keys(source_video_key, source_video_keys),
+                    working_dir=working_dir,
+                    clone_state=clone_state,
+                )
+            semaphore = asyncio.Semaphore(self.synthesis_concurrency)
+            output = list(
+                await asyncio.gather(
+                    *(
+                        self._synthesize_sentence(
+                            task_id=task_id,
+                            sentence=sentence,
+                            working_dir=working_dir,
+                            voice_profile=voice_profile,
+                            semaphore=semaphore,
+                        )
+                        for sentence in sentences
                     )
+                )
+            )
 
         payload: dict[str, Any] = {"audio_segments": output}
         ok_count = sum(1 for item in output if item.get("status") == "ok")
@@ -152,18 +158,138 @@ class VoiceSynthesisService:
             payload["failed_reasons"] = [item.get("error", "tts_failed") for item in output if item.get("status") == "failed"]
         payload["ok_count"] = ok_count
         payload["failed_count"] = len(output) - ok_count
+        payload["synthesis_metrics"] = {
+            "synthesis_concurrency": self.synthesis_concurrency,
+            "elapsed_ms": int((perf_counter() - started) * 1000),
+            "synthesize_ms_total": sum(item["timings"]["synthesize_ms"] for item in output if "timings" in item),
+            "tts_cache": {
+                "enabled": self.audio_cache is not None,
+                "hits": sum(1 for item in output if item.get("tts_cache")),
+            },
+        }
+        payload["concurrency_limits"] = limiter_metrics(["tts"])
+        registry_key = clone_state.get("registry_key")
+        if ok_count == 0 and registry_key and clone_state.get("source") == "registry" and self.clone_registry is not None:
+            # 复用的音色全部合成失败，多半已在服务端失效：移除登记，下次任务重新克隆
+            await self.clone_registry.invalidate(registry_key)
+            payload["voice_profile_invalidated"] = True
         if voice_profile:
             payload["voice_profile"] = voice_profile
+            if clone_state.get("source"):
+                payload["voice_profile_source"] = clone_state["source"]
         if voice_profile_fallback:
             payload["voice_profile_fallback"] = True
         return payload
 
+    async def prepare_voice_profile(
+        self,
+        task_id: str,
+        source_video_key: str | None = None,
+        source_video_keys: list[str] | None = None,
+    ) -> dict[str, Any]:
+        """提前解析音色（克隆样本、登记表查询、克隆注册），只依赖源视频，可与分析/文案并行"""
+        started = perf_counter()
+        clone_state: dict[str, Any] = {}
+        with tempfile.TemporaryDirectory(prefix="evoclip-clone-") as tmp:
+            voice_profile, voice_profile_fallback = await self._resolve_voice_profile(
+                task_id=task_id,
+                source_video_keys=self._normalize_video_keys(source_video_key, source_video_keys),
+                working_dir=Path(tmp),
+                clone_state=clone_state,
+            )
+        return {
+            "voice_profile": voice_profile,
+            "voice_profile_fallback": voice_profile_fallback,
+            "voice_profile_source": clone_state.get("source"),
+            "registry_key": clone_state.get("registry_key"),
+            "elapsed_ms": int((perf_counter() - started) * 1000),
+        }
+
+    async def _synthesize_sentence(
+        self,
+        task_id: str,
+        sentence: dict[str, Any],
+        working_dir: Path,
+        voice_profile: str | None,
+        semaphore: asyncio.Semaphore,
+    ) -> dict[str, Any]:
+        """合成单句并上传；信号量只覆盖 TTS 调用，时长探测与上传与后续句子的合成重叠"""
+        sentence_id = sentence["sentence_id"]
+        text = str(sentence.get("text", "")).strip()
+        if not text:
+            return {
+                "sentence_id": sentence_id,
+                "audio_path": None,
+                "duration_ms": 0,
+                "status": "failed",
+            }
+
+        local_path = working_dir / f"{sentence_id}.mp3"
+        timings = {"queue_ms": 0, "synthesize_ms": 0, "probe_ms": 0, "upload_ms": 0}
+        cache_key: str | None = None
+        cache_tier: str | None = None
+        try:
+            if self.audio_cache is not None:
+                cache_key = tts_cache_key(*self.adapter.cache_identity(voice_profile), text)
+                cached = await asyncio.to_thread(self.audio_cache.get, cache_key, local_path)
+                if cached is not None:
+                    # 命中时跳过 TTS 调用与 ffprobe，直接上传链接到工作目录的缓存音频
+                    duration_ms = cached.duration_ms
+                    cache_tier = cached.tier
+            if cache_tier is None:
+                queued = perf_counter()
+                async with semaphore:
+                    started = perf_counter()
+                    timings["queue_ms"] = int((started - queued) * 1000)
+                    await retry_async(
+                        lambda: self.adapter.synthesize(text=text, output_path=local_path, voice=voice_profile),
+                        RetryPolicy(retries=3, delays=(1.0, 2.0, 4.0)),
+                    )
+                    timings["synthesize_ms"] = int((perf_counter() - started) * 1000)
+                started = perf_counter()
+                duration_ms = await asyncio.to_thread(read_duration_ms, local_path)
+                timings["probe_ms"] = int((perf_counter() - started) * 1000)
+                if cache_key is not None:
+                    await asyncio.to_thread(self.audio_cache.put, cache_key, local_path, duration_ms)
+            started = perf_counter()
+            audio_path = await asyncio.to_thread(
+                self.minio.upload_file,
+                self.buckets["audio"],
+                f"{task_id}/{sentence_id}.mp3",
+                str(local_path),
+                content_type="audio/mpeg",
+            )
+            timings["upload_ms"] = int((perf_counter() - started) * 1000)
+        except Exception as exc:
+            error_text = str(exc or "tts_failed")
+            logger.warning("TTS failed for sentence %s: %s", sentence_id, error_text)
+            return {
+                "sentence_id": sentence_id,
+                "audio_path": None,
+                "duration_ms": 0,
+                "status": "failed",
+                "error": error_text,
+                "timings": timings,
+            }
+        return {
+            "sentence_id": sentence_id,
+            "audio_path": audio_path,
+            "duration_ms": duration_ms,
+            "status": "ok",
+            "tts_cache": cache_tier,
+            "timings": timings,
+        }
+
     async def _resolve_voice_profile(
         self,
         task_id: str,
         source_video_keys: list[str],
         working_dir: Path,
+        clone_state: dict[str, Any] | None = None,
     ) -> tuple[str | None, bool]:
+        """解析本次合成使用的音色；clone_state 回填音色来源（registry/clone）与登记键"""
+        if clone_state is None:
+            clone_state = {}
         if self.adapter.provider != "dashscope_clone":
             return None, False
         if self.clone_fixed_voice_id:
@@ -183,22 +309,42 @@ class VoiceSynthesisService:
                 raise RuntimeError("clone_source_video_missing")
             return None, True
 
-        clone_audio_url = self._prepare_clone_audio_url(
-            task_id=task_id,
-            source_video_keys=source_video_keys,
-            working_dir=working_dir,
-        )
+        sample_audio = await asyncio.to_thread(self._build_clone_sample, source_video_keys, working_dir)
+        registry_key = await self._clone_registry_key(sample_audio)
+        if registry_key is not None and self.clone_registry is not None:
+            cached_voice_id = await self.clone_registry.get(registry_key)
+            if cached_voice_id:
+                clone_state.update({"source": "registry", "registry_key": registry_key})
+                return cached_voice_id, False
+
+        clone_audio_url = None
+        if sample_audio is not None:
+            clone_audio_url = await asyncio.to_thread(self._publish_clone_sample, task_id, sample_audio)
         if not clone_audio_url:
             if self.clone_strict:
                 raise RuntimeError("clone_audio_url_unavailable")
             return None, True
         try:
-            return await self._clone_from_audio_url(task_id=task_id, audio_url=clone_audio_url), False
+            voice_id = await self._clone_from_audio_url(task_id=task_id, audio_url=clone_audio_url)
         except Exception as exc:
             if self.clone_strict:
                 raise
             logger.warning("Clone from video sample failed, fallback to default voice: %s", exc)
             return None, True
+        clone_state.update({"source": "clone", "registry_key": registry_key})
+        if registry_key is not None and self.clone_registry is not None:
+            await self.clone_registry.put(registry_key, voice_id, source_task_id=task_id)
+        return voice_id, False
+
+    async def _clone_registry_key(self, sample_audio: Path | None) -> str | None:
+        if self.clone_registry is None or sample_audio is None:
+            return None
+        try:
+            fingerprint = await asyncio.to_thread(sample_fingerprint, sample_audio)
+        except Exception:
+            logger.debug("clone_sample_fingerprint_failed", exc_info=True)
+            return None
+        return self.clone_registry.key_for(fingerprint, self.adapter.dashscope_model, self.clone_language_hint)
 
     async def _clone_from_audio_url(self, task_id: str, audio_url: str) -> str:
         prefix = self._build_clone_prefix(task_id)
@@ -208,14 +354,11 @@ class VoiceSynthesisService:
             poll_interval_seconds=self.clone_poll_seconds,
             max_wait_seconds=self.clone_max_wait_seconds,
             language_hint=self.clone_language_hint,
+            poll_max_interval_seconds=self.clone_poll_max_seconds,
         )
 
-    def _prepare_clone_audio_url(
-        self,
-        task_id: str,
-        source_video_keys: list[str],
-        working_dir: Path,
-    ) -> str | None:
+    def _build_clone_sample(self, source_video_keys: list[str], working_dir: Path) -> Path | None:
+        """从源视频截取并拼接克隆样本音频"""
         if not source_video_keys:
             return None
         sample_durations = self._allocate_clone_durations(source_video_keys)
@@ -240,7 +383,10 @@ class VoiceSynthesisService:
             sample_audio.write_bytes(sample_paths[0].read_bytes())
         else:
             self._concat_clone_samples(sample_paths, sample_audio)
+        return sample_audio
 
+    def _publish_clone_sample(self, task_id: str, sample_audio: Path) -> str | None:
+        """上传克隆样本并生成可供 DashScope 访问的预签名 URL"""
         clone_object_key = f"{task_id}/clone_sample.wav"
         self.minio.upload_file(
             self.buckets["intermediate"],
@@ -392,12 +538,26 @@ if mcp:
         sentences: list[dict[str, Any]],
         source_video_key: str | None = None,
         source_video_keys: list[str] | None = None,
+        prepared_voice: dict[str, Any] | None = None,
     ) -> dict[str, Any]:
         return await service.synthesize_voice(
             task_id=task_id,
             sentences=sentences,
             source_video_key=source_video_key,
             source_video_keys=source_video_keys,
+            prepared_voice=prepared_voice,
+        )
+
+    @mcp.tool(name="prepare_voice_profile")
+    async def prepare_voice_profile_tool(
+        task_id: str,
+        source_video_key: str | None = None,
+        source_video_keys: list[str] | None = None,
+    ) -> dict[str, Any]:
+        return await service.prepare_voice_profile(
+            task_id=task_id,
+            source_video_key=source_video_key,
+            source_video_keys=source_video_keys,
         )
 
 
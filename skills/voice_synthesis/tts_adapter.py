@@ -3,14 +3,16 @@ from __future__ import annotations
 import asyncio
 import base64
 import inspect
+import logging
 from http import HTTPStatus
 from pathlib import Path
-import time
 from typing import Any
 
 import httpx
 from openai import AsyncOpenAI
 
+from skills.common import AdaptiveLimiter, limited
+
 try:
     import dashscope
 except Exception:  # pragma: no cover
@@ -23,6 +25,11 @@ except Exception:  # pragma: no cover
     SpeechSynthesizer = None
     VoiceEnrollmentService = None
 
+logger = logging.getLogger(__name__)
+
+CLONE_READY_STATUSES = {"READY", "SUCCESS", "SUCCEEDED", "AVAILABLE"}
+CLONE_FAILED_STATUSES = {"FAILED", "ERROR"}
+
 
 class TTSAdapter:
     def __init__(
@@ -36,8 +43,10 @@ class TTSAdapter:
         dashscope_voice: str = "longxiaochun_v2",
         dashscope_api_key: str | None = None,
         dashscope_base_url: str | None = None,
+        limiter: AdaptiveLimiter | None = None,
     ) -> None:
         self.provider = provider
+        self.limiter = limiter
         self.openai_model = openai_model
         self.volcengine_voice = volcengine_voice
         self.dashscope_model = dashscope_model
@@ -58,12 +67,21 @@ class TTSAdapter:
             self.openai_client = AsyncOpenAI(**client_kwargs)
 
     async def synthesize(self, text: str, output_path: Path, voice: str | None = None) -> None:
+        async with limited(self.limiter):
+            if self.provider == "openai":
+                await self._synthesize_openai(text, output_path)
+            elif self.provider in {"dashscope", "dashscope_clone"}:
+                await self._synthesize_dashscope(text, output_path, voice=voice)
+            else:
+                await self._synthesize_volcengine(text, output_path)
+
+    def cache_identity(self, voice: str | None = None) -> tuple[str, str, str]:
+        """返回决定合成结果的 (provider, model, voice)，用于音频缓存键"""
         if self.provider == "openai":
-            await self._synthesize_openai(text, output_path)
-        elif self.provider in {"dashscope", "dashscope_clone"}:
-            await self._synthesize_dashscope(text, output_path, voice=voice)
-        else:
-            await self._synthesize_volcengine(text, output_path)
+            return self.provider, self.openai_model, "alloy"
+        if self.provider in {"dashscope", "dashscope_clone"}:
+            return self.provider, self.dashscope_model, voice or self.dashscope_voice
+        return self.provider, "volcengine", self.volcengine_voice
 
     async def _synthesize_openai(self, text: str, output_path: Path) -> None:
         if self.openai_client is None:
@@ -163,36 +181,52 @@ class TTSAdapter:
         self,
         audio_url: str,
         prefix: str,
-        poll_interval_seconds: int = 2,
+        poll_interval_seconds: float = 2,
         max_wait_seconds: int = 60,
         language_hint: str | None = None,
+        poll_max_interval_seconds: float = 10,
     ) -> str:
-        """克隆语音"""
+        """克隆语音：提交注册后以指数退避异步轮询状态，等待期间不占用线程池"""
         if VoiceEnrollmentService is None:
             raise RuntimeError("dashscope_sdk_unavailable")
         if not self.dashscope_api_key:
             raise RuntimeError("dashscope_api_key_missing")
 
-        return await asyncio.to_thread(
-            self._clone_voice_sync,
-            audio_url,
-            prefix,
-            poll_interval_seconds,
-            max_wait_seconds,
-            language_hint,
-        )
+        service = VoiceEnrollmentService()
+        voice_id = await asyncio.to_thread(self._create_clone_sync, service, audio_url, prefix, language_hint)
+        if max_wait_seconds <= 0:
+            return voice_id
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max_wait_seconds
+        delay = max(0.1, float(poll_interval_seconds))
+        max_delay = max(delay, float(poll_max_interval_seconds))
+        while True:
+            try:
+                status_text = await asyncio.to_thread(self._query_clone_status_sync, service, voice_id)
+            except Exception as exc:
+                # 单次查询失败视为瞬时错误，按退避继续轮询
+                logger.debug("dashscope_clone_query_failed: %s", exc)
+                status_text = ""
+            if status_text is None or status_text in CLONE_READY_STATUSES:
+                return voice_id
+            if status_text in CLONE_FAILED_STATUSES:
+                raise RuntimeError(f"dashscope_clone_status:{status_text}")
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                # 超时后沿用旧行为：返回 voice_id，由后续合成决定是否可用
+                return voice_id
+            await asyncio.sleep(min(delay, remaining))
+            delay = min(delay * 2, max_delay)
 
-    def _clone_voice_sync(
+    def _create_clone_sync(
         self,
+        service: Any,
         audio_url: str,
         prefix: str,
-        poll_interval_seconds: int,
-        max_wait_seconds: int,
         language_hint: str | None,
     ) -> str:
-        """同步克隆语音"""
-        assert VoiceEnrollmentService is not None
-        service = VoiceEnrollmentService()
+        """提交克隆注册并返回 voice_id"""
         create_kwargs: dict[str, Any] = {
             "target_model": self.dashscope_model,
             "prefix": prefix,
@@ -212,27 +246,17 @@ class TTSAdapter:
         if not voice_id:
             result_type = type(result).__name__
             raise RuntimeError(f"dashscope_voice_id_missing:type={result_type},payload={self._safe_preview(result)}")
-        voice_id = str(voice_id)
-
-        if max_wait_seconds <= 0:
-            return voice_id
-
-        deadline = time.monotonic() + max_wait_seconds
-        while time.monotonic() < deadline:
-            query = self._query_voice_status(service, voice_id)
-            query_status = self._extract_value(getattr(query, "output", None), "status")
-            if query_status is None:
-                query_status = self._extract_value(query, "status")
-            if query_status is None:
-                return voice_id
-            status_text = str(query_status).upper()
-            if status_text in {"READY", "SUCCESS", "SUCCEEDED", "AVAILABLE"}:
-                return voice_id
-            if status_text in {"FAILED", "ERROR"}:
-                raise RuntimeError(f"dashscope_clone_status:{query_status}")
-            time.sleep(max(1, poll_interval_seconds))
-
-        return voice_id
+        return str(voice_id)
+
+    def _query_clone_status_sync(self, service: Any, voice_id: str) -> str | None:
+        """查询一次克隆状态，返回大写状态文本；响应中没有状态时返回 None"""
+        query = self._query_voice_status(service, voice_id)
+        query_status = self._extract_value(self._extract_value(query, "output"), "status")
+        if query_status is None:
+            query_status = self._extract_value(query, "status")
+        if query_status is None:
+            return None
+        return str(query_status).upper()
 
     def _extract_audio_data(self, result: Any) -> bytes:
         """从 DashScope 响应中提取音频数据"""
@@ -1,18 +1,33 @@
 from __future__ import annotations
 
 from contextlib import asynccontextmanager
-from typing import AsyncIterator
+from typing import Any, AsyncIterator
 
 import asyncpg
+from sqlalchemy import JSON, Update, cast, func, type_coerce, update
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 
+from store.models import Task
+
 
 class DatabaseUnavailableError(RuntimeError):
     """数据库不可用错误"""
     pass
 
 
+def task_patch_statement(task_id: str, values: dict[str, Any], detail_patch: dict[str, Any]) -> Update:
+    """构造只更新指定列与 detail 顶层键的 UPDATE 语句（PostgreSQL 上按 jsonb 合并，不回写整个 detail）"""
+    stmt_values = dict(values)
+    if detail_patch:
+        # detail 为 NULL 时 || 结果也是 NULL，会清空整列，先按空对象合并
+        current = func.coalesce(cast(Task.detail, JSONB), cast("{}", JSONB))
+        merged = current.op("||")(type_coerce(detail_patch, JSONB))
+        stmt_values["detail"] = cast(merged, JSON)
+    return update(Task).where(Task.id == task_id).values(**stmt_values)
+
+
 class Database:
     """数据库连接管理类"""
 
@@ -45,6 +60,23 @@ class Database:
         finally:
             await session.close()
 
+    async def patch_task(self, task_id: str, values: dict[str, Any], detail_patch: dict[str, Any]) -> None:
+        """单次往返写入任务的变化列与 detail 中变化的键"""
+        if not values and not detail_patch:
+            return
+        async with self.session() as session:
+            if self._engine.dialect.name == "postgresql":
+                await session.execute(task_patch_statement(task_id, values, detail_patch))
+                return
+            # 其他方言没有 jsonb 合并，退化为读改写
+            task = await session.get(Task, task_id)
+            if task is None:
+                return
+            for key, value in values.items():
+                setattr(task, key, value)
+            if detail_patch:
+                task.detail = {**(task.detail or {}), **detail_patch}
+
     async def dispose(self) -> None:
         """释放数据库连接"""
         await self._engine.dispose()
@@ -1,11 +1,70 @@
 from __future__ import annotations
 
+import hashlib
 from io import BytesIO
+from typing import BinaryIO, Iterator
 from urllib.parse import urlparse
 
 from minio import Minio
+from minio.commonconfig import REPLACE, CopySource
 from minio.error import S3Error
 
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 分片上传的最小分片
+
+
+CONTENT_SHA256_METADATA = "content-sha256"  # 上传时写入的对象内容摘要（用户元数据 x-amz-meta-content-sha256）
+
+
+class UploadTooLargeError(ValueError):
+    """上传内容超过大小限制"""
+    pass
+
+
+def stored_content_sha256(stat) -> str | None:
+    """读取 stat_object 结果中上传时写入的内容摘要，没有时返回 None
+
+    分片上传的 ETag 不是内容摘要且随分片大小变化，不能用于按内容去重。
+    """
+    metadata_key = f"x-amz-meta-{CONTENT_SHA256_METADATA}"
+    for name, value in (getattr(stat, "metadata", None) or {}).items():
+        if str(name).lower() == metadata_key and value:
+            return str(value)
+    return None
+
+
+def iter_object_chunks(response, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """逐块读取对象响应，结束或中断时释放连接"""
+    try:
+        yield from response.stream(chunk_size)
+    finally:
+        response.close()
+        response.release_conn()
+
+
+class _LimitedReader:
+    """边读边计数并计算 SHA-256 的包装：超过上限立即中止；摘要随上传一并得出，无需再读一遍文件
+
+    这里只限制写入对象存储的字节数。multipart 请求体在进入路由前已由 Starlette 完整落盘，
+    请求体大小上限需要在反向代理（如 nginx client_max_body_size）或 ASGI 中间件层限制。
+    """
+
+    def __init__(self, stream: BinaryIO, max_bytes: int | None) -> None:
+        self._stream = stream
+        self._max_bytes = max_bytes
+        self._digest = hashlib.sha256()
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._stream.read(size)
+        self.bytes_read += len(chunk)
+        if self._max_bytes is not None and self.bytes_read > self._max_bytes:
+            raise UploadTooLargeError(f"upload_too_large:{self._max_bytes}")
+        self._digest.update(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
 
 class MinioStore:
     """MinIO 存储客户端"""
@@ -35,6 +94,43 @@ class MinioStore:
             raise RuntimeError(f"failed_to_upload:{bucket}/{object_name}") from exc
         return f"{bucket}/{object_name}"
 
+    def upload_stream(
+        self,
+        bucket: str,
+        object_name: str,
+        stream: BinaryIO,
+        content_type: str = "application/octet-stream",
+        part_size: int = 10 * 1024 * 1024,
+        max_bytes: int | None = None,
+        record_sha256: bool = False,
+    ) -> int:
+        """以分片方式流式上传，内存占用不超过一个分片；返回上传的字节数（阻塞调用）
+
+        record_sha256 为真时在上传过程中计算内容摘要，完成后写入对象元数据（分片上传开始时摘要尚未得出）。
+        """
+        reader = _LimitedReader(stream, max_bytes)
+        try:
+            self.client.put_object(
+                bucket,
+                object_name,
+                reader,
+                length=-1,
+                part_size=max(MIN_PART_SIZE, part_size),
+                content_type=content_type,
+            )
+        except S3Error as exc:
+            raise RuntimeError(f"failed_to_upload:{bucket}/{object_name}") from exc
+        if record_sha256:
+            self.set_content_sha256(bucket, object_name, reader.hexdigest(), content_type)
+        return reader.bytes_read
+
+    def remove_object(self, bucket: str, object_name: str) -> None:
+        """删除对象，对象不存在时忽略"""
+        try:
+            self.client.remove_object(bucket, object_name)
+        except S3Error:
+            pass
+
     def download_bytes(self, bucket: str, object_name: str) -> bytes:
         """下载字节数据"""
         try:
@@ -43,6 +139,13 @@ class MinioStore:
         except S3Error as exc:
             raise FileNotFoundError(f"missing_object:{bucket}/{object_name}") from exc
 
+    def open_object(self, bucket: str, object_name: str, offset: int = 0, length: int | None = None):
+        """打开对象（可指定字节区间），返回流式响应；调用方负责用 iter_object_chunks 读取并释放连接"""
+        try:
+            return self.client.get_object(bucket, object_name, offset=offset, length=length or 0)
+        except S3Error as exc:
+            raise FileNotFoundError(f"missing_object:{bucket}/{object_name}") from exc
+
     def download_file(self, bucket: str, object_name: str, file_path: str) -> None:
         """下载文件"""
         self.client.fget_object(bucket, object_name, file_path)
@@ -52,6 +155,32 @@ class MinioStore:
         self.client.fput_object(bucket, object_name, file_path, content_type=content_type)
         return f"{bucket}/{object_name}"
 
+    def stat_object(self, bucket: str, object_name: str):
+        """获取对象元数据（大小、ETag、修改时间等），对象不存在时抛出 FileNotFoundError"""
+        try:
+            return self.client.stat_object(bucket, object_name)
+        except S3Error as exc:
+            raise FileNotFoundError(f"missing_object:{bucket}/{object_name}") from exc
+
+    def set_content_sha256(
+        self, bucket: str, object_name: str, digest: str, content_type: str | None = None
+    ) -> None:
+        """把内容摘要写入对象元数据（同对象复制并替换元数据，MinIO 只更新元数据不重写数据；阻塞调用）"""
+        metadata = {CONTENT_SHA256_METADATA: digest}
+        if content_type:
+            # 替换元数据时 Content-Type 也会被替换，需原样带上
+            metadata["Content-Type"] = content_type
+        try:
+            self.client.copy_object(
+                bucket,
+                object_name,
+                CopySource(bucket, object_name),
+                metadata=metadata,
+                metadata_directive=REPLACE,
+            )
+        except S3Error as exc:
+            raise RuntimeError(f"failed_to_update_metadata:{bucket}/{object_name}") from exc
+
     def presigned_get_object(
         self,
         bucket: str,
@@ -61,8 +190,23 @@ class MinioStore:
         public_base_url: str | None = None,
     ) -> str:
         """生成预签名获取 URL"""
+        return self._signing_client(public_base_url).presigned_get_object(bucket, object_name, expires=expires)
+
+    def presigned_put_object(
+        self,
+        bucket: str,
+        object_name: str,
+        *,
+        expires,
+        public_base_url: str | None = None,
+    ) -> str:
+        """生成预签名上传 URL，客户端可直接 PUT 到对象存储"""
+        return self._signing_client(public_base_url).presigned_put_object(bucket, object_name, expires=expires)
+
+    def _signing_client(self, public_base_url: str | None) -> Minio:
+        # 签名包含 Host，面向外部访问时需用对外地址签名
         if not public_base_url:
-            return self.client.presigned_get_object(bucket, object_name, expires=expires)
+            return self.client
 
         parsed = urlparse(public_base_url)
         if not parsed.scheme or not parsed.netloc:
@@ -70,10 +214,9 @@ class MinioStore:
         if parsed.path and parsed.path not in {"", "/"}:
             raise ValueError("public_base_url_with_path_not_supported")
 
-        public_client = Minio(
+        return Minio(
             endpoint=parsed.netloc,
             access_key=self.access_key,
             secret_key=self.secret_key,
             secure=parsed.scheme.lower() == "https",
         )
-        return public_client.presigned_get_object(bucket, object_name, expires=expires)
@@ -1,25 +1,214 @@
 from __future__ import annotations
 
 import json
+import time
+from dataclasses import dataclass
 from typing import Any
 
+from redis import Redis as SyncRedis
 from redis.asyncio import Redis
 
+DEFAULT_QUEUE_LANES = ("high", "normal", "low")
+DEFAULT_QUEUE_LANE = "normal"
+DEFAULT_TENANT = "default"
+DEFAULT_EVENT_STREAM_MAXLEN = 1000
+
+# 发布事件：写入任务的有界事件流（用于断线重放），再把流 ID 与内容一起广播给在线订阅者
+_LUA_PUBLISH_EVENT = """
+local event_id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'data', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('PUBLISH', KEYS[2], event_id .. ' ' .. ARGV[2])
+return event_id
+"""
+
+# 队列脚本约定：能预先算出的键都通过 KEYS 传入；租户子队列与轮转环由通道/租户名在脚本内拼出，
+# 无法预先声明，因此队列只支持单机 Redis（RedisStore 使用非集群客户端），所有键共享 task_prefix 前缀。
+
+# 入队：任务进入 (优先级通道, 租户) 子队列；租户首次出现时加入该通道的轮转环，并发出唤醒信号
+# KEYS: depth, route, enqueued-at, signal
+_LUA_PUSH = """
+local function push(p, task_id, lane, tenant, now_ms, front)
+  local queue = p .. ':lane:' .. lane .. ':tenant:' .. tenant
+  if front then
+    redis.call('LPUSH', queue, task_id)
+  else
+    redis.call('RPUSH', queue, task_id)
+  end
+  if redis.call('SADD', p .. ':lane:' .. lane .. ':active', tenant) == 1 then
+    redis.call('RPUSH', p .. ':lane:' .. lane .. ':tenants', tenant)
+  end
+  redis.call('HINCRBY', KEYS[1], lane, 1)
+  redis.call('HSET', KEYS[2], task_id, lane .. '|' .. tenant)
+  redis.call('HSET', KEYS[3], task_id, now_ms)
+  redis.call('RPUSH', KEYS[4], '1')
+end
+"""
+
+# 新任务或手动重试从头计数：清掉崩溃次数并移出死信列表
+# KEYS: depth, route, enqueued-at, signal, 租户子队列, 通道活跃租户集合, 通道轮转环, 崩溃次数哈希, 死信列表
+_LUA_ENQUEUE = _LUA_PUSH + """
+redis.call('HDEL', KEYS[8], ARGV[2])
+redis.call('LREM', KEYS[9], 0, ARGV[2])
+push(ARGV[1], ARGV[2], ARGV[3], ARGV[4], ARGV[5], false)
+return 1
+"""
+
+# 出队：按通道优先级依次查看；同一通道内按租户轮转各取一个，避免单个租户的大批任务饿死其他租户
+# KEYS: depth, enqueued-at, signal, processing, 之后每个通道依次为 (轮转环, 活跃租户集合)
+_LUA_DISPATCH = """
+local p = ARGV[1]
+for i = 2, #ARGV do
+  local lane = ARGV[i]
+  local ring = KEYS[5 + (i - 2) * 2]
+  local active = KEYS[6 + (i - 2) * 2]
+  for _ = 1, redis.call('LLEN', ring) do
+    local tenant = redis.call('LMOVE', ring, ring, 'LEFT', 'RIGHT')
+    if not tenant then
+      break
+    end
+    local queue = p .. ':lane:' .. lane .. ':tenant:' .. tenant
+    local task_id = redis.call('LPOP', queue)
+    if (not task_id) or redis.call('LLEN', queue) == 0 then
+      redis.call('LREM', ring, 1, tenant)
+      redis.call('SREM', active, tenant)
+    end
+    if task_id then
+      redis.call('RPUSH', KEYS[4], task_id)
+      redis.call('HINCRBY', KEYS[1], lane, -1)
+      local enqueued_at = redis.call('HGET', KEYS[2], task_id) or ''
+      return {task_id, lane, tenant, enqueued_at}
+    end
+  end
+end
+-- 所有通道为空：清掉残留信号，调用方随后阻塞等待新的入队信号
+redis.call('DEL', KEYS[3])
+return false
+"""
+
+# 回收：把来源列表（处理中列表或旧版单队列）的任务按原通道/租户放回队首。
+# 回收崩溃进程的任务时累加崩溃次数，达到上限的任务不再放回而是移入死信列表，避免反复拖垮工作进程
+# KEYS: depth, route, enqueued-at, signal, 来源列表, 崩溃次数哈希, 死信列表
+# ARGV: prefix, now_ms, 默认通道, 默认租户, 崩溃次数上限（0 表示不计数：正常退出或旧队列迁移）
+_LUA_REQUEUE = _LUA_PUSH + """
+local limit = tonumber(ARGV[5])
+local requeued, dead = {}, {}
+while true do
+  local task_id = redis.call('RPOP', KEYS[5])
+  if not task_id then
+    return {requeued, dead}
+  end
+  if limit > 0 and redis.call('HINCRBY', KEYS[6], task_id, 1) >= limit then
+    redis.call('RPUSH', KEYS[7], task_id)
+    redis.call('HDEL', KEYS[2], task_id)
+    redis.call('HDEL', KEYS[3], task_id)
+    redis.call('HDEL', KEYS[6], task_id)
+    table.insert(dead, task_id)
+  else
+    local route = redis.call('HGET', KEYS[2], task_id) or ''
+    local sep = string.find(route, '|', 1, true)
+    local lane, tenant = ARGV[3], ARGV[4]
+    if sep then
+      lane = string.sub(route, 1, sep - 1)
+      tenant = string.sub(route, sep + 1)
+    end
+    push(ARGV[1], task_id, lane, tenant, ARGV[2], true)
+    table.insert(requeued, task_id)
+  end
+end
+"""
+
+@dataclass
+class TaskEvent:
+    """任务事件：id 为事件流中的条目 ID，用作 SSE 的事件 ID"""
+
+    id: str
+    data: str
+
+
+@dataclass
+class RequeueResult:
+    requeued: list[str]
+    dead_lettered: list[str]  # 崩溃次数达到上限、移入死信列表的任务
+
+
+@dataclass
+class DequeuedTask:
+    task_id: str
+    lane: str
+    tenant: str
+    queue_wait_ms: int | None
+
 
 class RedisStore:
     """Redis 存储客户端"""
 
-    def __init__(self, redis_url: str, task_prefix: str, sse_channel_prefix: str, session_ttl: int, progress_ttl: int) -> None:
+    def __init__(
+        self,
+        redis_url: str,
+        task_prefix: str,
+        sse_channel_prefix: str,
+        session_ttl: int,
+        progress_ttl: int,
+        queue_lanes: list[str] | None = None,
+        default_lane: str = DEFAULT_QUEUE_LANE,
+        event_stream_maxlen: int = DEFAULT_EVENT_STREAM_MAXLEN,
+    ) -> None:
         self.redis = Redis.from_url(redis_url, decode_responses=True)
+        self.redis_url = redis_url
+        self._sync_redis: SyncRedis | None = None
         self.task_prefix = task_prefix
         self.sse_channel_prefix = sse_channel_prefix
         self.session_ttl = session_ttl
         self.progress_ttl = progress_ttl
+        # 通道按优先级从高到低排列，出队时严格优先
+        self.queue_lanes = [str(lane) for lane in (queue_lanes or DEFAULT_QUEUE_LANES)]
+        self.default_lane = default_lane if default_lane in self.queue_lanes else self.queue_lanes[-1]
+        self.event_stream_maxlen = max(1, int(event_stream_maxlen))
 
-    def queue_key(self) -> str:
-        """获取队列键"""
+    def lane_queue_key(self, lane: str, tenant: str) -> str:
+        """获取某优先级通道下某租户的队列键"""
+        return f"{self.task_prefix}:lane:{lane}:tenant:{tenant}"
+
+    def lane_tenants_key(self, lane: str) -> str:
+        """获取通道内租户轮转环键"""
+        return f"{self.task_prefix}:lane:{lane}:tenants"
+
+    def lane_active_key(self, lane: str) -> str:
+        """获取通道内有排队任务的租户集合键"""
+        return f"{self.task_prefix}:lane:{lane}:active"
+
+    def legacy_queue_key(self) -> str:
+        """获取旧版单队列键：升级前入队的任务需迁入默认通道"""
         return f"{self.task_prefix}:queue"
 
+    def _queue_keys(self) -> list[str]:
+        # 队列脚本公共的 KEYS 前缀：depth, route, enqueued-at, signal
+        return [self.queue_depth_key(), self.queue_route_key(), self.queue_enqueued_at_key(), self.queue_signal_key()]
+
+    def queue_depth_key(self) -> str:
+        """获取各通道排队数的哈希键"""
+        return f"{self.task_prefix}:queue:depth"
+
+    def queue_route_key(self) -> str:
+        """获取任务所属通道/租户的哈希键，用于回收时放回原队列"""
+        return f"{self.task_prefix}:queue:route"
+
+    def queue_enqueued_at_key(self) -> str:
+        """获取任务入队时间（毫秒）的哈希键，用于统计排队耗时"""
+        return f"{self.task_prefix}:queue:enqueued-at"
+
+    def queue_crashes_key(self) -> str:
+        """获取任务崩溃次数的哈希键：任务所在进程失联或重启后被回收一次计一次"""
+        return f"{self.task_prefix}:queue:crashes"
+
+    def dead_letter_key(self) -> str:
+        """获取死信列表键：崩溃次数达到上限、不再自动放回队列的任务"""
+        return f"{self.task_prefix}:queue:dead"
+
+    def queue_signal_key(self) -> str:
+        """获取入队唤醒信号列表键：空闲的工作进程阻塞在该列表上"""
+        return f"{self.task_prefix}:queue:signal"
+
     def task_key(self, task_id: str) -> str:
         """获取任务元数据键"""
         return f"{self.task_prefix}:meta:{task_id}"
@@ -28,13 +217,173 @@ class RedisStore:
         """获取进度键"""
         return f"{self.task_prefix}:progress:{task_id}"
 
+    def processing_key(self, worker_id: str) -> str:
+        """获取工作进程处理中列表键：已取出但尚未确认完成的任务"""
+        return f"{self.task_prefix}:processing:{worker_id}"
+
+    def lease_key(self, worker_id: str) -> str:
+        """获取工作进程租约键：过期即视为进程已失联"""
+        return f"{self.task_prefix}:lease:{worker_id}"
+
+    def workers_key(self) -> str:
+        """获取已登记工作进程集合键"""
+        return f"{self.task_prefix}:workers"
+
+    def worker_key(self, worker_id: str) -> str:
+        """获取工作进程指标键"""
+        return f"{self.task_prefix}:worker:{worker_id}"
+
+    def upload_key(self, upload_id: str) -> str:
+        """获取直传会话键"""
+        return f"{self.task_prefix}:upload:{upload_id}"
+
     def sse_channel(self, task_id: str) -> str:
         """获取 SSE 频道名"""
         return f"{self.sse_channel_prefix}:{task_id}"
 
-    async def enqueue_task(self, task_id: str) -> None:
-        """将任务加入队列"""
-        await self.redis.rpush(self.queue_key(), task_id)
+    def sse_channel_pattern(self) -> str:
+        """获取匹配所有任务 SSE 频道的模式，API 进程只需订阅一次"""
+        return f"{self.sse_channel_prefix}:*"
+
+    def event_stream_key(self, task_id: str) -> str:
+        """获取任务事件流键：保留最近的事件，供断线重连时重放"""
+        return f"{self.task_prefix}:events:{task_id}"
+
+    async def enqueue_task(self, task_id: str, priority: str | None = None, tenant: str | None = None) -> None:
+        """将任务加入对应优先级通道下该租户的队列"""
+        lane = priority or self.default_lane
+        if lane not in self.queue_lanes:
+            raise ValueError(f"unknown_queue_lane:{lane}")
+        tenant = tenant or DEFAULT_TENANT
+        keys = [
+            *self._queue_keys(),
+            self.lane_queue_key(lane, tenant),
+            self.lane_active_key(lane),
+            self.lane_tenants_key(lane),
+            self.queue_crashes_key(),
+            self.dead_letter_key(),
+        ]
+        await self.redis.eval(_LUA_ENQUEUE, len(keys), *keys, self.task_prefix, task_id, lane, tenant, _now_ms())
+
+    async def dequeue_task(self, worker_id: str, timeout_seconds: float = 5.0) -> DequeuedTask | None:
+        """取出下一个任务并原子移入本进程的处理中列表；无任务时阻塞等待入队信号，超时返回 None"""
+        dequeued = await self._dispatch(worker_id)
+        if dequeued is not None:
+            return dequeued
+        if await self.redis.blpop([self.queue_signal_key()], timeout=timeout_seconds) is None:
+            return None
+        return await self._dispatch(worker_id)
+
+    async def _dispatch(self, worker_id: str) -> DequeuedTask | None:
+        keys = [
+            self.queue_depth_key(),
+            self.queue_enqueued_at_key(),
+            self.queue_signal_key(),
+            self.processing_key(worker_id),
+        ]
+        for lane in self.queue_lanes:
+            keys.extend([self.lane_tenants_key(lane), self.lane_active_key(lane)])
+        result = await self.redis.eval(_LUA_DISPATCH, len(keys), *keys, self.task_prefix, *self.queue_lanes)
+        if not result:
+            return None
+        task_id, lane, tenant, enqueued_at = result
+        queue_wait_ms = max(0, _now_ms() - int(enqueued_at)) if enqueued_at else None
+        return DequeuedTask(task_id=task_id, lane=lane, tenant=tenant, queue_wait_ms=queue_wait_ms)
+
+    async def ack_task(self, worker_id: str, task_id: str) -> None:
+        """确认任务处理结束，从处理中列表移除"""
+        await self.redis.lrem(self.processing_key(worker_id), 1, task_id)
+        await self.redis.hdel(self.queue_route_key(), task_id)
+        await self.redis.hdel(self.queue_enqueued_at_key(), task_id)
+        await self.redis.hdel(self.queue_crashes_key(), task_id)
+
+    async def queue_depth(self) -> int:
+        """获取排队中的任务总数"""
+        return sum((await self.lane_depths()).values())
+
+    async def lane_depths(self) -> dict[str, int]:
+        """获取各优先级通道的排队数"""
+        depths = await self.redis.hgetall(self.queue_depth_key())
+        return {lane: max(0, int(depths.get(lane) or 0)) for lane in self.queue_lanes}
+
+    async def renew_worker_lease(self, worker_id: str, visibility_timeout: int) -> None:
+        """登记并续期工作进程租约；租约过期后其处理中的任务会被其他进程重新入队"""
+        await self.redis.set(self.lease_key(worker_id), "1", ex=max(1, visibility_timeout))
+        await self.redis.sadd(self.workers_key(), worker_id)
+
+    def renew_worker_lease_blocking(self, worker_id: str, visibility_timeout: int) -> None:
+        """同步续期租约，供独立线程调用：事件循环被长时间阻塞时租约也不会过期"""
+        if self._sync_redis is None:
+            self._sync_redis = SyncRedis.from_url(self.redis_url, decode_responses=True)
+        self._sync_redis.set(self.lease_key(worker_id), "1", ex=max(1, visibility_timeout))
+        self._sync_redis.sadd(self.workers_key(), worker_id)
+
+    async def release_worker(self, worker_id: str) -> list[str]:
+        """进程正常退出时将未确认的任务放回队首并注销租约，返回放回的任务（不计崩溃次数）"""
+        result = await self._requeue_processing(worker_id)
+        await self._unregister_worker(worker_id)
+        return result.requeued
+
+    async def recover_worker(self, worker_id: str, max_crashes: int = 0) -> RequeueResult:
+        """回收已崩溃的同名旧进程遗留的任务并注销其租约；每个任务计一次崩溃，达到 max_crashes 的移入死信列表"""
+        result = await self._requeue_processing(worker_id, max_crashes)
+        await self._unregister_worker(worker_id)
+        return result
+
+    async def requeue_orphaned_tasks(self, max_crashes: int = 0) -> RequeueResult:
+        """扫描租约已过期的工作进程，把其处理中的任务放回队首；崩溃次数达到 max_crashes 的移入死信列表"""
+        result = RequeueResult(requeued=[], dead_lettered=[])
+        for worker_id in await self.redis.smembers(self.workers_key()):
+            if await self.redis.exists(self.lease_key(worker_id)):
+                continue
+            recovered = await self._requeue_processing(worker_id, max_crashes)
+            result.requeued.extend(recovered.requeued)
+            result.dead_lettered.extend(recovered.dead_lettered)
+            await self.redis.srem(self.workers_key(), worker_id)
+        return result
+
+    async def _unregister_worker(self, worker_id: str) -> None:
+        await self.redis.delete(self.lease_key(worker_id))
+        await self.redis.srem(self.workers_key(), worker_id)
+
+    async def _requeue_processing(self, worker_id: str, max_crashes: int = 0) -> RequeueResult:
+        # 脚本内逐条移动：多个进程同时回收同一列表时每个任务只会被放回一次
+        return await self._requeue_list(self.processing_key(worker_id), max_crashes)
+
+    async def migrate_legacy_queue(self) -> list[str]:
+        """把旧版单队列中升级前入队的任务迁入默认通道（默认租户），保持原有先后顺序"""
+        return list(reversed((await self._requeue_list(self.legacy_queue_key())).requeued))
+
+    async def _requeue_list(self, source_key: str, max_crashes: int = 0) -> RequeueResult:
+        keys = [*self._queue_keys(), source_key, self.queue_crashes_key(), self.dead_letter_key()]
+        requeued, dead_lettered = await self.redis.eval(
+            _LUA_REQUEUE,
+            len(keys),
+            *keys,
+            self.task_prefix,
+            _now_ms(),
+            self.default_lane,
+            DEFAULT_TENANT,
+            max(0, max_crashes),
+        )
+        return RequeueResult(requeued=list(requeued), dead_lettered=list(dead_lettered))
+
+    async def set_worker_metrics(self, worker_id: str, payload: dict[str, Any]) -> None:
+        """记录工作进程指标，进程退出后随过期时间自动清理"""
+        await self.redis.set(self.worker_key(worker_id), json.dumps(payload), ex=self.session_ttl)
+
+    async def set_upload_session(self, upload_id: str, payload: dict[str, Any], ttl_seconds: int) -> None:
+        """记录直传会话（待上传的对象及声明的大小），与预签名 URL 同时过期"""
+        await self.redis.set(self.upload_key(upload_id), json.dumps(payload), ex=max(1, ttl_seconds))
+
+    async def get_upload_session(self, upload_id: str) -> dict[str, Any] | None:
+        """读取直传会话，不存在或已过期返回 None"""
+        raw = await self.redis.get(self.upload_key(upload_id))
+        return json.loads(raw) if raw else None
+
+    async def claim_upload_session(self, upload_id: str) -> bool:
+        """删除直传会话；只有删除成功的调用方可以创建任务，避免重复完成"""
+        return bool(await self.redis.delete(self.upload_key(upload_id)))
 
     async def set_task_meta(self, task_id: str, payload: dict[str, Any]) -> None:
         """设置任务元数据"""
@@ -44,6 +393,26 @@ class RedisStore:
         """设置任务进度"""
         await self.redis.set(self.progress_key(task_id), json.dumps(payload), ex=self.progress_ttl)
 
-    async def publish_event(self, task_id: str, payload: dict[str, Any]) -> None:
-        """发布事件到 SSE 频道"""
-        await self.redis.publish(self.sse_channel(task_id), json.dumps(payload, ensure_ascii=False))
+    async def publish_event(self, task_id: str, payload: dict[str, Any]) -> str:
+        """发布事件：追加到任务事件流并广播到 SSE 频道，返回事件 ID"""
+        return await self.redis.eval(
+            _LUA_PUBLISH_EVENT,
+            2,
+            self.event_stream_key(task_id),
+            self.sse_channel(task_id),
+            self.event_stream_maxlen,
+            json.dumps(payload, ensure_ascii=False),
+            max(1, self.progress_ttl),
+        )
+
+    async def read_events(self, task_id: str, after: str = "0", count: int = 100) -> list[TaskEvent]:
+        """读取事件流中 ID 大于 after 的事件（最多 count 条），after 为 "0" 时从最早保留的事件开始"""
+        result = await self.redis.xread({self.event_stream_key(task_id): after}, count=count)
+        if not result:
+            return []
+        _, entries = result[0]
+        return [TaskEvent(id=entry_id, data=fields.get("data", "")) for entry_id, fields in entries]
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from contextlib import asynccontextmanager
 from pathlib import Path
 from types import SimpleNamespace
@@ -42,11 +43,20 @@ class DummySession:
 class DummyDB:
     def __init__(self, task: object | None) -> None:
         self._task = task
+        self.patches: list[tuple[dict[str, object], dict[str, object]]] = []
+        self.sessions = 0
 
     @asynccontextmanager
     async def session(self):
+        self.sessions += 1
         yield DummySession(self._task)
 
+    async def patch_task(self, _task_id: str, values: dict[str, object], detail_patch: dict[str, object]) -> None:
+        self.patches.append((values, detail_patch))
+        for key, value in values.items():
+            setattr(self._task, key, value)
+        self._task.detail = {**self._task.detail, **detail_patch}
+
 
 @pytest.mark.asyncio
 async def test_heartbeat_skips_restart_when_supervisorctl_missing(monkeypatch: pytest.MonkeyPatch) -> None:
@@ -112,6 +122,7 @@ async def test_run_task_failure_does_not_crash_worker(monkeypatch: pytest.Monkey
     )
     agent = MainAgent.__new__(MainAgent)
     agent.db = DummyDB(task)
+    agent.task_contexts = {}
     agent.redis = DummyRedis()
     agent._heartbeat = lambda _task_id: __import__("asyncio").sleep(0)
 
@@ -135,6 +146,7 @@ async def test_step_video_render_raises_when_render_result_invalid() -> None:
     task = SimpleNamespace(input_video_key="source.mp4", detail={})
     agent = MainAgent.__new__(MainAgent)
     agent.db = DummyDB(task)
+    agent.task_contexts = {}
     agent.mcp = SimpleNamespace(call_tool=lambda *_args, **_kwargs: __import__("asyncio").sleep(0, {"error": "no_renderable_segments"}))
 
     with pytest.raises(RuntimeError, match="video_render_failed:no_renderable_segments"):
@@ -151,6 +163,7 @@ async def test_step_voice_synthesis_raises_when_all_tts_failed() -> None:
     task = SimpleNamespace(input_video_key="source.mp4", detail={})
     agent = MainAgent.__new__(MainAgent)
     agent.db = DummyDB(task)
+    agent.task_contexts = {}
     agent.mcp = SimpleNamespace(
         call_tool=lambda *_args, **_kwargs: __import__("asyncio").sleep(
             0,
@@ -196,3 +209,230 @@ async def test_heartbeat_disables_restart_when_supervisord_socket_missing(monkey
         "task-1",
         {"status": "restart_skipped", "skill": "copy-generation", "reason": "supervisord_socket_unavailable"},
     ) in agent.redis.events
+
+
+@pytest.mark.asyncio
+async def test_step_voice_synthesis_uses_speculatively_prepared_voice() -> None:
+    task = SimpleNamespace(input_video_key="source.mp4", detail={"voice_sample_keys": ["voice.mp4"]})
+    agent = MainAgent.__new__(MainAgent)
+    agent.db = DummyDB(task)
+    agent.task_contexts = {}
+    agent.redis = DummyRedis()
+    calls: list[tuple[str, dict[str, object]]] = []
+
+    async def call_tool(name: str, **kwargs: object) -> dict[str, object]:
+        calls.append((name, kwargs))
+        if name == "voice-synthesis:prepare-voice":
+            return {"voice_profile": "voice-1", "voice_profile_fallback": False, "voice_profile_source": "clone"}
+        return {"audio_segments": [{"sentence_id": "t_0", "status": "ok"}]}
+
+    agent.mcp = SimpleNamespace(call_tool=call_tool)
+
+    prepared_voice = await agent._prepare_voice_profile("task-1")
+    await agent._step_voice_synthesis(
+        task_id="task-1",
+        copies={"sentences": [{"sentence_id": "t_0", "scene_id": "s_0", "text": "x"}]},
+        prepared_voice=prepared_voice,
+    )
+
+    assert calls[0] == ("voice-synthesis:prepare-voice", {"task_id": "task-1", "source_video_keys": ["voice.mp4"]})
+    assert calls[1][0] == "voice-synthesis"
+    assert calls[1][1]["prepared_voice"]["voice_profile"] == "voice-1"
+    assert agent.redis.events == [
+        (
+            "task-1",
+            {
+                "status": "voice-profile-ready",
+                "voice_profile_source": "clone",
+                "voice_profile_fallback": False,
+                "elapsed_ms": None,
+            },
+        )
+    ]
+
+
+@pytest.mark.asyncio
+async def test_prepare_voice_profile_failure_falls_back_to_inline_resolution() -> None:
+    task = SimpleNamespace(input_video_key="source.mp4", detail={})
+    agent = MainAgent.__new__(MainAgent)
+    agent.db = DummyDB(task)
+    agent.task_contexts = {}
+    agent.redis = DummyRedis()
+
+    async def call_tool(name: str, **_kwargs: object) -> dict[str, object]:
+        raise RuntimeError(f"{name}_down")
+
+    agent.mcp = SimpleNamespace(call_tool=call_tool)
+
+    assert await agent._prepare_voice_profile("task-1") is None
+
+
+@pytest.mark.asyncio
+async def test_run_task_marks_completed_before_skill_optimization() -> None:
+    task = SimpleNamespace(
+        id="task-1",
+        status=TaskStatus.queued,
+        progress=0,
+        input_video_key="source.mp4",
+        product_description="good product",
+        output_video_key=None,
+        checkpoint=None,
+        detail={},
+    )
+    agent = MainAgent.__new__(MainAgent)
+    agent.db = DummyDB(task)
+    agent.task_contexts = {}
+    agent.redis = DummyRedis()
+    agent._heartbeat = lambda _task_id: __import__("asyncio").sleep(0)
+    agent.stage_limits = {}
+    agent.stage_semaphores = {}
+    agent.stage_usage = {}
+    statuses_at_optimization: list[TaskStatus] = []
+
+    async def prepare(_task_id: str) -> dict[str, object]:
+        return {"voice_profile": "voice-1"}
+
+    async def step(name: str, *args: object) -> dict[str, object]:
+        return {"step": name, "inputs": [item["step"] if isinstance(item, dict) and "step" in item else item for item in args]}
+
+    async def optimize(_task_id: str, diagnosis: dict[str, object]) -> dict[str, object]:
+        statuses_at_optimization.append(task.status)
+        return {"optimizations": [], "diagnosis": diagnosis["step"]}
+
+    agent._prepare_voice_profile = prepare
+    agent._step_video_analysis = lambda task_id: step("analysis")
+    agent._step_copy_generation = lambda task_id, analysis: step("copy", analysis)
+    agent._step_voice_synthesis = lambda task_id, copies, voice: step("voice", copies, voice)
+    agent._step_quality_evaluation = lambda task_id, rendered: step("quality", rendered)
+    agent._step_skill_optimization = optimize
+
+    async def render_with_output(_task_id: str, *args: object) -> dict[str, object]:
+        return {**(await step("render", *args)), "output_video": "output/task-1.mp4"}
+
+    agent._step_video_render = render_with_output
+
+    await agent.run_task("task-1")
+
+    assert task.status == TaskStatus.completed
+    assert task.checkpoint == "done"
+    assert task.output_video_key == "output/task-1.mp4"
+    assert statuses_at_optimization == [TaskStatus.completed]
+    assert task.detail["voice-synthesis"]["inputs"] == ["copy", {"voice_profile": "voice-1"}]
+    assert task.detail["video-render"]["inputs"] == ["analysis", "copy", "voice"]
+    assert task.detail["skill-optimization"]["diagnosis"] == "quality"
+    assert set(task.detail["step_timings"]) == {
+        "video-analysis",
+        "copy-generation",
+        "voice-synthesis",
+        "video-render",
+        "quality-evaluation",
+        "skill-optimization",
+    }
+
+
+@pytest.mark.asyncio
+async def test_stage_slot_caps_concurrent_steps_across_tasks() -> None:
+    agent = MainAgent.__new__(MainAgent)
+    agent.stage_limits = {"video-render": 1}
+    agent.stage_semaphores = {"video-render": asyncio.Semaphore(1)}
+    agent.stage_usage = {"video-render": {"running": 0, "waiting": 0}}
+    release = asyncio.Event()
+    running: list[str] = []
+
+    async def _render(task_id: str) -> None:
+        async with agent._stage_slot("video-render"):
+            running.append(task_id)
+            await release.wait()
+
+    tasks = [asyncio.create_task(_render(f"task-{index}")) for index in range(2)]
+    await asyncio.sleep(0)
+    assert running == ["task-0"]
+    assert agent.stage_metrics() == {"video-render": {"limit": 1, "running": 1, "waiting": 1}}
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert running == ["task-0", "task-1"]
+    assert agent.stage_metrics()["video-render"]["running"] == 0
+
+
+@pytest.mark.asyncio
+async def test_retry_resumes_at_first_incomplete_step_using_ledger() -> None:
+    task = SimpleNamespace(
+        id="task-1",
+        status=TaskStatus.queued,
+        progress=0,
+        input_video_key="source.mp4",
+        product_description="good product",
+        output_video_key=None,
+        checkpoint=None,
+        detail={"input_video_keys": ["source.mp4"]},
+    )
+    agent = MainAgent.__new__(MainAgent)
+    agent.db = DummyDB(task)
+    agent.task_contexts = {}
+    agent.redis = DummyRedis()
+    agent._heartbeat = lambda _task_id: asyncio.sleep(0)
+    agent.stage_limits = {}
+    agent.stage_semaphores = {}
+    agent.stage_usage = {}
+    calls: list[str] = []
+    render_failures = [RuntimeError("video_render_failed:ffmpeg")]
+
+    async def prepare(_task_id: str) -> dict[str, object]:
+        # 每次准备的耗时不同，不应导致语音合成重跑
+        calls.append("voice-profile")
+        return {"voice_profile": "voice-1", "elapsed_ms": len(calls)}
+
+    def step(name: str):
+        async def _run(_task_id: str, *_args: object) -> dict[str, object]:
+            calls.append(name)
+            if name == "render" and render_failures:
+                raise render_failures.pop()
+            return {"step": name, "output_video": "output/task-1.mp4"}
+
+        return _run
+
+    agent._prepare_voice_profile = prepare
+    agent._step_video_analysis = step("analysis")
+    agent._step_copy_generation = step("copy")
+    agent._step_voice_synthesis = step("voice")
+    agent._step_video_render = step("render")
+    agent._step_quality_evaluation = step("quality")
+    agent._step_skill_optimization = step("optimize")
+
+    await agent.run_task("task-1")
+    assert task.status == TaskStatus.failed
+    assert set(task.detail["step_ledger"]) == {"video-analysis", "copy-generation", "voice-profile", "voice-synthesis"}
+
+    calls.clear()
+    agent.db.sessions = 0
+    await agent.run_task("task-1")
+
+    assert task.status == TaskStatus.completed
+    # 任务行只在开始时读取一次，后续步骤复用内存快照
+    assert agent.db.sessions == 1
+    assert all("input_video_keys" not in detail_patch for _values, detail_patch in agent.db.patches)
+    # 已准备的音色记在账本中，重试不再重新克隆
+    assert sorted(calls) == ["optimize", "quality", "render"]
+    skipped = [payload["status"] for _task_id, payload in agent.redis.events if payload.get("skipped")]
+    assert sorted(skipped) == ["copy-generation", "video-analysis", "voice-synthesis"]
+
+    # 商品描述变化后从文案生成开始重跑，视频分析仍复用
+    calls.clear()
+    task.product_description = "better product"
+    await agent.run_task("task-1")
+    assert "analysis" not in calls
+    assert "copy" in calls
+    assert "voice-profile" not in calls
+
+    # 音色准备失败（返回 None）不写入账本，下次重试时重新准备
+    async def failed_prepare(_task_id: str) -> None:
+        calls.append("voice-profile")
+        return None
+
+    del task.detail["step_ledger"]["voice-profile"]
+    agent._prepare_voice_profile = failed_prepare
+    calls.clear()
+    await agent.run_task("task-1")
+    assert "voice-profile" in calls
+    assert "voice-profile" not in task.detail["step_ledger"]
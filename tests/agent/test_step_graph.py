@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from agent.step_graph import StepNode, run_step_graph, validate_step_graph
+
+
+@pytest.mark.asyncio
+async def test_independent_steps_overlap_and_receive_dependency_results() -> None:
+    started: list[str] = []
+    gate = asyncio.Event()
+
+    async def left(_inputs: dict[str, object]) -> str:
+        started.append("left")
+        await gate.wait()
+        return "L"
+
+    async def right(_inputs: dict[str, object]) -> str:
+        started.append("right")
+        # left 仍在等待时 right 已启动，说明两者并发执行
+        assert "left" in started
+        gate.set()
+        return "R"
+
+    async def join(inputs: dict[str, object]) -> str:
+        return f"{inputs['left']}+{inputs['right']}"
+
+    results = await run_step_graph(
+        [
+            StepNode(name="join", run=join, deps=("left", "right")),
+            StepNode(name="left", run=left),
+            StepNode(name="right", run=right),
+        ]
+    )
+
+    assert results == {"left": "L", "right": "R", "join": "L+R"}
+
+
+@pytest.mark.asyncio
+async def test_failure_cancels_running_steps_and_skips_dependents() -> None:
+    cancelled = asyncio.Event()
+    ran: list[str] = []
+
+    async def slow(_inputs: dict[str, object]) -> None:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def boom(_inputs: dict[str, object]) -> None:
+        raise RuntimeError("video_render_failed")
+
+    async def after(_inputs: dict[str, object]) -> None:
+        ran.append("after")
+
+    with pytest.raises(RuntimeError, match="video_render_failed"):
+        await run_step_graph(
+            [
+                StepNode(name="slow", run=slow),
+                StepNode(name="boom", run=boom),
+                StepNode(name="after", run=after, deps=("boom",)),
+            ]
+        )
+
+    assert cancelled.is_set()
+    assert ran == []
+
+
+def test_validate_step_graph_rejects_cycles_and_unknown_dependencies() -> None:
+    async def noop(_inputs: dict[str, object]) -> None:
+        return None
+
+    assert validate_step_graph([StepNode("b", noop, ("a",)), StepNode("a", noop)]) == ["a", "b"]
+    with pytest.raises(ValueError, match="step_graph_cycle"):
+        validate_step_graph([StepNode("a", noop, ("b",)), StepNode("b", noop, ("a",))])
+    with pytest.raises(ValueError, match="step_graph_unknown_dependency:a->x"):
+        validate_step_graph([StepNode("a", noop, ("x",))])
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from agent.task_context import TaskContext
+from store.database import task_patch_statement
+from store.models import TaskStatus
+
+
+class _SlowDB:
+    def __init__(self) -> None:
+        self.task = SimpleNamespace(
+            id="task-1",
+            status=TaskStatus.queued,
+            progress=0,
+            retry_count=0,
+            input_video_key="source.mp4",
+            product_description="good product",
+            output_video_key=None,
+            checkpoint=None,
+            detail={"input_video_keys": ["source.mp4"]},
+        )
+        self.patches: list[tuple[dict[str, object], dict[str, object]]] = []
+        self.release = asyncio.Event()
+        self.fail = False
+
+    @asynccontextmanager
+    async def session(self):
+        yield SimpleNamespace(get=lambda _model, _task_id: asyncio.sleep(0, self.task))
+
+    async def patch_task(self, _task_id: str, values: dict[str, object], detail_patch: dict[str, object]) -> None:
+        await self.release.wait()
+        if self.fail:
+            raise RuntimeError("db_down")
+        self.patches.append((values, detail_patch))
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_only_changed_keys_and_coalesces_concurrent_writes() -> None:
+    db = _SlowDB()
+    task = await TaskContext.load(db, "task-1")
+    assert task.input_video_key == "source.mp4"
+
+    task.set_detail("video-analysis", {"scenes": []})
+    first = asyncio.create_task(task.flush())
+    await asyncio.sleep(0)
+    task.set_detail("voice-profile", {"voice": "v"})
+    task.update(checkpoint="copy-generation")
+    task.set_detail("copy-generation", {"sentences": []})
+    second = asyncio.create_task(task.flush())
+    third = asyncio.create_task(task.flush())
+    db.release.set()
+    await asyncio.gather(first, second, third)
+
+    assert db.patches == [
+        ({}, {"video-analysis": {"scenes": []}}),
+        ({"checkpoint": "copy-generation"}, {"voice-profile": {"voice": "v"}, "copy-generation": {"sentences": []}}),
+    ]
+    assert task.checkpoint == "copy-generation"
+    assert not task.dirty
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_changes_for_the_next_attempt() -> None:
+    db = _SlowDB()
+    db.release.set()
+    task = await TaskContext.load(db, "task-1")
+    task.update(progress=50)
+    db.fail = True
+
+    with pytest.raises(RuntimeError, match="db_down"):
+        await task.flush()
+    task.set_detail("error", "x")
+    db.fail = False
+    await task.flush()
+
+    assert db.patches == [({"progress": 50}, {"error": "x"})]
+    with pytest.raises(ValueError, match="task_context_unknown_field:detail"):
+        task.update(detail={})
+
+
+def test_patch_statement_merges_detail_keys_in_postgres() -> None:
+    sql = str(task_patch_statement("task-1", {"progress": 50}, {"step_ledger": {}}).compile(dialect=postgresql.dialect()))
+
+    assert "coalesce(CAST(tasks.detail AS JSONB), CAST(" in sql
+    assert "AS JSONB)) ||" in sql
+    assert "progress=" in sql
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from agent.worker import TaskWorker
+from store.redis_client import RedisStore
+
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+async def _store(task_ids: list[str], **kwargs: object) -> RedisStore:
+    store = RedisStore.__new__(RedisStore)
+    RedisStore.__init__(store, "redis://localhost:6379/0", "evoclip:task", "evoclip:sse", 60, 60, **kwargs)
+    server = fakeredis.FakeServer()
+    store.redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    store._sync_redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+    for task_id in task_ids:
+        await store.enqueue_task(task_id)
+    return store
+
+
+async def _until(predicate, timeout: float = 2.0) -> None:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "condition_not_met"
+        await asyncio.sleep(0.005)
+
+
+async def _list(store: RedisStore, key: str) -> list[str]:
+    return await store.redis.lrange(key, 0, -1)
+
+
+def _worker(store: RedisStore, run_task, **kwargs: object) -> TaskWorker:
+    kwargs.setdefault("dequeue_block_seconds", 0.01)
+    kwargs.setdefault("metrics_interval_seconds", 0)
+    return TaskWorker(store, run_task, worker_id="w1", **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_worker_runs_up_to_max_in_flight_and_drains_on_stop() -> None:
+    store = await _store(["task-1", "task-2", "task-3"])
+    release = asyncio.Event()
+    started: list[str] = []
+    finished: list[str] = []
+
+    async def run_task(task_id: str) -> None:
+        started.append(task_id)
+        await release.wait()
+        finished.append(task_id)
+
+    worker = _worker(store, run_task, max_in_flight=2)
+    runner = asyncio.create_task(worker.run())
+    await _until(lambda: len(started) == 2)
+    assert started == ["task-1", "task-2"]
+    assert await _list(store, store.processing_key("w1")) == ["task-1", "task-2"]
+
+    worker.request_stop()
+    release.set()
+    await asyncio.wait_for(runner, timeout=1)
+
+    assert finished == ["task-1", "task-2"]
+    assert await store.queue_depth() == 1
+    assert await _list(store, store.processing_key("w1")) == []
+    assert not await store.redis.sismember(store.workers_key(), "w1")
+    metrics = json.loads(await store.redis.get(store.worker_key("w1")))
+    assert metrics["queue_depth"] == 1
+    assert metrics["draining"] is True
+    assert metrics["lanes"]["normal"]["dispatched"] == 2
+    assert metrics["lanes"]["normal"]["depth"] == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_requeues_tasks_still_running_after_drain_timeout() -> None:
+    store = await _store(["task-1", "task-2"])
+    cancelled: list[str] = []
+
+    async def run_task(task_id: str) -> None:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(task_id)
+            raise
+
+    worker = _worker(store, run_task, max_in_flight=1, drain_timeout_seconds=0.01)
+    runner = asyncio.create_task(worker.run())
+    await _until(lambda: worker.in_flight == 1)
+    worker.request_stop()
+    await asyncio.wait_for(runner, timeout=1)
+
+    assert cancelled == ["task-1"]
+    assert await _list(store, store.lane_queue_key("normal", "default")) == ["task-1", "task-2"]
+    assert worker.stats["requeued"] == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_survives_task_exceptions_and_acks_them() -> None:
+    store = await _store(["task-1", "task-2"])
+    done: list[str] = []
+
+    async def run_task(task_id: str) -> None:
+        if task_id == "task-1":
+            raise RuntimeError("boom")
+        done.append(task_id)
+
+    worker = _worker(store, run_task, max_in_flight=1)
+    runner = asyncio.create_task(worker.run())
+    await _until(lambda: worker.stats["finished"] == 2)
+    worker.request_stop()
+    await asyncio.wait_for(runner, timeout=1)
+
+    assert done == ["task-2"]
+    assert worker.stats["finished"] == 2
+    assert await store.queue_depth() == 0
+    assert await _list(store, store.processing_key("w1")) == []
+    assert await store.redis.hlen(store.queue_route_key()) == 0
+
+
+@pytest.mark.asyncio
+async def test_requeue_orphaned_tasks_only_recovers_workers_with_expired_lease() -> None:
+    store = await _store(["task-1", "task-2", "task-3"])
+    await store.renew_worker_lease("alive", 60)
+    await store.renew_worker_lease("crashed", 60)
+    assert (await store.dequeue_task("crashed")).task_id == "task-1"
+    assert (await store.dequeue_task("crashed")).task_id == "task-2"
+    assert (await store.dequeue_task("alive")).task_id == "task-3"
+    await store.redis.delete(store.lease_key("crashed"))
+
+    assert (await store.requeue_orphaned_tasks()).requeued == ["task-2", "task-1"]
+
+    assert await _list(store, store.lane_queue_key("normal", "default")) == ["task-1", "task-2"]
+    assert await _list(store, store.processing_key("alive")) == ["task-3"]
+    assert await store.redis.smembers(store.workers_key()) == {"alive"}
+
+
+@pytest.mark.asyncio
+async def test_dequeue_prefers_higher_lanes_and_rotates_tenants_within_a_lane() -> None:
+    store = await _store([])
+    for index in range(3):
+        await store.enqueue_task(f"bulk-{index}", priority="low", tenant="bulk")
+        await store.enqueue_task(f"a-{index}", tenant="tenant-a")
+    await store.enqueue_task("b-0", tenant="tenant-b")
+    await store.enqueue_task("vip", priority="high", tenant="tenant-b")
+    assert await store.lane_depths() == {"high": 1, "normal": 4, "low": 3}
+
+    order = []
+    while (dequeued := await store.dequeue_task("w1", timeout_seconds=0.01)) is not None:
+        order.append((dequeued.task_id, dequeued.lane))
+        assert dequeued.queue_wait_ms is not None
+
+    assert [task_id for task_id, _lane in order] == [
+        "vip", "a-0", "b-0", "a-1", "a-2", "bulk-0", "bulk-1", "bulk-2",
+    ]
+    assert order[0][1] == "high"
+    assert await store.queue_depth() == 0
+
+
+@pytest.mark.asyncio
+async def test_blocked_dequeue_wakes_up_on_enqueue() -> None:
+    store = await _store([])
+    waiter = asyncio.create_task(store.dequeue_task("w1", timeout_seconds=2))
+    await asyncio.sleep(0.05)
+    await store.enqueue_task("task-1", tenant="t")
+
+    dequeued = await asyncio.wait_for(waiter, timeout=2)
+
+    assert dequeued.task_id == "task-1"
+    assert dequeued.tenant == "t"
+
+
+@pytest.mark.asyncio
+async def test_lease_is_renewed_while_a_task_blocks_the_event_loop() -> None:
+    store = await _store(["task-1"])
+    lease_ttls: list[int] = []
+
+    async def run_task(task_id: str) -> None:
+        # 模拟卡住事件循环超过租约时长的同步步骤
+        time.sleep(1.5)
+        lease_ttls.append(await store.redis.ttl(store.lease_key("w1")))
+
+    worker = _worker(store, run_task, max_in_flight=1, visibility_timeout_seconds=1, reap_interval_seconds=60)
+    runner = asyncio.create_task(worker.run())
+    await _until(lambda: lease_ttls, timeout=5)
+    worker.request_stop()
+    await asyncio.wait_for(runner, timeout=2)
+
+    assert lease_ttls[0] > 0
+    assert (await store.requeue_orphaned_tasks()).requeued == []
+    assert not await store.redis.exists(store.lease_key("w1"))
+
+
+@pytest.mark.asyncio
+async def test_restarted_worker_recovers_tasks_left_in_its_own_processing_list() -> None:
+    store = await _store(["task-1"])
+    # 同名旧进程崩溃：任务留在处理中列表，租约尚未过期
+    assert (await store.dequeue_task("w1", 0.01)).task_id == "task-1"
+    await store.renew_worker_lease("w1", 60)
+    started: list[str] = []
+
+    async def run_task(task_id: str) -> None:
+        started.append(task_id)
+
+    worker = _worker(store, run_task, max_in_flight=1)
+    runner = asyncio.create_task(worker.run())
+    await _until(lambda: started == ["task-1"])
+    worker.request_stop()
+    await asyncio.wait_for(runner, timeout=2)
+
+    assert worker.stats["recovered"] == 1
+    assert await _list(store, store.processing_key("w1")) == []
+
+
+def test_default_worker_id_is_unique_per_instance() -> None:
+    first = TaskWorker(None, None)
+    second = TaskWorker(None, None)
+    assert first.worker_id != second.worker_id
+
+
+@pytest.mark.asyncio
+async def test_worker_migrates_tasks_left_in_the_legacy_queue() -> None:
+    store = await _store([])
+    await store.redis.rpush(store.legacy_queue_key(), "old-1", "old-2")
+    started: list[str] = []
+
+    async def run_task(task_id: str) -> None:
+        started.append(task_id)
+
+    worker = _worker(store, run_task, max_in_flight=1)
+    runner = asyncio.create_task(worker.run())
+    await _until(lambda: len(started) == 2)
+    worker.request_stop()
+    await asyncio.wait_for(runner, timeout=2)
+
+    assert started == ["old-1", "old-2"]
+    assert not await store.redis.exists(store.legacy_queue_key())
+
+
+@pytest.mark.asyncio
+async def test_queue_scripts_declare_their_fixed_keys() -> None:
+    store = await _store([])
+    calls: list[tuple[int, tuple[object, ...]]] = []
+    real_eval = store.redis.eval
+
+    async def recording_eval(script: str, numkeys: int, *args: object):
+        calls.append((numkeys, args[:numkeys]))
+        return await real_eval(script, numkeys, *args)
+
+    store.redis.eval = recording_eval
+    await store.enqueue_task("task-1", tenant="t")
+    await store.dequeue_task("w1", 0.01)
+    await store.release_worker("w1")
+
+    assert [numkeys for numkeys, _keys in calls] == [9, 4 + 2 * len(store.queue_lanes), 7]
+    assert store.lane_queue_key("normal", "t") in calls[0][1]
+    assert store.processing_key("w1") in calls[1][1]
+    assert calls[2][1][4] == store.processing_key("w1")
+
+
+@pytest.mark.asyncio
+async def test_task_that_keeps_crashing_workers_is_dead_lettered() -> None:
+    store = await _store(["poison", "task-2"])
+    for attempt in range(2):
+        assert (await store.dequeue_task(f"crashed-{attempt}", 0.01)).task_id == "poison"
+        await store.renew_worker_lease(f"crashed-{attempt}", 60)
+        await store.redis.delete(store.lease_key(f"crashed-{attempt}"))
+        recovered = await store.requeue_orphaned_tasks(max_crashes=3)
+        assert (recovered.requeued, recovered.dead_lettered) == (["poison"], [])
+
+    # 第三次崩溃发生在同名进程重启时：不再放回队列，交给 on_dead_letter 标记失败
+    assert (await store.dequeue_task("w1", 0.01)).task_id == "poison"
+    failed: list[str] = []
+    started: list[str] = []
+
+    async def run_task(task_id: str) -> None:
+        started.append(task_id)
+
+    async def on_dead_letter(task_id: str) -> None:
+        failed.append(task_id)
+
+    worker = _worker(store, run_task, max_in_flight=1, max_task_crashes=3, on_dead_letter=on_dead_letter)
+    runner = asyncio.create_task(worker.run())
+    await _until(lambda: started == ["task-2"])
+    worker.request_stop()
+    await asyncio.wait_for(runner, timeout=2)
+
+    assert failed == ["poison"]
+    assert worker.stats["dead_lettered"] == 1
+    assert await _list(store, store.dead_letter_key()) == ["poison"]
+    assert not await store.redis.hexists(store.queue_route_key(), "poison")
+
+    # 手动重试重新入队时从头计数并移出死信列表
+    await store.enqueue_task("poison")
+    assert await _list(store, store.dead_letter_key()) == []
+    assert not await store.redis.hexists(store.queue_crashes_key(), "poison")
+
+
+@pytest.mark.asyncio
+async def test_graceful_release_does_not_count_as_a_crash() -> None:
+    store = await _store(["task-1"])
+    for _ in range(3):
+        assert (await store.dequeue_task("w1", 0.01)).task_id == "task-1"
+        assert await store.release_worker("w1") == ["task-1"]
+
+    assert not await store.redis.hexists(store.queue_crashes_key(), "task-1")
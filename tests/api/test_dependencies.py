@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import dependencies
+from api.main import app
+
+
+def test_lifespan_shares_one_resource_container_and_closes_it(monkeypatch: pytest.MonkeyPatch) -> None:
+    closed: list[object] = []
+    loads: list[int] = []
+    real_load = dependencies.load_settings
+
+    def counting_load():
+        loads.append(1)
+        return real_load()
+
+    async def fake_aclose(self) -> None:
+        closed.append(self)
+
+    monkeypatch.setattr(dependencies, "load_settings", counting_load)
+    monkeypatch.setattr(dependencies.ApiResources, "aclose", fake_aclose)
+    monkeypatch.setattr(dependencies.EventHub, "start", lambda self: None)
+
+    with TestClient(app):
+        resources = app.state.resources
+        request = SimpleNamespace(app=app)
+        assert dependencies.get_db(request) is dependencies.get_db(request) is resources.db
+        assert dependencies.get_redis(request) is resources.redis
+        assert dependencies.get_minio(request) is resources.minio
+        assert dependencies.get_settings(request) is resources.settings
+        assert dependencies.get_event_hub(request) is resources.events
+        assert resources.events.redis is resources.redis
+
+    assert loads == [1]
+    assert closed == [resources]
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.event_hub import EventHub
+from api.main import app
+from api.routes import events as event_routes
+from store.redis_client import RedisStore, TaskEvent
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def _store(**kwargs: object) -> RedisStore:
+    store = RedisStore.__new__(RedisStore)
+    RedisStore.__init__(store, "redis://localhost:6379/0", "evoclip:task", "evoclip:sse", 60, 60, **kwargs)
+    store.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    return store
+
+
+async def _next(stream, timeout: float = 2.0):
+    return await asyncio.wait_for(stream.__anext__(), timeout)
+
+
+async def test_publish_event_keeps_bounded_replayable_stream() -> None:
+    store = _store(event_stream_maxlen=3)
+    ids = [await store.publish_event("t1", {"progress": idx}) for idx in range(3)]
+
+    events = await store.read_events("t1")
+    assert [event.id for event in events] == ids
+    assert events[0].data == '{"progress": 0}'
+    assert [event.id for event in await store.read_events("t1", after=ids[0])] == ids[1:]
+    assert await store.redis.ttl(store.event_stream_key("t1")) > 0
+
+
+async def test_hub_replays_history_then_pushes_live_events_once() -> None:
+    store = _store()
+    early = [await store.publish_event("t1", {"status": "queued"}), await store.publish_event("t1", {"status": "a"})]
+    hub = EventHub(store, heartbeat_seconds=5)
+    stream = hub.events("t1")
+    try:
+        assert [(await _next(stream)).id for _ in early] == early
+        assert hub.connections == 1
+
+        await store.publish_event("t2", {"status": "other-task"})
+        live = await store.publish_event("t1", {"status": "b"})
+        event = await _next(stream)
+        assert (event.id, event.data) == (live, '{"status": "b"}')
+    finally:
+        await stream.aclose()
+        await hub.stop()
+    assert hub.connections == 0
+
+
+async def test_hub_resumes_after_last_event_id_and_ignores_invalid_ids() -> None:
+    store = _store()
+    ids = [await store.publish_event("t1", {"progress": idx}) for idx in range(4)]
+    hub = EventHub(store)
+    resumed = hub.events("t1", ids[1])
+    invalid = hub.events("t1", "not-an-id")
+    try:
+        assert [(await _next(resumed)).id for _ in range(2)] == ids[2:]
+        assert (await _next(invalid)).id == ids[0]
+    finally:
+        await resumed.aclose()
+        await invalid.aclose()
+        await hub.stop()
+
+
+async def test_hub_recovers_slow_subscriber_from_stream_and_sends_heartbeats() -> None:
+    store = _store()
+    hub = EventHub(store, queue_size=2, heartbeat_seconds=0.05)
+    stream = hub.events("t1")
+    try:
+        assert await _next(stream) is None
+        # 连接未消费期间积压超过队列上限，之后应从事件流补齐且不重复
+        ids = [await store.publish_event("t1", {"progress": idx}) for idx in range(5)]
+        await asyncio.sleep(0.01)
+        received = []
+        while len(received) < len(ids):
+            event = await _next(stream)
+            if event is not None:
+                received.append(event.id)
+        assert received == ids
+    finally:
+        await stream.aclose()
+        await hub.stop()
+
+
+class _FakeHub:
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, str | None]] = []
+
+    async def events(self, task_id: str, last_event_id: str | None = None):
+        self.calls.append((task_id, last_event_id))
+        yield TaskEvent(id="1-0", data='{"status": "queued"}')
+        yield None
+        yield TaskEvent(id="2-0", data='{"progress": 10}')
+
+
+def test_events_route_formats_sse_and_passes_last_event_id() -> None:
+    hub = _FakeHub()
+    app.dependency_overrides[event_routes.get_event_hub] = lambda: hub
+    try:
+        with TestClient(app) as client:
+            response = client.get("/tasks/t1/events", headers={"Last-Event-ID": "1-0"})
+            query = client.get("/tasks/t1/events?last_event_id=2-0")
+    finally:
+        app.dependency_overrides.pop(event_routes.get_event_hub, None)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.text == (
+        "retry: 3000\n\n"
+        'id: 1-0\ndata: {"status": "queued"}\n\n'
+        ": keepalive\n\n"
+        'id: 2-0\ndata: {"progress": 10}\n\n'
+    )
+    assert query.status_code == 200
+    assert hub.calls == [("t1", "1-0"), ("t1", "2-0")]
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
+import hashlib
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from io import BytesIO
+from types import SimpleNamespace
 
+import pytest
 from fastapi.testclient import TestClient
 
 from api.main import app
 from api.routes import tasks as task_routes
 from store.database import DatabaseUnavailableError
+from store.minio_client import MinioStore, UploadTooLargeError, stored_content_sha256
 
 
 class _TaskModel:
@@ -65,6 +69,8 @@ class _UnavailableDB:
 class _FakeMinio:
     def __init__(self) -> None:
         self.objects: dict[tuple[str, str], bytes] = {}
+        self.opened: list[tuple[int, int | None]] = []
+        self.metadata: dict[tuple[str, str], dict[str, str]] = {}
 
     def ensure_bucket(self, _bucket: str) -> None:
         return None
@@ -73,21 +79,87 @@ class _FakeMinio:
         self.objects[(bucket, object_key)] = data
         return f"{bucket}/{object_key}"
 
-    def download_bytes(self, bucket: str, object_key: str) -> bytes:
-        return self.objects[(bucket, object_key)]
+    def upload_stream(
+        self,
+        bucket: str,
+        object_key: str,
+        stream,
+        content_type: str = "",
+        part_size: int = 0,
+        max_bytes=None,
+        record_sha256: bool = False,
+    ) -> int:
+        data = stream.read()
+        if max_bytes is not None and len(data) > max_bytes:
+            raise UploadTooLargeError("upload_too_large")
+        self.objects[(bucket, object_key)] = data
+        if record_sha256:
+            self.metadata[(bucket, object_key)] = {"content-sha256": hashlib.sha256(data).hexdigest()}
+        return len(data)
+
+    def remove_object(self, bucket: str, object_key: str) -> None:
+        self.objects.pop((bucket, object_key), None)
+
+    def presigned_put_object(self, bucket: str, object_key: str, *, expires, public_base_url=None) -> str:
+        return f"http://minio.local/{bucket}/{object_key}?signed=1"
+
+    def stat_object(self, bucket: str, object_key: str):
+        if (bucket, object_key) not in self.objects:
+            raise FileNotFoundError(object_key)
+        return SimpleNamespace(
+            size=len(self.objects[(bucket, object_key)]),
+            etag="abc123",
+            last_modified=datetime(2024, 5, 1, 8, 30, 15, 500000, tzinfo=timezone.utc),
+        )
+
+    def open_object(self, bucket: str, object_key: str, offset: int = 0, length: int | None = None):
+        self.opened.append((offset, length))
+        data = self.objects[(bucket, object_key)]
+        return _FakeObjectResponse(data[offset : offset + length if length else None])
+
+    def presigned_get_object(self, bucket: str, object_key: str, *, expires, public_base_url=None) -> str:
+        return f"http://minio.local/{bucket}/{object_key}?signed=get"
+
+
+class _FakeObjectResponse:
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.released = False
+
+    def stream(self, chunk_size: int):
+        for idx in range(0, len(self.data), chunk_size):
+            yield self.data[idx : idx + chunk_size]
+
+    def close(self) -> None:
+        return None
+
+    def release_conn(self) -> None:
+        self.released = True
 
 
 class _FakeRedis:
     def __init__(self) -> None:
         self.queue: list[str] = []
+        self.lanes: dict[str, tuple[str | None, str | None]] = {}
+        self.uploads: dict[str, dict] = {}
         self.events: list[dict] = []
 
-    async def enqueue_task(self, task_id: str) -> None:
+    async def enqueue_task(self, task_id: str, priority: str | None = None, tenant: str | None = None) -> None:
         self.queue.append(task_id)
+        self.lanes[task_id] = (priority, tenant)
 
     async def publish_event(self, task_id: str, payload: dict) -> None:
         self.events.append({"task_id": task_id, **payload})
 
+    async def set_upload_session(self, upload_id: str, payload: dict, ttl_seconds: int) -> None:
+        self.uploads[upload_id] = payload
+
+    async def get_upload_session(self, upload_id: str) -> dict | None:
+        return self.uploads.get(upload_id)
+
+    async def claim_upload_session(self, upload_id: str) -> bool:
+        return self.uploads.pop(upload_id, None) is not None
+
 
 class _FakeSettings:
     app = {
@@ -296,3 +368,332 @@ def test_retry_increments_count() -> None:
         # 第二次重试
         client.post(f"/tasks/{task_id}/retry")
         assert fake_db.tasks[task_id].retry_count == 4
+
+
+def test_create_task_routes_priority_and_tenant_and_retry_keeps_them() -> None:
+    client, fake_db, _fake_minio, fake_redis = make_client()
+    with client:
+        response = client.post(
+            "/tasks",
+            files={"video": ("demo.mp4", BytesIO(b"video"), "video/mp4")},
+            data={"product_description": "good product", "priority": "high", "tenant": "shop-42"},
+        )
+        task_id = response.json()["task_id"]
+        assert fake_redis.lanes[task_id] == ("high", "shop-42")
+        assert fake_db.tasks[task_id].detail["queue"] == {"priority": "high", "tenant": "shop-42"}
+
+        task = fake_db.tasks[task_id]
+        task.status = "failed"
+        task.checkpoint = "video-analysis"
+        fake_redis.lanes.clear()
+        client.post(f"/tasks/{task_id}/retry")
+
+    assert fake_redis.lanes[task_id] == ("high", "shop-42")
+
+
+def test_retry_moves_removed_lane_to_default_and_restores_failed_on_enqueue_error() -> None:
+    client, fake_db, _fake_minio, fake_redis = make_client()
+    task = _TaskModel("t1", "videos/t1/source.mp4", "desc")
+    task.status = "failed"
+    task.checkpoint = "video-analysis"
+    task.detail = {"queue": {"priority": "urgent", "tenant": "shop-42"}}
+    fake_db.tasks["t1"] = task
+    with client:
+        assert client.post("/tasks/t1/retry").status_code == 200
+        assert fake_redis.lanes["t1"] == ("normal", "shop-42")
+        assert task.detail["queue"] == {"priority": "normal", "tenant": "shop-42"}
+
+        async def broken_enqueue(*_args, **_kwargs) -> None:
+            raise ConnectionError("redis_down")
+
+        task.status = "failed"
+        fake_redis.enqueue_task = broken_enqueue
+        response = client.post("/tasks/t1/retry")
+
+    assert response.status_code == 503
+    assert response.json()["detail"] == "task_enqueue_failed"
+    assert task.status == "failed"
+    assert task.detail["error"].startswith("retry_enqueue_failed:")
+
+
+def test_create_task_defaults_and_rejects_unknown_queue_fields() -> None:
+    client, fake_db, _fake_minio, fake_redis = make_client()
+    with client:
+        response = client.post(
+            "/tasks",
+            files={"video": ("demo.mp4", BytesIO(b"video"), "video/mp4")},
+            data={"product_description": "good product"},
+        )
+        assert fake_redis.lanes[response.json()["task_id"]] == ("normal", "default")
+
+        bad_priority = client.post(
+            "/tasks",
+            files={"video": ("demo.mp4", BytesIO(b"video"), "video/mp4")},
+            data={"product_description": "good product", "priority": "urgent"},
+        )
+        bad_tenant = client.post(
+            "/tasks",
+            files={"video": ("demo.mp4", BytesIO(b"video"), "video/mp4")},
+            data={"product_description": "good product", "tenant": "a:b"},
+        )
+
+    assert bad_priority.status_code == 400
+    assert bad_priority.json()["detail"] == "invalid_priority"
+    assert bad_tenant.status_code == 400
+    assert bad_tenant.json()["detail"] == "invalid_tenant"
+    assert len(fake_db.tasks) == 1
+
+
+def test_retry_accepts_task_with_step_ledger() -> None:
+    client, fake_db, _fake_minio, fake_redis = make_client()
+    with client:
+        response = client.post(
+            "/tasks",
+            files={"video": ("demo.mp4", BytesIO(b"video"), "video/mp4")},
+            data={"product_description": "good product"},
+        )
+        task_id = response.json()["task_id"]
+        task = fake_db.tasks[task_id]
+        task.status = "failed"
+        task.checkpoint = None
+        task.detail = {**task.detail, "step_ledger": {"video-analysis": {"fingerprint": "x"}}}
+
+        retry_response = client.post(f"/tasks/{task_id}/retry")
+
+    assert retry_response.status_code == 200
+    assert fake_redis.events[-1]["completed_steps"] == ["video-analysis"]
+
+
+def test_create_task_rejects_oversized_upload_and_cleans_up() -> None:
+    client, fake_db, fake_minio, fake_redis = make_client()
+
+    class _SmallLimitSettings(_FakeSettings):
+        app = {**_FakeSettings.app, "max_upload_mb": 1}
+
+    app.dependency_overrides[task_routes.get_settings] = lambda: _SmallLimitSettings()
+    with client:
+        response = client.post(
+            "/tasks",
+            files=[
+                ("videos", ("small.mp4", BytesIO(b"video"), "video/mp4")),
+                ("videos", ("big.mp4", BytesIO(b"x" * (1024 * 1024 + 1)), "video/mp4")),
+            ],
+            data={"product_description": "good product"},
+        )
+
+    assert response.status_code == 413
+    assert response.json()["detail"] == "upload_too_large"
+    assert fake_db.tasks == {}
+    assert fake_minio.objects == {}
+    assert fake_redis.queue == []
+
+
+def test_create_task_records_content_digest_in_object_metadata() -> None:
+    client, fake_db, fake_minio, _fake_redis = make_client()
+    with client:
+        response = client.post(
+            "/tasks",
+            files={"video": ("demo.mp4", BytesIO(b"video"), "video/mp4")},
+            data={"product_description": "good product"},
+        )
+    object_key = fake_db.tasks[response.json()["task_id"]].detail["input_video_keys"][0]
+    assert fake_minio.objects[("videos", object_key)] == b"video"
+    assert fake_minio.metadata[("videos", object_key)] == {"content-sha256": hashlib.sha256(b"video").hexdigest()}
+
+
+def test_minio_stored_content_sha256_reads_metadata_only() -> None:
+    assert stored_content_sha256(SimpleNamespace(metadata={"X-Amz-Meta-Content-Sha256": "abc"})) == "abc"
+    assert stored_content_sha256(SimpleNamespace(metadata={"Content-Type": "video/mp4"})) is None
+    assert stored_content_sha256(SimpleNamespace(metadata=None)) is None
+
+
+def test_minio_set_content_sha256_replaces_metadata_in_place() -> None:
+    copies: list[tuple] = []
+
+    class _Client:
+        def copy_object(self, bucket, object_name, source, metadata=None, metadata_directive=None):
+            copies.append((bucket, object_name, source.bucket_name, source.object_name, metadata, metadata_directive))
+
+    store = MinioStore.__new__(MinioStore)
+    store.client = _Client()
+    store.set_content_sha256("videos", "a.mp4", "abc", "video/mp4")
+
+    assert copies == [
+        ("videos", "a.mp4", "videos", "a.mp4", {"content-sha256": "abc", "Content-Type": "video/mp4"}, "REPLACE")
+    ]
+
+
+def test_minio_upload_stream_uses_multipart_and_stops_at_limit() -> None:
+    calls: list[dict] = []
+    copies: list[dict] = []
+
+    class _Client:
+        def put_object(self, bucket, object_name, data, length, part_size, content_type):
+            calls.append({"length": length, "part_size": part_size})
+            while data.read(part_size):
+                pass
+
+        def copy_object(self, bucket, object_name, source, metadata=None, metadata_directive=None):
+            copies.append(metadata)
+
+    store = MinioStore.__new__(MinioStore)
+    store.client = _Client()
+
+    assert store.upload_stream("videos", "a.mp4", BytesIO(b"x" * 10), part_size=1) == 10
+    assert calls == [{"length": -1, "part_size": 5 * 1024 * 1024}]
+    assert copies == []
+
+    # 摘要在上传读取时一并算出，不再单独读一遍文件
+    assert store.upload_stream("videos", "c.mp4", BytesIO(b"x" * 10), content_type="video/mp4", record_sha256=True) == 10
+    assert copies == [{"content-sha256": hashlib.sha256(b"x" * 10).hexdigest(), "Content-Type": "video/mp4"}]
+
+    with pytest.raises(UploadTooLargeError):
+        store.upload_stream("videos", "b.mp4", BytesIO(b"x" * 10), max_bytes=5, record_sha256=True)
+    assert len(copies) == 1
+
+
+def test_presigned_upload_flow_validates_objects_before_enqueue() -> None:
+    client, fake_db, fake_minio, fake_redis = make_client()
+    with client:
+        created = client.post(
+            "/tasks/uploads",
+            json={
+                "videos": [{"filename": "a.mov", "size": 5}],
+                "voice_samples": [{"filename": "voice.m4a", "content_type": "audio/mp4", "size": 3}],
+            },
+        )
+        assert created.status_code == 200
+        body = created.json()
+        upload_id = body["upload_id"]
+        files = body["files"]
+        assert [item["object_key"] for item in files] == [f"{upload_id}/source_0.mov", f"{upload_id}/voice_sample_0.m4a"]
+        assert files[1]["headers"] == {"Content-Type": "audio/mp4"}
+
+        fake_minio.objects[("videos", files[0]["object_key"])] = b"video"
+        incomplete = client.post(f"/tasks/uploads/{upload_id}/finalize", json={"product_description": "good"})
+        assert incomplete.status_code == 400
+        assert incomplete.json()["detail"] == f"upload_incomplete:{files[1]['object_key']}"
+
+        fake_minio.objects[("videos", files[1]["object_key"])] = b"voi"
+        finalized = client.post(
+            f"/tasks/uploads/{upload_id}/finalize",
+            json={"product_description": "good", "priority": "high"},
+        )
+        again = client.post(f"/tasks/uploads/{upload_id}/finalize", json={"product_description": "good"})
+
+    assert finalized.status_code == 200
+    assert finalized.json()["task_id"] == upload_id
+    task = fake_db.tasks[upload_id]
+    assert task.detail["input_video_keys"] == [files[0]["object_key"]]
+    assert task.detail["voice_sample_keys"] == [files[1]["object_key"]]
+    assert fake_redis.lanes[upload_id] == ("high", "default")
+    assert again.status_code == 404
+
+
+def test_presigned_upload_rejects_size_mismatch_and_oversized_declarations() -> None:
+    client, _fake_db, fake_minio, _fake_redis = make_client()
+    with client:
+        too_large = client.post("/tasks/uploads", json={"videos": [{"filename": "a.mp4", "size": 501 * 1024 * 1024}]})
+        created = client.post("/tasks/uploads", json={"videos": [{"filename": "a.mp4", "size": 5}]}).json()
+        fake_minio.objects[("videos", created["files"][0]["object_key"])] = b"longer-than-declared"
+        mismatch = client.post(f"/tasks/uploads/{created['upload_id']}/finalize", json={"product_description": "good"})
+
+    assert too_large.status_code == 413
+    assert mismatch.status_code == 400
+    assert mismatch.json()["detail"].startswith("upload_size_mismatch:")
+
+
+def _client_with_output(payload: bytes):
+    client, fake_db, fake_minio, _fake_redis = make_client()
+    task = _TaskModel("t1", "videos/t1/source.mp4", "desc")
+    task.output_video_key = "output/t1/final.mp4"
+    fake_db.tasks["t1"] = task
+    fake_minio.objects[("output", "t1/final.mp4")] = payload
+    return client, fake_minio
+
+
+def test_download_streams_with_range_and_caching_headers() -> None:
+    payload = bytes(range(256)) * 10
+    client, fake_minio = _client_with_output(payload)
+    with client:
+        full = client.get("/tasks/t1/download")
+        assert full.status_code == 200
+        assert full.content == payload
+        assert full.headers["accept-ranges"] == "bytes"
+        assert full.headers["content-length"] == str(len(payload))
+        assert full.headers["etag"] == '"abc123"'
+        assert full.headers["last-modified"] == "Wed, 01 May 2024 08:30:15 GMT"
+
+        partial = client.get("/tasks/t1/download", headers={"Range": "bytes=100-199"})
+        assert partial.status_code == 206
+        assert partial.content == payload[100:200]
+        assert partial.headers["content-range"] == f"bytes 100-199/{len(payload)}"
+        assert partial.headers["content-length"] == "100"
+
+        suffix = client.get("/tasks/t1/download", headers={"Range": "bytes=-10"})
+        assert suffix.status_code == 206
+        assert suffix.content == payload[-10:]
+
+        open_ended = client.get("/tasks/t1/download", headers={"Range": "bytes=2500-"})
+        assert open_ended.content == payload[2500:]
+        assert fake_minio.opened == [(0, len(payload)), (100, 100), (len(payload) - 10, 10), (2500, 60)]
+
+        unsatisfiable = client.get("/tasks/t1/download", headers={"Range": f"bytes={len(payload)}-"})
+        assert unsatisfiable.status_code == 416
+        assert unsatisfiable.headers["content-range"] == f"bytes */{len(payload)}"
+
+        # 多段或无法识别的 Range 按整文件返回
+        assert client.get("/tasks/t1/download", headers={"Range": "bytes=0-1,5-6"}).status_code == 200
+        assert client.get("/tasks/t1/download", headers={"Range": "items=0-1"}).status_code == 200
+
+
+def test_download_conditional_requests() -> None:
+    client, fake_minio = _client_with_output(b"x" * 50)
+    with client:
+        assert client.get("/tasks/t1/download", headers={"If-None-Match": '"abc123"'}).status_code == 304
+        assert client.get("/tasks/t1/download", headers={"If-None-Match": 'W/"abc123", "zzz"'}).status_code == 304
+        assert client.get("/tasks/t1/download", headers={"If-None-Match": '"other"'}).status_code == 200
+        assert (
+            client.get("/tasks/t1/download", headers={"If-Modified-Since": "Wed, 01 May 2024 08:30:15 GMT"}).status_code
+            == 304
+        )
+        assert (
+            client.get("/tasks/t1/download", headers={"If-Modified-Since": "Wed, 01 May 2024 08:30:14 GMT"}).status_code
+            == 200
+        )
+
+        stale = client.get("/tasks/t1/download", headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+        assert stale.status_code == 200
+        assert len(stale.content) == 50
+        fresh = client.get("/tasks/t1/download", headers={"Range": "bytes=0-9", "If-Range": '"abc123"'})
+        assert fresh.status_code == 206
+        assert len(fresh.content) == 10
+        # 304 不读取对象
+        assert len(fake_minio.opened) == 4
+
+
+def test_download_redirects_to_presigned_url_and_reports_missing_video() -> None:
+    client, fake_minio = _client_with_output(b"x" * 50)
+    with client:
+        response = client.get("/tasks/t1/download?redirect=true", follow_redirects=False)
+        assert response.status_code == 302
+        assert response.headers["location"] == "http://minio.local/output/t1/final.mp4?signed=get"
+        assert fake_minio.opened == []
+
+        assert client.get("/tasks/missing/download").status_code == 404
+        fake_minio.objects.clear()
+        assert client.get("/tasks/t1/download").json()["detail"] == "video_not_found"
+
+
+def test_iter_object_chunks_releases_connection() -> None:
+    from store.minio_client import iter_object_chunks
+
+    response = _FakeObjectResponse(b"abcdefg")
+    assert list(iter_object_chunks(response, 3)) == [b"abc", b"def", b"g"]
+    assert response.released
+
+    response = _FakeObjectResponse(b"abcdefg")
+    chunks = iter_object_chunks(response, 3)
+    next(chunks)
+    chunks.close()
+    assert response.released
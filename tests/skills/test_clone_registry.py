@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import wave
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from skills.voice_synthesis.clone_registry import CloneRegistry, sample_fingerprint
+from skills.voice_synthesis.server import VoiceSynthesisService
+
+
+class _FakeRedis:
+    def __init__(self) -> None:
+        self.data: dict[str, str] = {}
+        self.ttls: dict[str, int] = {}
+
+    async def get(self, key: str) -> str | None:
+        return self.data.get(key)
+
+    async def set(self, key: str, value: str, ex: int | None = None) -> None:
+        self.data[key] = value
+        self.ttls[key] = ex or 0
+
+    async def delete(self, key: str) -> None:
+        self.data.pop(key, None)
+
+
+def _write_speech(path: Path, noise: float = 0.0, seed: int = 0) -> Path:
+    rate = 16000
+    t = np.arange(rate * 3) / rate
+    envelope = 0.2 + 0.8 * (np.sin(2 * np.pi * 1.3 * t) > 0) * np.abs(np.sin(2 * np.pi * 0.7 * t))
+    signal = envelope * np.sin(2 * np.pi * 220 * t)
+    signal += noise * np.random.default_rng(seed).standard_normal(signal.size)
+    with wave.open(str(path), "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(rate)
+        writer.writeframes((np.clip(signal, -1, 1) * 20000).astype("<i2").tobytes())
+    return path
+
+
+def test_sample_fingerprint_tolerates_small_noise_but_not_other_audio(tmp_path: Path) -> None:
+    clean = _write_speech(tmp_path / "clean.wav")
+    noisy = _write_speech(tmp_path / "noisy.wav", noise=0.001, seed=1)
+    with wave.open(str(tmp_path / "tone.wav"), "wb") as writer:
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(16000)
+        writer.writeframes((np.linspace(0, 1, 48000) * 8000).astype("<i2").tobytes())
+
+    assert sample_fingerprint(clean) == sample_fingerprint(noisy)
+    assert sample_fingerprint(clean) != sample_fingerprint(tmp_path / "tone.wav")
+
+
+def _clone_service(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> tuple[VoiceSynthesisService, list[str]]:
+    service = VoiceSynthesisService()
+    service.adapter.provider = "dashscope_clone"
+    service.clone_fixed_voice_id = None
+    service.clone_audio_url = None
+    service.clone_from_video = True
+    service.audio_cache = None
+    service.clone_registry = CloneRegistry(redis_url="redis://localhost:6379/15")
+    service.clone_registry.redis = _FakeRedis()
+    clone_calls: list[str] = []
+
+    monkeypatch.setattr(service, "_build_clone_sample", lambda _keys, working_dir: _write_speech(working_dir / "s.wav"))
+    monkeypatch.setattr(service, "_publish_clone_sample", lambda task_id, _path: f"https://public.example.com/{task_id}.wav")
+
+    async def fake_clone(task_id: str, audio_url: str) -> str:
+        clone_calls.append(audio_url)
+        return f"voice-{task_id}"
+
+    monkeypatch.setattr(service, "_clone_from_audio_url", fake_clone)
+    monkeypatch.setattr(service.minio, "ensure_bucket", lambda *_: None)
+    monkeypatch.setattr("skills.voice_synthesis.server.read_duration_ms", lambda *_: 1000)
+    monkeypatch.setattr(service.minio, "upload_file", lambda bucket, key, path, content_type: f"{bucket}/{key}")
+    return service, clone_calls
+
+
+@pytest.mark.asyncio
+async def test_resolve_voice_profile_reuses_registered_clone(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    service, clone_calls = _clone_service(monkeypatch, tmp_path)
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+
+    first_state: dict[str, object] = {}
+    first = await service._resolve_voice_profile("task-a", ["v.mp4"], tmp_path / "a", clone_state=first_state)
+    second_state: dict[str, object] = {}
+    second = await service._resolve_voice_profile("task-b", ["v.mp4"], tmp_path / "b", clone_state=second_state)
+
+    assert first == ("voice-task-a", False)
+    assert second == ("voice-task-a", False)
+    assert len(clone_calls) == 1
+    assert first_state["source"] == "clone"
+    assert second_state["source"] == "registry"
+    assert first_state["registry_key"] == second_state["registry_key"]
+
+
+@pytest.mark.asyncio
+async def test_registered_voice_is_invalidated_when_all_sentences_fail(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    service, clone_calls = _clone_service(monkeypatch, tmp_path)
+    key = service.clone_registry.key_for("stale", service.adapter.dashscope_model, service.clone_language_hint)
+    await service.clone_registry.put(key, "voice-deleted")
+
+    async def fake_registry_key(_sample: Path | None) -> str:
+        return key
+
+    async def fail(*_: object, **__: object) -> None:
+        raise RuntimeError("voice_not_found")
+
+    monkeypatch.setattr(service, "_clone_registry_key", fake_registry_key)
+    monkeypatch.setattr(service.adapter, "synthesize", fail)
+    monkeypatch.setattr("skills.voice_synthesis.server.retry_async", lambda fn, _policy: fn())
+
+    result = await service.synthesize_voice(task_id="t", sentences=[{"sentence_id": "t_0", "text": "hi"}], source_video_key="v.mp4")
+
+    assert result["voice_profile"] == "voice-deleted"
+    assert result["voice_profile_source"] == "registry"
+    assert result["voice_profile_invalidated"] is True
+    assert await service.clone_registry.get(key) is None
+    assert clone_calls == []
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from skills.common import AdaptiveLimiter, is_overload_error
+
+
+async def _succeed(limiter: AdaptiveLimiter) -> None:
+    async with limiter:
+        await asyncio.sleep(0)
+
+
+async def _fail(limiter: AdaptiveLimiter, exc: Exception) -> None:
+    with pytest.raises(type(exc)):
+        async with limiter:
+            raise exc
+
+
+@pytest.mark.asyncio
+async def test_limiter_grows_per_window_and_halves_on_overload() -> None:
+    limiter = AdaptiveLimiter("vision", initial_limit=2, min_limit=1, max_limit=3, cooldown_seconds=60)
+
+    for _ in range(2):
+        await _succeed(limiter)
+    assert limiter.limit == 3
+    for _ in range(5):
+        await _succeed(limiter)
+    assert limiter.limit == 3
+
+    await _fail(limiter, RuntimeError("vision_status_429"))
+    await _fail(limiter, asyncio.TimeoutError())
+    assert limiter.limit == 1
+    assert limiter.stats["overloads"] == 2
+    assert limiter.stats["decreases"] == 1
+
+    await _fail(limiter, ValueError("invalid_llm_response"))
+    assert limiter.limit == 1
+    assert limiter.snapshot()["failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_limiter_queues_callers_beyond_limit_in_order() -> None:
+    limiter = AdaptiveLimiter("tts", initial_limit=1, max_limit=1)
+    release = asyncio.Event()
+    order: list[int] = []
+
+    async def _call(index: int) -> None:
+        async with limiter:
+            order.append(index)
+            await release.wait()
+
+    tasks = [asyncio.create_task(_call(index)) for index in range(3)]
+    await asyncio.sleep(0)
+    assert limiter.in_flight == 1
+    assert limiter.queue_depth == 2
+
+    release.set()
+    await asyncio.gather(*tasks)
+
+    assert order == [0, 1, 2]
+    assert limiter.snapshot()["in_flight"] == 0
+    assert limiter.stats["max_queue_depth"] == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_slot() -> None:
+    limiter = AdaptiveLimiter("asr", initial_limit=1, max_limit=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    limiter.release()
+
+    assert limiter.in_flight == 0
+    assert limiter.queue_depth == 0
+    await asyncio.wait_for(_succeed(limiter), timeout=1)
+
+
+def test_is_overload_error_detects_status_and_throttling_messages() -> None:
+    class _StatusError(Exception):
+        status_code = 429
+
+    assert is_overload_error(_StatusError("slow down"))
+    assert is_overload_error(RuntimeError("dashscope_tts_failed:400:Throttling.RateQuota"))
+    assert is_overload_error(TimeoutError())
+    assert not is_overload_error(RuntimeError("vision_status_500"))
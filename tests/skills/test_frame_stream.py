@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from skills import frame_stream
+from skills.frame_stream import FrameStream, VideoStreamInfo
+from skills.video_analysis import frame_extractor
+
+
+class _FakeProcess:
+    def __init__(self, stdout: bytes, stderr: bytes, returncode: int = 0) -> None:
+        self.stdout = BytesIO(stdout)
+        self.stderr = BytesIO(stderr)
+        self.returncode = returncode
+
+    def poll(self) -> int:
+        return self.returncode
+
+    def kill(self) -> None:
+        return None
+
+    def wait(self) -> int:
+        return self.returncode
+
+
+def _install_fake_ffmpeg(
+    monkeypatch, frames: np.ndarray, pts_times: list[str], returncode: int = 0
+) -> list[list[str]]:
+    commands: list[list[str]] = []
+    stderr = "".join(
+        f"[Parsed_showinfo_1 @ 0x1] n:{idx:4d} pts:{idx * 1000:7d} pts_time:{pts} duration:1\n"
+        for idx, pts in enumerate(pts_times)
+    ).encode("utf-8")
+
+    def fake_popen(cmd: list[str], **_kwargs: object) -> _FakeProcess:
+        commands.append(cmd)
+        return _FakeProcess(frames.tobytes(), stderr, returncode)
+
+    monkeypatch.setattr(frame_stream.subprocess, "Popen", fake_popen)
+    return commands
+
+
+def test_iter_batches_reuses_buffer_and_reads_stream_timestamps(monkeypatch) -> None:
+    frames = np.arange(5 * 2 * 3, dtype=np.uint8).reshape(5, 2, 3)
+    commands = _install_fake_ffmpeg(monkeypatch, frames, ["0.04", "1.04", "2.04", "3.04", "4.04"])
+    stream = FrameStream("clip.mp4", fps=1, pix_fmt="gray", info=VideoStreamInfo(width=3, height=2, duration_ms=5000))
+
+    batches = []
+    buffers = set()
+    for batch in stream.iter_batches(2):
+        buffers.add(batch.data.__array_interface__["data"][0])
+        batches.append((batch.start_index, list(batch.timestamps_ms), batch.data.copy()))
+
+    assert commands[0][-4:] == ["rawvideo", "-pix_fmt", "gray", "pipe:1"]
+    assert "fps=1,showinfo" in commands[0]
+    assert [item[0] for item in batches] == [0, 2, 4]
+    assert [item[1] for item in batches] == [[40, 1040], [2040, 3040], [4040]]
+    np.testing.assert_array_equal(np.concatenate([item[2] for item in batches]), frames)
+    assert len(buffers) == 1
+
+
+def test_frame_stream_falls_back_to_index_timestamps_without_showinfo(monkeypatch) -> None:
+    frames = np.zeros((3, 2, 2, 3), dtype=np.uint8)
+    _install_fake_ffmpeg(monkeypatch, frames, [])
+    stream = FrameStream("clip.mp4", fps=2, pix_fmt="rgb24", info=VideoStreamInfo(width=2, height=2, duration_ms=1500))
+
+    timestamps = [frame.timestamp_ms for frame in stream]
+
+    assert timestamps == [0, 500, 1000]
+
+
+def test_frame_stream_raises_when_ffmpeg_fails_after_some_frames(monkeypatch) -> None:
+    frames = np.zeros((3, 2, 2), dtype=np.uint8)
+    _install_fake_ffmpeg(monkeypatch, frames, [], returncode=1)
+    stream = FrameStream("clip.mp4", fps=1, pix_fmt="gray", info=VideoStreamInfo(width=2, height=2, duration_ms=3000))
+
+    received = []
+    with pytest.raises(RuntimeError, match="ffmpeg_frame_stream_failed:1"):
+        for frame in stream:
+            received.append(frame.index)
+    assert received == [0, 1, 2]
+
+    # 调用方主动提前结束时，被终止的 ffmpeg 的退出码不视为失败
+    frames_iter = iter(stream)
+    assert next(frames_iter).index == 0
+    frames_iter.close()
+
+
+def test_probe_video_stream_swaps_dimensions_for_rotated_video(monkeypatch) -> None:
+    monkeypatch.setattr(
+        frame_stream.ffmpeg,
+        "probe",
+        lambda _path: {
+            "streams": [
+                {"codec_type": "audio"},
+                {"codec_type": "video", "width": 1920, "height": 1080, "side_data_list": [{"rotation": -90}]},
+            ],
+            "format": {"duration": "3.5"},
+        },
+    )
+
+    info = frame_stream.probe_video_stream("clip.mp4")
+
+    assert info == VideoStreamInfo(width=1080, height=1920, duration_ms=3500)
+
+
+def test_extract_frames_encodes_streamed_rgb_frames(monkeypatch, tmp_path: Path) -> None:
+    frames = np.full((2, 4, 4, 3), 200, dtype=np.uint8)
+    _install_fake_ffmpeg(monkeypatch, frames, ["0", "1"])
+    monkeypatch.setattr(
+        frame_stream,
+        "probe_video_stream",
+        lambda _path: VideoStreamInfo(width=4, height=4, duration_ms=2000),
+    )
+
+    result = frame_extractor.extract_frames("clip.mp4", str(tmp_path / "frames"), fps=1)
+
+    assert [item.timestamp_ms for item in result] == [0, 1000]
+    assert [item.path.name for item in result] == ["frame_000001.jpg", "frame_000002.jpg"]
+    with Image.open(result[0].path) as image:
+        assert image.size == (4, 4)
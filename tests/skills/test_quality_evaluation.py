@@ -3,10 +3,17 @@ from __future__ import annotations
 import json
 from pathlib import Path
 
+import numpy as np
 import pytest
 
 from skills.quality_evaluation.server import QualityEvaluationService
 from skills.quality_evaluation.sync_checker import check_sync
+from skills.quality_evaluation.visual_checker import (
+    _laplacian_variance,
+    brightness_batch,
+    laplacian_variance_batch,
+    scan_frame_scores,
+)
 
 
 @pytest.mark.asyncio
@@ -64,3 +71,32 @@ def test_check_sync_prefers_final_audio_duration_ms() -> None:
     errors = check_sync(timeline, {"audio/task/t_0.mp3": 1000}, tolerance_ms=120)
     assert len(errors) == 1
     assert errors[0]["delta_ms"] == 160
+
+
+def test_laplacian_variance_batch_matches_per_pixel_convolution() -> None:
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 256, size=(3, 12, 17)).astype(np.float32)
+    kernel = np.array([[0, 1, 0], [1, -4, 1], [0, 1, 0]], dtype=np.float32)
+    expected = []
+    for gray in frames:
+        padded = np.pad(gray, ((1, 1), (1, 1)), mode="edge")
+        conv = np.zeros_like(gray)
+        for i in range(gray.shape[0]):
+            for j in range(gray.shape[1]):
+                conv[i, j] = np.sum(padded[i : i + 3, j : j + 3] * kernel)
+        expected.append(float(np.var(conv)))
+
+    np.testing.assert_allclose(laplacian_variance_batch(frames), expected, rtol=1e-5)
+    assert _laplacian_variance(frames[0]) == pytest.approx(expected[0], rel=1e-5)
+
+
+def test_scan_frame_scores_flags_black_and_blurry_frames() -> None:
+    frames = np.zeros((2, 8, 8), dtype=np.float32)
+    frames[1] = np.tile([0, 255], 32).reshape(8, 8)
+
+    issues = scan_frame_scores(brightness_batch(frames), laplacian_variance_batch(frames), [3000, 4000])
+
+    assert issues == [
+        {"type": "black_screen", "start_ms": 3000, "end_ms": 4000},
+        {"type": "blur", "start_ms": 3000, "end_ms": 4000},
+    ]
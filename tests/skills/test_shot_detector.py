@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+
+from skills import frame_stream
+from skills.frame_stream import RawFrame, VideoStreamInfo
+from skills.video_analysis import frame_extractor
+from skills.video_analysis.shot_detector import ShotDetector
+
+
+def _flat(value: int, size: int = 16) -> np.ndarray:
+    return np.full((size, size), value, dtype=np.uint8)
+
+
+def _textured(value: int, size: int = 16) -> np.ndarray:
+    frame = _flat(value, size).astype(np.int16)
+    frame[::2, ::2] += 20
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def _run(detector: ShotDetector, frames: list[np.ndarray], interval_ms: int = 500, end_ms: int | None = None):
+    shots = []
+    for index, data in enumerate(frames):
+        closed = detector.push(RawFrame(index=index, timestamp_ms=index * interval_ms, data=data))
+        if closed is not None:
+            shots.append(closed)
+    last = detector.finish(end_ms)
+    if last is not None:
+        shots.append(last)
+    return shots
+
+
+def test_detects_cuts_and_picks_sharpest_keyframe() -> None:
+    detector = ShotDetector(threshold=0.5, min_shot_ms=1000, analysis_stride=1)
+    frames = [_flat(20), _textured(20), _flat(20), _flat(200), _flat(200), _textured(200), _flat(120), _flat(120)]
+
+    shots = _run(detector, frames, end_ms=4000)
+
+    assert [(shot.start_ms, shot.end_ms) for shot in shots] == [(0, 1500), (1500, 3000), (3000, 4000)]
+    assert [shot.keyframe_ms for shot in shots] == [500, 2500, 3000]
+    np.testing.assert_array_equal(shots[0].keyframe, _textured(20))
+
+
+def test_flash_shorter_than_min_shot_is_merged() -> None:
+    detector = ShotDetector(threshold=0.5, min_shot_ms=1500, analysis_stride=1)
+    frames = [_flat(20), _flat(250), _flat(20), _flat(20), _flat(20), _flat(20), _flat(180), _flat(180)]
+
+    shots = _run(detector, frames)
+
+    assert [(shot.start_ms, shot.end_ms) for shot in shots] == [(0, 3000), (3000, 4000)]
+
+
+class _FakeProcess:
+    def __init__(self, stdout: bytes) -> None:
+        self.stdout = BytesIO(stdout)
+        self.stderr = BytesIO(b"")
+        self.returncode = 0
+
+    def poll(self) -> int:
+        return 0
+
+    def kill(self) -> None:
+        return None
+
+    def wait(self) -> int:
+        return 0
+
+
+def test_extract_frames_with_shot_detector_writes_one_keyframe_per_shot(monkeypatch, tmp_path: Path) -> None:
+    dark = np.full((8, 8, 3), 10, dtype=np.uint8)
+    bright = np.full((8, 8, 3), 230, dtype=np.uint8)
+    frames = np.stack([dark, dark, dark, bright, bright, bright])
+    monkeypatch.setattr(frame_stream.subprocess, "Popen", lambda *_args, **_kwargs: _FakeProcess(frames.tobytes()))
+    monkeypatch.setattr(
+        frame_stream,
+        "probe_video_stream",
+        lambda _path: VideoStreamInfo(width=8, height=8, duration_ms=3000),
+    )
+
+    result = frame_extractor.extract_frames(
+        "clip.mp4",
+        str(tmp_path),
+        fps=2,
+        shot_detector=ShotDetector(threshold=0.5, min_shot_ms=1000, analysis_stride=1),
+    )
+
+    assert [(item.timestamp_ms, item.shot_end_ms) for item in result] == [(0, 1500), (1500, 3000)]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["shot_000001.jpg", "shot_000002.jpg"]
@@ -76,7 +76,8 @@ async def test_synthesize_dashscope_new_sdk_compat(monkeypatch: pytest.MonkeyPat
     assert out.read_bytes() == b"audio-bytes"
 
 
-def test_clone_voice_accepts_missing_status_code_when_voice_id_present(monkeypatch: pytest.MonkeyPatch) -> None:
+@pytest.mark.asyncio
+async def test_clone_voice_accepts_missing_status_code_when_voice_id_present(monkeypatch: pytest.MonkeyPatch) -> None:
     class CreateResult:
         status_code = None
         output = {"voice_id": "voice_123"}
@@ -102,7 +103,7 @@ def test_clone_voice_accepts_missing_status_code_when_voice_id_present(monkeypat
         dashscope_voice="v",
     )
 
-    voice_id = adapter._clone_voice_sync(
+    voice_id = await adapter.clone_voice(
         audio_url="https://example.com/clone.wav",
         prefix="evoclip",
         poll_interval_seconds=1,
@@ -112,7 +113,8 @@ def test_clone_voice_accepts_missing_status_code_when_voice_id_present(monkeypat
     assert voice_id == "voice_123"
 
 
-def test_clone_voice_reports_rich_error_when_create_failed(monkeypatch: pytest.MonkeyPatch) -> None:
+@pytest.mark.asyncio
+async def test_clone_voice_reports_rich_error_when_create_failed(monkeypatch: pytest.MonkeyPatch) -> None:
     class CreateResult:
         status_code = None
         code = "InvalidParameter"
@@ -141,7 +143,7 @@ def test_clone_voice_reports_rich_error_when_create_failed(monkeypatch: pytest.M
     )
 
     with pytest.raises(RuntimeError) as exc:
-        adapter._clone_voice_sync(
+        await adapter.clone_voice(
             audio_url="https://example.com/clone.wav",
             prefix="evoclip",
             poll_interval_seconds=1,
@@ -153,7 +155,8 @@ def test_clone_voice_reports_rich_error_when_create_failed(monkeypatch: pytest.M
     assert "message=url is not reachable" in str(exc.value)
 
 
-def test_clone_voice_legacy_sdk_string_result_and_query_signature(monkeypatch: pytest.MonkeyPatch) -> None:
+@pytest.mark.asyncio
+async def test_clone_voice_legacy_sdk_string_result_and_query_signature(monkeypatch: pytest.MonkeyPatch) -> None:
     class FakeVoiceEnrollmentService:
         def create_voice(self, **kwargs: object) -> str:
             assert kwargs["prefix"] == "evoclip"
@@ -174,7 +177,7 @@ def test_clone_voice_legacy_sdk_string_result_and_query_signature(monkeypatch: p
         dashscope_voice="v",
     )
 
-    voice_id = adapter._clone_voice_sync(
+    voice_id = await adapter.clone_voice(
         audio_url="https://example.com/clone.wav",
         prefix="evoclip",
         poll_interval_seconds=1,
@@ -182,3 +185,71 @@ def test_clone_voice_legacy_sdk_string_result_and_query_signature(monkeypatch: p
         language_hint=None,
     )
     assert voice_id == "legacy_voice_1"
+
+
+@pytest.mark.asyncio
+async def test_clone_voice_polls_with_exponential_backoff_without_blocking(monkeypatch: pytest.MonkeyPatch) -> None:
+    statuses = iter(["PENDING", "DEPLOYING", "DEPLOYING", "OK_PENDING", "READY"])
+
+    class FakeVoiceEnrollmentService:
+        def create_voice(self, **kwargs: object) -> str:
+            _ = kwargs
+            return "voice_1"
+
+        def query_voice(self, voice: str) -> dict[str, object]:
+            assert voice == "voice_1"
+            return {"output": {"status": next(statuses)}}
+
+    delays: list[float] = []
+
+    async def fake_sleep(delay: float) -> None:
+        delays.append(delay)
+
+    monkeypatch.setattr(tts_adapter, "VoiceEnrollmentService", FakeVoiceEnrollmentService)
+    monkeypatch.setattr(tts_adapter.asyncio, "sleep", fake_sleep)
+
+    adapter = TTSAdapter(
+        provider="dashscope_clone",
+        openai_model="",
+        volcengine_voice="",
+        dashscope_api_key="k",
+        dashscope_model="m",
+        dashscope_voice="v",
+    )
+
+    voice_id = await adapter.clone_voice(
+        audio_url="https://example.com/clone.wav",
+        prefix="evoclip",
+        poll_interval_seconds=1,
+        max_wait_seconds=60,
+        poll_max_interval_seconds=4,
+    )
+
+    assert voice_id == "voice_1"
+    assert delays == [1, 2, 4, 4]
+
+
+@pytest.mark.asyncio
+async def test_clone_voice_raises_on_failed_status(monkeypatch: pytest.MonkeyPatch) -> None:
+    class FakeVoiceEnrollmentService:
+        def create_voice(self, **kwargs: object) -> str:
+            _ = kwargs
+            return "voice_1"
+
+        def query_voice(self, voice: str) -> dict[str, object]:
+            _ = voice
+            return {"status": "failed"}
+
+    monkeypatch.setattr(tts_adapter, "VoiceEnrollmentService", FakeVoiceEnrollmentService)
+
+    adapter = TTSAdapter(
+        provider="dashscope_clone",
+        openai_model="",
+        volcengine_voice="",
+        dashscope_api_key="k",
+        dashscope_model="m",
+        dashscope_voice="v",
+    )
+
+    with pytest.raises(RuntimeError, match="dashscope_clone_status:FAILED"):
+        await adapter.clone_voice(audio_url="https://example.com/clone.wav", prefix="evoclip")
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import threading
 from pathlib import Path
+from types import SimpleNamespace
 
 import pytest
 
@@ -12,6 +15,7 @@ from skills.video_analysis.frame_extractor import (
     validate_video_file,
 )
 from skills.video_analysis.server import Scene, VideoAnalysisService
+from skills.video_analysis.vision_adapter import parse_batch_response, parse_frame_response
 
 
 @pytest.mark.parametrize(
@@ -110,10 +114,45 @@ def test_limit_frames_downsamples_evenly() -> None:
     assert [item.timestamp_ms for item in selected] == [0, 3000, 6000, 9000]
 
 
+def test_limit_frames_merges_short_shots_instead_of_dropping_them() -> None:
+    service = VideoAnalysisService()
+    service.max_frames = 3
+    bounds = [(0, 4000), (4000, 4500), (4500, 9000), (9000, 9300), (9300, 12000)]
+    shots = [FrameInfo(path=Path(f"shot_{i}.jpg"), timestamp_ms=start, shot_end_ms=end) for i, (start, end) in enumerate(bounds)]
+
+    selected, limited = service._limit_frames(shots)
+
+    assert limited is True
+    assert [(item.timestamp_ms, item.shot_end_ms) for item in selected] == [(0, 4500), (4500, 9000), (9000, 12000)]
+    assert [item.path.name for item in selected] == ["shot_0.jpg", "shot_2.jpg", "shot_4.jpg"]
+
+
+def test_merge_frames_uses_shot_boundaries_as_scene_bounds() -> None:
+    service = VideoAnalysisService()
+    service.min_scene_duration_ms = 1000
+    service.scene_split_min_duration_ms = 0
+    scenes = service._merge_frames_into_scenes(
+        [
+            {"timestamp_ms": 0, "shot_end_ms": 2500, "description": "kitchen", "objects": ["pan"]},
+            {"timestamp_ms": 2500, "shot_end_ms": 6100, "description": "kitchen", "objects": ["pan"]},
+            {"timestamp_ms": 6100, "shot_end_ms": 8000, "description": "table", "objects": ["plate"]},
+        ],
+        duration_ms=8040,
+    )
+
+    # 描述相同的相邻镜头仍按真实切点分开
+    assert [(scene.scene_id, scene.start_ms, scene.end_ms) for scene in scenes] == [
+        ("s_0", 0, 2500),
+        ("s_1", 2500, 6100),
+        ("s_2", 6100, 8040),
+    ]
+
+
 @pytest.mark.asyncio
 async def test_analyze_frames_respects_concurrency_and_emits_progress(monkeypatch: pytest.MonkeyPatch) -> None:
     service = VideoAnalysisService()
     service.frame_analysis_concurrency = 2
+    service.vision_batch_size = 1
     frames = [FrameInfo(path=Path(f"frame_{i}.jpg"), timestamp_ms=i * 1000) for i in range(6)]
 
     active = 0
@@ -155,6 +194,7 @@ async def test_analyze_video_returns_frame_metrics(monkeypatch: pytest.MonkeyPat
     service = VideoAnalysisService()
     service.max_frames = 3
     service.frame_sample_fps = 1
+    service.result_cache_enabled = False
 
     class _Stat:
         size = 1024
@@ -202,3 +242,237 @@ async def test_analyze_video_returns_frame_metrics(monkeypatch: pytest.MonkeyPat
     assert metrics["videos"][0]["frame_limit_applied"] is True
     assert any(event.get("stage") == "frames_selected" for event in progress_events)
     assert any(event.get("stage") == "analysis_completed" for event in progress_events)
+
+
+@pytest.mark.asyncio
+async def test_analyze_video_prefetches_next_video_and_keeps_offsets(monkeypatch: pytest.MonkeyPatch) -> None:
+    service = VideoAnalysisService()
+    service.max_frames = 2
+    service.prefetch_videos = 1
+    service.scene_split_min_duration_ms = 10_000
+    service.result_cache_enabled = False
+
+    class _Stat:
+        size = 1024
+
+    timeline: list[str] = []
+    durations = {"0_a.mp4": 3000, "1_b.mp4": 4000, "2_c.mp4": 5000}
+    monkeypatch.setattr(service.minio.client, "stat_object", lambda *_args, **_kwargs: _Stat())
+    monkeypatch.setattr(
+        service.minio,
+        "download_file",
+        lambda _bucket, key, _path: timeline.append(f"download:{key}"),
+    )
+    monkeypatch.setattr(service.minio, "upload_bytes", lambda *_args, **_kwargs: None)
+    monkeypatch.setattr(
+        "skills.video_analysis.server.extract_frames",
+        lambda video_path, *_args, **_kwargs: [FrameInfo(path=Path(video_path), timestamp_ms=0)],
+    )
+    monkeypatch.setattr(
+        "skills.video_analysis.server.get_video_duration_ms",
+        lambda video_path: durations[Path(video_path).name],
+    )
+
+    async def fake_analyze_frames(frames: list[FrameInfo], *, source_video_key=None, progress_callback=None):
+        _ = progress_callback
+        timeline.append(f"vision_start:{source_video_key}")
+        await asyncio.sleep(0.05)
+        timeline.append(f"vision_end:{source_video_key}")
+        return [{"timestamp_ms": 0, "description": frames[0].path.name, "objects": []}]
+
+    async def fake_transcribe(video_path: str) -> list[dict[str, object]]:
+        timeline.append(f"asr_start:{Path(video_path).name}")
+        await asyncio.sleep(0.05)
+        return [{"begin_time": 0, "end_time": 100, "text": Path(video_path).name}]
+
+    monkeypatch.setattr(service, "_analyze_frames", fake_analyze_frames)
+    monkeypatch.setattr(service.speech, "transcribe", fake_transcribe)
+
+    events: list[dict[str, object]] = []
+
+    async def progress_callback(payload: dict[str, object]) -> None:
+        events.append(payload)
+
+    result = await service.analyze_video(
+        task_id="task-1",
+        video_object_keys=["a.mp4", "b.mp4", "c.mp4"],
+        progress_callback=progress_callback,
+    )
+
+    scenes = result["scenes"]
+    assert [(scene["start_ms"], scene["end_ms"]) for scene in scenes] == [(0, 3000), (3000, 7000), (7000, 12000)]
+    assert [scene["transcription"] for scene in scenes] == ["0_a.mp4", "1_b.mp4", "2_c.mp4"]
+    assert timeline.index("download:b.mp4") < timeline.index("vision_end:a.mp4")
+    assert timeline.index("asr_start:0_a.mp4") < timeline.index("vision_start:a.mp4")
+    assert all("asr_elapsed_ms" in item and "asr_wait_ms" in item for item in result["analysis_metrics"]["videos"])
+    started = [event["video_index"] for event in events if event.get("stage") == "video_started"]
+    completed = [event["video_index"] for event in events if event.get("stage") == "video_completed"]
+    assert started == completed == [0, 1, 2]
+
+
+def _install_result_cache_fakes(
+    monkeypatch: pytest.MonkeyPatch, service: VideoAnalysisService, stats: dict[str, object]
+) -> tuple[dict[tuple[str, str], bytes], list[str], list[threading.Thread]]:
+    objects: dict[tuple[str, str], bytes] = {}
+    downloads: list[str] = []
+    upload_threads: list[threading.Thread] = []
+
+    def fake_download_bytes(bucket: str, object_name: str) -> bytes:
+        if (bucket, object_name) not in objects:
+            raise FileNotFoundError(object_name)
+        return objects[(bucket, object_name)]
+
+    def fake_upload_bytes(bucket: str, object_name: str, data: bytes, content_type: str = "") -> str:
+        upload_threads.append(threading.current_thread())
+        objects[(bucket, object_name)] = data
+        return f"{bucket}/{object_name}"
+
+    def fake_download_file(_bucket: str, key: str, path: str) -> None:
+        downloads.append(key)
+        Path(path).write_bytes(b"same-content")
+
+    monkeypatch.setattr(service.minio.client, "stat_object", lambda _bucket, key: stats[key])
+    monkeypatch.setattr(service.minio, "download_file", fake_download_file)
+    monkeypatch.setattr(service.minio, "download_bytes", fake_download_bytes)
+    monkeypatch.setattr(service.minio, "upload_bytes", fake_upload_bytes)
+    monkeypatch.setattr(
+        "skills.video_analysis.server.extract_frames",
+        lambda *_args, **_kwargs: [FrameInfo(path=Path("f_0.jpg"), timestamp_ms=0)],
+    )
+    monkeypatch.setattr("skills.video_analysis.server.get_video_duration_ms", lambda *_args, **_kwargs: 3000)
+
+    async def fake_analyze_frames(frames: list[FrameInfo], *, source_video_key=None, progress_callback=None):
+        _ = source_video_key, progress_callback
+        return [{"timestamp_ms": 0, "description": "scene", "objects": []} for _ in frames]
+
+    async def fake_transcribe(_video_path: str) -> list[dict[str, object]]:
+        return []
+
+    monkeypatch.setattr(service, "_analyze_frames", fake_analyze_frames)
+    monkeypatch.setattr(service.speech, "transcribe", fake_transcribe)
+    return objects, downloads, upload_threads
+
+
+@pytest.mark.asyncio
+async def test_analyze_video_reuses_result_cache_for_same_source_digest(monkeypatch: pytest.MonkeyPatch) -> None:
+    service = VideoAnalysisService()
+    service.result_cache_enabled = True
+    digest = hashlib.sha256(b"same-content").hexdigest()
+    stats = {
+        "task-1/source_0.mp4": SimpleNamespace(size=2048, etag='"abc123"', metadata={"X-Amz-Meta-Content-Sha256": digest}),
+        # 同样内容经分片上传：ETag 不同，内容摘要相同
+        "task-2/source_0.mp4": SimpleNamespace(size=2048, etag='"def456-3"', metadata={"x-amz-meta-content-sha256": digest}),
+    }
+    objects, downloads, upload_threads = _install_result_cache_fakes(monkeypatch, service, stats)
+
+    first = await service.analyze_video(task_id="task-1", video_object_keys=["task-1/source_0.mp4"])
+    second = await service.analyze_video(task_id="task-2", video_object_keys=["task-2/source_0.mp4"])
+
+    assert first["analysis_cache"]["hit"] is False
+    assert second["analysis_cache"]["hit"] is True
+    assert second["analysis_cache"]["source_task_id"] == "task-1"
+    # 命中时场景指向本任务自己的源视频，而不是首次分析任务的对象
+    assert [scene["source_video_key"] for scene in second["scenes"]] == ["task-2/source_0.mp4"]
+    assert [{**scene, "source_video_key": None} for scene in second["scenes"]] == [
+        {**scene, "source_video_key": None} for scene in first["scenes"]
+    ]
+    assert second["result_path"] == "intermediate/task-2/scene_analysis.json"
+    assert ("intermediate", "task-2/scene_analysis.json") in objects
+    assert downloads == ["task-1/source_0.mp4"]
+    metrics = second["analysis_metrics"]
+    assert metrics["total_analyzed_frames"] == 0
+    assert metrics["source_task_id"] == "task-1"
+    assert metrics["source_analysis_metrics"] == first["analysis_metrics"]
+    # 结果与缓存写入均在线程中执行，不阻塞事件循环
+    assert len(upload_threads) == 3
+    assert threading.main_thread() not in upload_threads
+
+    service.max_frames += 1
+    third = await service.analyze_video(task_id="task-3", video_object_keys=["task-1/source_0.mp4"])
+    assert third["analysis_cache"]["hit"] is False
+
+
+@pytest.mark.asyncio
+async def test_analyze_video_digests_direct_uploads_from_the_local_download(monkeypatch: pytest.MonkeyPatch) -> None:
+    service = VideoAnalysisService()
+    service.result_cache_enabled = True
+    digest = hashlib.sha256(b"same-content").hexdigest()
+    stats = {
+        "task-1/source_0.mp4": SimpleNamespace(size=2048, metadata={"x-amz-meta-content-sha256": digest}),
+        "upload-9/source_0.mp4": SimpleNamespace(size=2048, content_type="video/mp4", metadata={}),
+    }
+    _objects, downloads, _threads = _install_result_cache_fakes(monkeypatch, service, stats)
+    written: list[tuple[str, str]] = []
+    monkeypatch.setattr(service.minio, "open_object", lambda *_args, **_kwargs: pytest.fail("object streamed twice"))
+    monkeypatch.setattr(
+        service.minio, "set_content_sha256", lambda _bucket, key, value, _stat=None: written.append((key, value))
+    )
+
+    await service.analyze_video(task_id="task-1", video_object_keys=["task-1/source_0.mp4"])
+    direct = await service.analyze_video(task_id="upload-9", video_object_keys=["upload-9/source_0.mp4"])
+
+    assert direct["analysis_cache"]["hit"] is True
+    assert [scene["source_video_key"] for scene in direct["scenes"]] == ["upload-9/source_0.mp4"]
+    # 直传对象只下载一次，摘要按本地文件计算并回写元数据
+    assert downloads == ["task-1/source_0.mp4", "upload-9/source_0.mp4"]
+    assert written == [("upload-9/source_0.mp4", digest)]
+
+    service.max_frames += 1
+    missed = await service.analyze_video(task_id="upload-9", video_object_keys=["upload-9/source_0.mp4"])
+    assert missed["analysis_cache"]["hit"] is False
+    assert downloads[2:] == ["upload-9/source_0.mp4"]
+
+
+@pytest.mark.asyncio
+async def test_analyze_frames_batches_requests_and_falls_back_per_frame(monkeypatch: pytest.MonkeyPatch) -> None:
+    service = VideoAnalysisService()
+    service.vision_cache = None
+    service.vision_batch_size = 3
+    frames = [FrameInfo(path=Path(f"frame_{i}.jpg"), timestamp_ms=i * 1000) for i in range(5)]
+    batch_calls: list[list[str]] = []
+    single_calls: list[str] = []
+
+    async def fake_batch(paths: list[Path]) -> list[dict[str, object]]:
+        batch_calls.append([path.stem for path in paths])
+        if len(paths) < 3:
+            raise ValueError("invalid_batch_response")
+        return [{"description": f"batch-{path.stem}", "objects": []} for path in paths]
+
+    async def fake_single(path: Path) -> dict[str, object]:
+        single_calls.append(path.stem)
+        return {"description": f"single-{path.stem}", "objects": []}
+
+    monkeypatch.setattr(service.vision, "analyze_frames_batch", fake_batch)
+    monkeypatch.setattr(service.vision, "analyze_frame", fake_single)
+
+    analyzed = await service._analyze_frames(frames)
+
+    assert batch_calls[0] == ["frame_0", "frame_1", "frame_2"]
+    assert sorted(single_calls) == ["frame_3", "frame_4"]
+    assert [item["description"] for item in analyzed] == [
+        "batch-frame_0",
+        "batch-frame_1",
+        "batch-frame_2",
+        "single-frame_3",
+        "single-frame_4",
+    ]
+    assert [item["timestamp_ms"] for item in analyzed] == [0, 1000, 2000, 3000, 4000]
+    assert [item["vision_batched"] for item in analyzed] == [True, True, True, False, False]
+
+
+def test_parse_batch_response_restores_order_and_rejects_mismatch() -> None:
+    text = '```json\n[{"index": 1, "description": "b", "objects": ["y"]}, {"index": 0, "description": "a"}]\n```'
+    assert parse_batch_response(text, 2) == [
+        {"description": "a", "objects": []},
+        {"description": "b", "objects": ["y"]},
+    ]
+    with pytest.raises(ValueError):
+        parse_batch_response('[{"index": 0, "description": "a"}]', 2)
+
+
+def test_parse_frame_response_matches_batch_format() -> None:
+    text = '```json\n{"description": " 桌上的杯子 ", "objects": ["杯子", " "]}\n```'
+    assert parse_frame_response(text) == {"description": "桌上的杯子", "objects": ["杯子"]}
+    assert parse_frame_response('[{"description": "a", "objects": ["x"]}]') == {"description": "a", "objects": ["x"]}
+    # 模型未按 JSON 返回时才保留原始文本
+    assert parse_frame_response("一张桌子") == {"description": "一张桌子", "objects": []}
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+import threading
 from pathlib import Path
 
 import pytest
@@ -199,3 +201,34 @@ async def test_render_video_fallbacks_to_legacy_when_single_pass_failed(monkeypa
 
     result = await service.render_video("task", "source.mp4", None, scenes, sentences, audio)
     assert result["render_stats"]["pipeline_mode"] == "legacy_fallback"
+
+
+@pytest.mark.asyncio
+async def test_render_video_runs_off_the_event_loop(monkeypatch: pytest.MonkeyPatch) -> None:
+    service = VideoRenderService()
+    scenes = [{"scene_id": "s_0", "start_ms": 0, "end_ms": 1000}]
+    sentences = [{"sentence_id": "t_0", "scene_id": "s_0", "text": "hello"}]
+    audio = [{"sentence_id": "t_0", "status": "ok", "duration_ms": 1000, "audio_path": "audio/task/t_0.mp3"}]
+    rendering = threading.Event()
+    release = threading.Event()
+
+    def blocking_single_pass(**kwargs: object) -> None:
+        rendering.set()
+        assert release.wait(timeout=5)
+        Path(kwargs["output_path"]).write_bytes(b"final")
+
+    monkeypatch.setattr(service.minio, "ensure_bucket", lambda *_: None)
+    monkeypatch.setattr(service.minio, "download_file", lambda *_: None)
+    monkeypatch.setattr(service.minio, "upload_file", lambda bucket, key, path, content_type: f"{bucket}/{key}")
+    monkeypatch.setattr(service.minio, "upload_bytes", lambda *args, **kwargs: "")
+    monkeypatch.setattr("skills.video_render.server.probe_duration_ms", lambda *_args, **_kwargs: 1000)
+    monkeypatch.setattr("skills.video_render.server.render_timeline_single_pass", blocking_single_pass)
+
+    render = asyncio.create_task(service.render_video("task", "source.mp4", None, scenes, sentences, audio))
+    # 渲染阻塞期间事件循环仍可调度其他协程
+    while not rendering.is_set():
+        await asyncio.sleep(0.01)
+    assert not render.done()
+    release.set()
+    result = await render
+    assert result["output_video"] == "output/task/final.mp4"
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from skills.video_analysis.frame_extractor import FrameInfo
+from skills.video_analysis.server import VideoAnalysisService
+from skills.video_analysis.vision_cache import VisionCache, frame_fingerprint
+
+
+class _FakeRedis:
+    def __init__(self) -> None:
+        self.data: dict[str, str] = {}
+        self.ttls: dict[str, int] = {}
+
+    async def get(self, key: str) -> str | None:
+        return self.data.get(key)
+
+    async def set(self, key: str, value: str, ex: int | None = None) -> None:
+        self.data[key] = value
+        self.ttls[key] = ex or 0
+
+
+class _BrokenRedis:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def get(self, _key: str) -> str | None:
+        self.calls += 1
+        raise ConnectionError("redis down")
+
+    async def set(self, _key: str, _value: str, ex: int | None = None) -> None:
+        self.calls += 1
+        raise ConnectionError("redis down")
+
+
+def _write_gradient(path: Path, quality: int) -> Path:
+    gradient = np.tile(np.linspace(0, 255, 64, dtype=np.uint8), (48, 1))
+    Image.fromarray(np.stack([gradient] * 3, axis=-1)).save(path, format="JPEG", quality=quality)
+    return path
+
+
+def test_phash_matches_reencoded_frame_but_sha256_does_not(tmp_path: Path) -> None:
+    high = _write_gradient(tmp_path / "high.jpg", quality=95)
+    low = _write_gradient(tmp_path / "low.jpg", quality=60)
+
+    assert frame_fingerprint(high) == frame_fingerprint(low)
+    assert frame_fingerprint(high, "sha256") != frame_fingerprint(low, "sha256")
+
+
+def test_phash_skips_flat_frames_and_separates_colours(tmp_path: Path) -> None:
+    black = tmp_path / "black.jpg"
+    Image.new("RGB", (64, 48), (0, 0, 0)).save(black, format="JPEG")
+    assert frame_fingerprint(black) is None
+    assert frame_fingerprint(black, "sha256") is not None
+
+    # 同样的亮度走向、不同颜色：差值哈希相同，颜色直方图区分开
+    gradient = np.tile(np.linspace(0, 255, 64, dtype=np.uint8), (48, 1))
+    red = tmp_path / "red.jpg"
+    blue = tmp_path / "blue.jpg"
+    zeros = np.zeros_like(gradient)
+    Image.fromarray(np.stack([gradient, zeros, zeros], axis=-1)).save(red, format="JPEG", quality=95)
+    Image.fromarray(np.stack([zeros, zeros, gradient], axis=-1)).save(blue, format="JPEG", quality=95)
+    assert frame_fingerprint(red).split(":")[1] == frame_fingerprint(blue).split(":")[1]
+    assert frame_fingerprint(red) != frame_fingerprint(blue)
+
+
+@pytest.mark.asyncio
+async def test_cache_keys_are_versioned_and_flat_frames_are_not_cached(tmp_path: Path) -> None:
+    cache = VisionCache(model="m")
+    white = tmp_path / "white.jpg"
+    Image.new("RGB", (64, 48), (255, 255, 255)).save(white, format="JPEG")
+
+    assert (await cache.key_for(_write_gradient(tmp_path / "frame.jpg", quality=90))).startswith("v2:m:phash:64x48:")
+    assert await cache.key_for(white) is None
+
+
+@pytest.mark.asyncio
+async def test_local_tier_evicts_least_recently_used() -> None:
+    cache = VisionCache(model="m", local_max_entries=2)
+    await cache.put("a", {"description": "A", "objects": []})
+    await cache.put("b", {"description": "B", "objects": []})
+    await cache.get("a")
+    await cache.put("c", {"description": "C", "objects": []})
+
+    assert (await cache.get("b")) == (None, None)
+    assert (await cache.get("a"))[1] == "local"
+    assert cache.stats["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_tier_is_shared_and_refills_local_tier() -> None:
+    redis = _FakeRedis()
+    writer = VisionCache(model="m", redis_ttl_seconds=60)
+    writer.redis = redis
+    await writer.put("k", {"description": "desk", "objects": ["lamp"], "raw": "ignored"})
+    assert redis.ttls == {"evoclip:vision:k": 60}
+
+    reader = VisionCache(model="m")
+    reader.redis = redis
+    assert await reader.get("k") == ({"description": "desk", "objects": ["lamp"]}, "redis")
+    assert (await reader.get("k"))[1] == "local"
+
+
+@pytest.mark.asyncio
+async def test_redis_failures_back_off_instead_of_retrying_every_frame() -> None:
+    cache = VisionCache(model="m", redis_backoff_seconds=30)
+    broken = _BrokenRedis()
+    cache.redis = broken
+
+    for _ in range(3):
+        assert await cache.get("missing") == (None, None)
+
+    assert broken.calls == 1
+    assert cache.stats["redis_errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_analyze_frames_reuses_cached_results(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    service = VideoAnalysisService()
+    service.vision_cache = VisionCache(model="m")
+    frame_path = _write_gradient(tmp_path / "frame.jpg", quality=90)
+    frames = [FrameInfo(path=frame_path, timestamp_ms=0)]
+    calls: list[Path] = []
+
+    async def fake_analyze_frame(path: Path) -> dict[str, object]:
+        calls.append(path)
+        return {"description": "gradient", "objects": ["wall"]}
+
+    monkeypatch.setattr(service.vision, "analyze_frame", fake_analyze_frame)
+
+    first = await service._analyze_frames(frames)
+    second = await service._analyze_frames(frames)
+
+    assert len(calls) == 1
+    assert first[0]["vision_cache"] is None
+    assert second[0]["vision_cache"] == "local"
+    assert second[0]["description"] == "gradient"
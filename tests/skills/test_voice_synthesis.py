@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 from pathlib import Path
 
 import pytest
 
+from skills.voice_synthesis.audio_cache import TTSAudioCache, tts_cache_key
 from skills.voice_synthesis.server import VoiceSynthesisService
 
 
@@ -18,6 +20,7 @@ async def test_synthesize_voice_empty_input() -> None:
 async def test_synthesize_voice_marks_failed_sentence(monkeypatch: pytest.MonkeyPatch) -> None:
     service = VoiceSynthesisService()
     service.clone_from_video = False
+    service.audio_cache = None
 
     async def fail(*_: object, **__: object) -> None:
         raise RuntimeError("tts_down")
@@ -37,6 +40,7 @@ async def test_synthesize_voice_marks_failed_sentence(monkeypatch: pytest.Monkey
 async def test_synthesize_voice_success(monkeypatch: pytest.MonkeyPatch) -> None:
     service = VoiceSynthesisService()
     service.clone_from_video = False
+    service.audio_cache = None
 
     async def ok(text: str, output_path: Path, voice: str | None = None) -> None:
         _ = voice
@@ -88,6 +92,7 @@ async def test_resolve_voice_profile_fallback_when_clone_fails_non_strict(monkey
 async def test_synthesize_voice_sets_fallback_flag(monkeypatch: pytest.MonkeyPatch) -> None:
     service = VoiceSynthesisService()
     service.clone_from_video = True
+    service.audio_cache = None
 
     async def ok(text: str, output_path: Path, voice: str | None = None) -> None:
         _ = text, voice
@@ -106,7 +111,7 @@ async def test_synthesize_voice_sets_fallback_flag(monkeypatch: pytest.MonkeyPat
     assert result["voice_profile_fallback"] is True
 
 
-def test_prepare_clone_audio_url_uses_public_presign(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+def test_build_and_publish_clone_sample_uses_public_presign(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
     service = VoiceSynthesisService()
     service.clone_public_base_url = "https://public.example.com"
 
@@ -129,18 +134,16 @@ def test_prepare_clone_audio_url_uses_public_presign(monkeypatch: pytest.MonkeyP
 
     monkeypatch.setattr(service.minio, "presigned_get_object", presign)
 
-    url = service._prepare_clone_audio_url(
-        task_id="task",
-        source_video_keys=["source_0.mp4"],
-        working_dir=tmp_path,
-    )
+    sample_audio = service._build_clone_sample(["source_0.mp4"], tmp_path)
+    assert sample_audio is not None and sample_audio.read_bytes() == b"wav"
+    url = service._publish_clone_sample("task", sample_audio)
     assert url == "https://public.example.com/intermediate/task/clone_sample.wav?signature=ok"
     assert captured["bucket"] == service.buckets["intermediate"]
     assert captured["key"] == "task/clone_sample.wav"
     assert captured["public_base_url"] == "https://public.example.com"
 
 
-def test_prepare_clone_audio_url_fallbacks_to_rewrite(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+def test_build_and_publish_clone_sample_fallbacks_to_rewrite(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
     service = VoiceSynthesisService()
     service.clone_public_base_url = "https://public.example.com/minio"
 
@@ -169,10 +172,147 @@ def test_prepare_clone_audio_url_fallbacks_to_rewrite(monkeypatch: pytest.Monkey
         lambda raw: raw.replace("http://192.168.31.220:9000", "https://public.example.com/minio"),
     )
 
-    url = service._prepare_clone_audio_url(
-        task_id="task",
-        source_video_keys=["source_0.mp4"],
-        working_dir=tmp_path,
-    )
+    sample_audio = service._build_clone_sample(["source_0.mp4"], tmp_path)
+    assert sample_audio is not None and sample_audio.read_bytes() == b"wav"
+    url = service._publish_clone_sample("task", sample_audio)
     assert url == "https://public.example.com/minio/intermediate/task/clone_sample.wav?signature=raw"
     assert calls == [("https://public.example.com/minio", "fail"), (None, "ok")]
+
+
+@pytest.mark.asyncio
+async def test_synthesize_voice_runs_sentences_concurrently_and_keeps_order(monkeypatch: pytest.MonkeyPatch) -> None:
+    service = VoiceSynthesisService()
+    service.clone_from_video = False
+    service.audio_cache = None
+    service.synthesis_concurrency = 2
+    active = 0
+    max_active = 0
+
+    async def slow(text: str, output_path: Path, voice: str | None = None) -> None:
+        nonlocal active, max_active
+        _ = voice
+        active += 1
+        max_active = max(max_active, active)
+        # 越靠前的句子合成越慢，验证输出仍按输入顺序
+        await asyncio.sleep(0.01 * (4 - int(text)))
+        active -= 1
+        output_path.write_bytes(text.encode())
+
+    monkeypatch.setattr(service.minio, "ensure_bucket", lambda *_: None)
+    monkeypatch.setattr(service.adapter, "synthesize", slow)
+    monkeypatch.setattr("skills.voice_synthesis.server.read_duration_ms", lambda path: 1000 + int(path.read_bytes()))
+    monkeypatch.setattr(service.minio, "upload_file", lambda bucket, key, path, content_type: f"{bucket}/{key}")
+
+    sentences = [{"sentence_id": f"t_{index}", "text": str(index)} for index in range(4)]
+    result = await service.synthesize_voice(task_id="task", sentences=sentences)
+
+    assert max_active == 2
+    assert [item["sentence_id"] for item in result["audio_segments"]] == ["t_0", "t_1", "t_2", "t_3"]
+    assert [item["duration_ms"] for item in result["audio_segments"]] == [1000, 1001, 1002, 1003]
+    assert set(result["audio_segments"][0]["timings"]) == {"queue_ms", "synthesize_ms", "probe_ms", "upload_ms"}
+    assert result["synthesis_metrics"]["synthesis_concurrency"] == 2
+
+
+@pytest.mark.asyncio
+async def test_synthesize_voice_reuses_cached_audio_and_duration(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    service = VoiceSynthesisService()
+    service.clone_from_video = False
+    service.audio_cache = TTSAudioCache(minio=None, bucket="intermediate", local_dir=str(tmp_path / "cache"))
+    synth_calls: list[str] = []
+    probe_calls: list[Path] = []
+    uploads: list[bytes] = []
+
+    async def ok(text: str, output_path: Path, voice: str | None = None) -> None:
+        _ = voice
+        synth_calls.append(text)
+        output_path.write_bytes(b"audio:" + text.encode())
+
+    def probe(path: Path) -> int:
+        probe_calls.append(path)
+        return 1500
+
+    monkeypatch.setattr(service.minio, "ensure_bucket", lambda *_: None)
+    monkeypatch.setattr(service.adapter, "synthesize", ok)
+    monkeypatch.setattr("skills.voice_synthesis.server.read_duration_ms", probe)
+    monkeypatch.setattr(
+        service.minio,
+        "upload_file",
+        lambda bucket, key, path, content_type: uploads.append(Path(path).read_bytes()) or f"{bucket}/{key}",
+    )
+
+    first = await service.synthesize_voice(task_id="a", sentences=[{"sentence_id": "t_0", "text": "你好  世界"}])
+    second = await service.synthesize_voice(task_id="b", sentences=[{"sentence_id": "t_0", "text": "你好 世界"}])
+
+    assert synth_calls == ["你好  世界"]
+    assert len(probe_calls) == 1
+    assert first["audio_segments"][0]["tts_cache"] is None
+    assert second["audio_segments"][0]["tts_cache"] == "local"
+    assert second["audio_segments"][0]["duration_ms"] == 1500
+    assert second["audio_segments"][0]["audio_path"] == f"{service.buckets['audio']}/b/t_0.mp3"
+    assert uploads == ["audio:你好  世界".encode()] * 2
+
+
+def test_tts_cache_hit_is_private_copy_and_survives_prune(tmp_path: Path) -> None:
+    cache = TTSAudioCache(minio=None, bucket="intermediate", local_dir=str(tmp_path / "cache"), local_max_files=1)
+    source = tmp_path / "source.mp3"
+    source.write_bytes(b"audio")
+    cache.put("aa" + "0" * 62, source, 1200)
+
+    dest = tmp_path / "work" / "t_0.mp3"
+    cached = cache.get("aa" + "0" * 62, dest)
+    assert cached is not None and cached.path == dest and cached.tier == "local"
+
+    # 其他任务写入触发淘汰，共享条目被删除后调用方的副本仍可读取
+    cache.local_prune_interval_seconds = 0
+    cache.put("bb" + "0" * 62, source, 800)
+    assert cache.get("aa" + "0" * 62, tmp_path / "work" / "t_1.mp3") is None
+    assert dest.read_bytes() == b"audio"
+
+
+def test_tts_cache_prune_is_throttled(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = TTSAudioCache(minio=None, bucket="intermediate", local_dir=str(tmp_path / "cache"), local_max_files=1)
+    scans: list[str] = []
+    glob = Path.glob
+    monkeypatch.setattr(Path, "glob", lambda self, pattern: scans.append(pattern) or glob(self, pattern))
+    source = tmp_path / "source.mp3"
+    source.write_bytes(b"audio")
+
+    for idx in range(3):
+        cache.put(f"{idx:02d}" + "0" * 62, source, 100)
+
+    assert len(scans) == 1
+
+
+def test_tts_cache_key_depends_on_voice_and_normalized_text() -> None:
+    assert tts_cache_key("dashscope", "m", "v1", "Ｈｉ  there") == tts_cache_key("dashscope", "m", "v1", "Hi there")
+    assert tts_cache_key("dashscope", "m", "v1", "Hi") != tts_cache_key("dashscope", "m", "v2", "Hi")
+
+
+@pytest.mark.asyncio
+async def test_synthesize_voice_uses_prepared_voice_without_resolving(monkeypatch: pytest.MonkeyPatch) -> None:
+    service = VoiceSynthesisService()
+    service.audio_cache = None
+    voices: list[str | None] = []
+
+    async def ok(text: str, output_path: Path, voice: str | None = None) -> None:
+        voices.append(voice)
+        output_path.write_bytes(text.encode())
+
+    async def must_not_resolve(*_: object, **__: object) -> tuple[str | None, bool]:
+        raise AssertionError("voice profile already prepared")
+
+    monkeypatch.setattr(service.minio, "ensure_bucket", lambda *_: None)
+    monkeypatch.setattr(service, "_resolve_voice_profile", must_not_resolve)
+    monkeypatch.setattr(service.adapter, "synthesize", ok)
+    monkeypatch.setattr("skills.voice_synthesis.server.read_duration_ms", lambda *_: 1000)
+    monkeypatch.setattr(service.minio, "upload_file", lambda bucket, key, path, content_type: f"{bucket}/{key}")
+
+    result = await service.synthesize_voice(
+        task_id="task",
+        sentences=[{"sentence_id": "t_0", "text": "hello"}],
+        prepared_voice={"voice_profile": "voice-9", "voice_profile_fallback": False, "voice_profile_source": "registry"},
+    )
+
+    assert voices == ["voice-9"]
+    assert result["voice_profile"] == "voice-9"
+    assert result["voice_profile_source"] == "registry"
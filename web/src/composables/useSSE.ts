@@ -5,14 +5,20 @@ export function useSSE(taskId: string) {
   const lastEvent = ref<Record<string, unknown> | null>(null);
   const error = ref<string | null>(null);
   let source: EventSource | null = null;
+  // 手动重连会新建 EventSource，需自行带上最后收到的事件 ID，服务端据此重放错过的事件
+  let lastEventId = "";
 
   const connect = () => {
-    source = new EventSource(`/api/tasks/${taskId}/events`);
+    const query = lastEventId ? `?last_event_id=${encodeURIComponent(lastEventId)}` : "";
+    source = new EventSource(`/api/tasks/${taskId}/events${query}`);
     source.onopen = () => {
       connected.value = true;
       error.value = null;
     };
     source.onmessage = (event) => {
+      if (event.lastEventId) {
+        lastEventId = event.lastEventId;
+      }
       try {
         lastEvent.value = JSON.parse(event.data);
       } catch {